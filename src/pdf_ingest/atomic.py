@@ -0,0 +1,37 @@
+"""
+Crash-safe output files: write next to the target, fsync, then rename over it.
+
+A rename within a directory is atomic, so readers (and reruns) only ever see either
+no output file or a complete one, never a half-written file.
+"""
+
+import os
+from pathlib import Path
+
+
+def partial_path(target: Path, owner: str | None = None) -> Path:
+    """
+    Hidden sibling of target to write into before committing.
+
+    The name is fixed, so a partial file left by a crash is overwritten by the rerun.
+    With an owner, e.g. a queue worker sharing the output directory with others, the
+    name is unique to it, so two writers of the same target never touch each other's
+    partial file.
+    """
+    if owner:
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in owner)
+        return target.with_name(f".{target.name}.{safe}.partial")
+    return target.with_name(f".{target.name}.partial")
+
+
+def commit_file(temp_file: Path, target: Path) -> None:
+    """
+    Flush temp_file to disk and atomically rename it to target.
+
+    Args:
+        temp_file: The fully written file, in the same directory as target
+        target: Final name, replaced if it exists
+    """
+    with open(temp_file, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temp_file, target)
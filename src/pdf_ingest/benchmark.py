@@ -0,0 +1,324 @@
+"""
+Throughput benchmark for scan_and_convert_pdfs on a synthetic corpus.
+
+    pdf-ingest-bench generate bench_corpus --docs-per-kind 8
+    pdf-ingest-bench run bench_corpus --jobs 8 --report bench.json
+
+The report is a single JSON object, so runs can be diffed or compared by a script.
+With --compare-pdf-text-backends the corpus is converted once per PDF text backend,
+with one job and with --jobs, and the report holds every run and the docs/sec speedup
+of pdfium over pdftotext at each job count. It is largest on corpora of small
+born-digital files:
+
+    pdf-ingest-bench generate small_corpus --docs-per-kind 200 --pages 1 --kinds text
+    pdf-ingest-bench run small_corpus --jobs 8 --compare-pdf-text-backends
+"""
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pdf_ingest import __version__
+from pdf_ingest.manifest import Manifest
+from pdf_ingest.metrics import configure_metrics, load_records
+from pdf_ingest.pdf_text_backend import (
+    PDF_TEXT_BACKENDS,
+    configure_pdf_text_backend,
+    pdf_text_backend,
+)
+from pdf_ingest.scan_and_convert import default_jobs, scan_and_convert_pdfs
+from pdf_ingest.scheduling import SCHEDULES
+from pdf_ingest.synthetic import KINDS, generate_corpus, load_corpus
+from pdf_ingest.types import ConvertOptions
+
+_PERCENTILES = (50, 90, 99)
+_METRICS_NAME = ".bench_metrics.jsonl"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Percentile with linear interpolation between the closest ranks.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(values: list[float]) -> dict[str, float]:
+    """
+    Count, mean and percentiles of a list of latencies in seconds.
+    """
+    summary: dict[str, float] = {"count": len(values)}
+    summary["mean"] = round(sum(values) / len(values), 4) if values else 0.0
+    for pct in _PERCENTILES:
+        summary[f"p{pct}"] = round(percentile(values, pct), 4)
+    summary["max"] = round(max(values), 4) if values else 0.0
+    return summary
+
+
+def _peak_rss_kb() -> dict[str, int]:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def run_benchmark(
+    corpus_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    options: ConvertOptions | None = None,
+    schedule: str = "fifo",
+    text_backend: str | None = None,
+) -> dict:
+    """
+    Convert the whole corpus once and measure it.
+
+    The output directory must be empty, so that nothing is skipped by the manifest.
+    Per-document latencies come from the durations recorded in the manifest, per-stage
+    latencies from the stage metrics, which are written next to it.
+
+    Args:
+        corpus_dir: Corpus written by synthetic.generate_corpus()
+        output_dir: Empty directory for the converted text
+        jobs: Number of files to convert in parallel
+        options: Converter tuning passed through to scan_and_convert_pdfs
+        schedule: Work queue order passed through to scan_and_convert_pdfs
+        text_backend: PDF text backend for this run, defaults to the configured one
+
+    Returns:
+        dict: The benchmark report
+    """
+    documents = {doc.path: doc for doc in load_corpus(corpus_dir)}
+    jobs = jobs or default_jobs()
+    previous_backend = pdf_text_backend()
+    text_backend = text_backend or previous_backend
+
+    metrics_file = output_dir / _METRICS_NAME
+    configure_metrics(metrics_file)
+    # One PDFium worker per job, like the pdftotext processes it replaces
+    configure_pdf_text_backend(text_backend, workers=jobs)
+    try:
+        start = time.perf_counter()
+        result = scan_and_convert_pdfs(
+            input_dir=corpus_dir,
+            output_dir=output_dir,
+            jobs=jobs,
+            options=options,
+            schedule=schedule,
+        )
+        wall = time.perf_counter() - start
+    finally:
+        configure_metrics(None)
+        configure_pdf_text_backend(previous_backend)
+
+    by_stage: dict[str, list[float]] = {}
+    child_cpu: dict[str, float] = {}
+    if metrics_file.exists():
+        for record in load_records(metrics_file):
+            by_stage.setdefault(record.stage, []).append(record.wall_seconds)
+            child_cpu[record.stage] = (
+                child_cpu.get(record.stage, 0.0) + record.child_cpu_seconds
+            )
+
+    manifest = Manifest(output_dir)
+    by_kind: dict[str, list[float]] = {}
+    by_method: dict[str, list[float]] = {}
+    all_latencies: list[float] = []
+    pages = 0
+    languages_correct = 0
+    for rel_path, doc in documents.items():
+        entry = manifest.lookup(Path(rel_path))
+        if entry is None:
+            continue
+        pages += doc.pages
+        languages_correct += entry.language == doc.language
+        all_latencies.append(entry.duration)
+        by_kind.setdefault(doc.kind, []).append(entry.duration)
+        by_method.setdefault(entry.method, []).append(entry.duration)
+    converted = len(all_latencies)
+
+    return {
+        "version": __version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "jobs": jobs,
+        "schedule": schedule,
+        "pdf_text_backend": text_backend,
+        "documents": len(documents),
+        "converted": converted,
+        "failed": len(result.untranstlatable),
+        "pages": pages,
+        "wall_seconds": round(wall, 3),
+        "docs_per_sec": round(converted / wall, 3) if wall else 0.0,
+        "pages_per_sec": round(pages / wall, 3) if wall else 0.0,
+        "language_accuracy": (
+            round(languages_correct / converted, 3) if converted else 0.0
+        ),
+        "latency_seconds": {
+            "document": latency_summary(all_latencies),
+            "kind": {kind: latency_summary(v) for kind, v in sorted(by_kind.items())},
+            "method": {m: latency_summary(v) for m, v in sorted(by_method.items())},
+            "stage": {st: latency_summary(v) for st, v in sorted(by_stage.items())},
+        },
+        "child_cpu_seconds": {st: round(v, 3) for st, v in sorted(child_cpu.items())},
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def compare_pdf_text_backends(
+    corpus_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    schedule: str = "fifo",
+) -> dict:
+    """
+    Convert the corpus with every PDF text backend and compare the throughput.
+
+    Each backend runs with a single job, which shows the per document overhead, and
+    with jobs in parallel, which shows how the backends scale across cores.
+
+    Args:
+        corpus_dir: Corpus written by synthetic.generate_corpus()
+        output_dir: Empty directory, each run writes to its own subdirectory
+        jobs: Number of files to convert in parallel, defaults to the CPU count
+        schedule: Work queue order passed through to scan_and_convert_pdfs
+
+    Returns:
+        dict: Per job count, one report per backend and the docs/sec speedup of
+            pdfium over pdftotext
+    """
+    sizes = [(corpus_dir / doc.path).stat().st_size for doc in load_corpus(corpus_dir)]
+    runs = {}
+    for job_count in sorted({1, jobs or default_jobs()}):
+        reports = {}
+        for backend in PDF_TEXT_BACKENDS:
+            run_dir = output_dir / f"{backend}-j{job_count}"
+            run_dir.mkdir()
+            reports[backend] = run_benchmark(
+                corpus_dir,
+                run_dir,
+                jobs=job_count,
+                schedule=schedule,
+                text_backend=backend,
+            )
+        baseline = reports["pdftotext"]["docs_per_sec"]
+        runs[str(job_count)] = {
+            "docs_per_sec_speedup": (
+                round(reports["pdfium"]["docs_per_sec"] / baseline, 3)
+                if baseline
+                else 0.0
+            ),
+            "backends": reports,
+        }
+    return {
+        "file_bytes": {
+            "median": round(percentile([float(size) for size in sizes], 50)),
+            "max": max(sizes, default=0),
+        },
+        "jobs": runs,
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark PDF/DJVU ingest throughput")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate a synthetic corpus")
+    generate.add_argument("corpus_dir", type=Path)
+    generate.add_argument("--docs-per-kind", type=int, default=8)
+    generate.add_argument(
+        "--pages",
+        type=int,
+        nargs="+",
+        default=[1, 3, 10, 30],
+        help="Page counts to cycle through",
+    )
+    generate.add_argument("--kinds", nargs="+", choices=KINDS, default=None)
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="Convert a corpus and report throughput")
+    run.add_argument("corpus_dir", type=Path)
+    run.add_argument("--jobs", "-j", type=int, default=None)
+    run.add_argument("--schedule", choices=SCHEDULES, default="fifo")
+    run.add_argument(
+        "--pdf-text-backend", choices=PDF_TEXT_BACKENDS, default="pdftotext"
+    )
+    run.add_argument(
+        "--compare-pdf-text-backends",
+        action="store_true",
+        help="Run once per PDF text backend and report the docs/sec speedup",
+    )
+    run.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Where to write the text, defaults to a temporary directory",
+    )
+    run.add_argument(
+        "--report", type=Path, default=None, help="Write the JSON report here"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.command == "generate":
+        documents = generate_corpus(
+            args.corpus_dir,
+            docs_per_kind=args.docs_per_kind,
+            page_counts=tuple(args.pages),
+            kinds=args.kinds,
+            seed=args.seed,
+        )
+        print(f"Generated {len(documents)} documents in {args.corpus_dir}")
+        return 0
+
+    temp_dir = None
+    output_dir = args.output_dir
+    if output_dir is None:
+        temp_dir = tempfile.mkdtemp(prefix="pdf_ingest_bench_")
+        output_dir = Path(temp_dir)
+    elif output_dir.exists() and any(output_dir.iterdir()):
+        print(f"Output directory {output_dir} is not empty", file=sys.stderr)
+        return 1
+    output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        if args.compare_pdf_text_backends:
+            report = compare_pdf_text_backends(
+                args.corpus_dir, output_dir, jobs=args.jobs, schedule=args.schedule
+            )
+        else:
+            report = run_benchmark(
+                args.corpus_dir,
+                output_dir,
+                jobs=args.jobs,
+                schedule=args.schedule,
+                text_backend=args.pdf_text_backend,
+            )
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report is not None:
+        args.report.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
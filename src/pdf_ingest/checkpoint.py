@@ -0,0 +1,107 @@
+"""
+Resumable OCR: per-page results are kept in a persistent work directory, so a run that
+is killed halfway through a book picks up at the first page that was not finished.
+
+Checkpoints are keyed by the content hash of the document, which stays valid when the
+file is moved or touched and becomes invalid as soon as its contents change.
+"""
+
+import os
+import shutil
+import socket
+import threading
+from pathlib import Path
+
+from pdf_ingest.manifest import hash_file
+from pdf_ingest.types import ConvertOptions
+
+CHECKPOINT_DIR_NAME = ".pdf_ingest_checkpoints"
+
+
+class OcrCheckpoint:
+    """
+    OCR'd pages of one document, one text file per page.
+    """
+
+    def __init__(
+        self, root: Path, input_file: Path, content_hash: str | None = None
+    ) -> None:
+        self.input_file = input_file
+        self.path = root / (content_hash or hash_file(input_file))
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _page_file(self, page: int) -> Path:
+        return self.path / f"page-{page:06d}.txt"
+
+    def pages(self) -> set[int]:
+        """
+        Pages that have been saved.
+        """
+        pages: set[int] = set()
+        for entry in self.path.glob("page-*.txt"):
+            try:
+                pages.add(int(entry.stem.removeprefix("page-")))
+            except ValueError:
+                continue
+        return pages
+
+    def load(self, page: int) -> str | None:
+        """
+        Text of a saved page, or None if it has not been saved.
+        """
+        try:
+            return self._page_file(page).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def save(self, page: int, text: str) -> None:
+        """
+        Save the text of a page. A page file either exists complete or not at all.
+
+        The checkpoint directory may be shared by workers on several hosts, so the
+        temporary file is named after the host, process and thread writing it.
+        """
+        page_file = self._page_file(page)
+        writer = f"{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}"
+        temp_file = self.path / f".{page_file.name}.{writer}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, page_file)
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint, once the final text and JSON are written.
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def open_checkpoint(
+    input_file: Path, options: ConvertOptions | None, content_hash: str | None = None
+) -> OcrCheckpoint | None:
+    """
+    Open the checkpoint of a document, if checkpointing is enabled.
+
+    Checkpointing is an optimization, so a work directory that cannot be used only
+    disables it for this document.
+
+    Args:
+        input_file: The document about to be OCR'd
+        options: Converter tuning, checkpoints are kept under options.checkpoint_dir
+        content_hash: hash_file() of the document, if already known
+
+    Returns:
+        OcrCheckpoint | None: The checkpoint, or None when checkpointing is off
+    """
+    if options is None or options.checkpoint_dir is None:
+        return None
+    try:
+        checkpoint = OcrCheckpoint(options.checkpoint_dir, input_file, content_hash)
+        done = len(checkpoint.pages())
+    except OSError as e:
+        print(f"Error opening the OCR checkpoint of {input_file.name}: {e}")
+        return None
+    if done:
+        print(f"Resuming OCR of {input_file.name}, {done} page(s) already done")
+    return checkpoint
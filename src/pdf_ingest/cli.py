@@ -16,7 +16,7 @@ import subprocess
 import sys
 from pathlib import Path
 
-from pdf_ingest.cli_docker import Args
+from pdf_ingest.cli_docker import Args, positive_int
 
 _DOCKER_INPUT_DIR = "/app/input"
 _DOCKER_OUTPUT_DIR = "/app/output"
@@ -68,6 +68,14 @@ def parse_args() -> Args:
         help="Update existing files instead of skipping them",
     )
 
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=None,
+        help="Number of files to convert in parallel (default: CPU count of the container)",
+    )
+
     args = parser.parse_args()
     first = True
     while args.input_dir is None:
@@ -92,6 +100,7 @@ def parse_args() -> Args:
     return Args(
         input_dir=args.input_dir,
         output_dir=args.output_dir,
+        jobs=args.jobs,
     )
 
 
@@ -132,7 +141,7 @@ def _docker_pull_image() -> None:
     subprocess.run(cmd_pull, shell=True, check=True)
 
 
-def _docker_run(input_dir: Path, output_dir: Path) -> None:
+def _docker_run(input_dir: Path, output_dir: Path, jobs: int | None = None) -> None:
     """Run the Docker image."""
     cmd_list_run: list[str] = [
         "docker",
@@ -152,6 +161,9 @@ def _docker_run(input_dir: Path, output_dir: Path) -> None:
         output_volume,
         _DOCKER_IMAGE,
     ]
+    # Arguments after the image name are forwarded to pdf-ingest-docker
+    if jobs is not None:
+        cmd_list_run += ["--jobs", str(jobs)]
 
     cmd_run = subprocess.list2cmdline(cmd_list_run)
     # print(f"Running command: {cmd_pull}")
@@ -189,7 +201,7 @@ def main() -> int:
     # _docker_pull_image()
     # Uncomment to build instead of pull:
     # _docker_build_image(remove_previous=True, remove_orphanes=True)
-    _docker_run(input_dir=input_dir, output_dir=output_dir)
+    _docker_run(input_dir=input_dir, output_dir=output_dir, jobs=args.jobs)
     return 0
 
 
@@ -4,11 +4,29 @@
 # And it should handle subfolders under the src folder as well,
 # So when it's done processing, every pdf has a txt, in the output folder.
 
+import argparse
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 
-from pdf_ingest.scan_and_convert import Result, scan_and_convert_pdfs
+from pdf_ingest.checkpoint import CHECKPOINT_DIR_NAME
+from pdf_ingest.language_detection import BACKENDS, set_default_backend
+from pdf_ingest.metadata_index import INDEX_NAME
+from pdf_ingest.metrics import FORMATS, configure_metrics
+from pdf_ingest.pdf_text_backend import (
+    DEFAULT_PDFIUM_MAX_BYTES,
+    PDF_TEXT_BACKENDS,
+    configure_pdf_text_backend,
+)
+from pdf_ingest.pipeline import StageLimits
+from pdf_ingest.result_cache import RESULT_CACHE_DIR_NAME
+from pdf_ingest.result_sink import OUTCOMES_NAME, JsonlResultSink, read_outcomes
+from pdf_ingest.scan_and_convert import ENGINES, default_jobs, scan_and_convert_to_sink
+from pdf_ingest.scheduling import SCHEDULES
+from pdf_ingest.supervisor import ResourceLimits, configure_limits
+from pdf_ingest.types import OCR_MODES, ConvertOptions
+from pdf_ingest.watch import watch_and_convert
+from pdf_ingest.work_queue import DEFAULT_LEASE_SECONDS, run_coordinator, run_worker
 
 _PATH_APP = Path("/app")
 _INPUT_DIR = _PATH_APP / "input"
@@ -19,6 +37,7 @@ _OUTPUT_DIR = _PATH_APP / "output"
 class Args:
     input_dir: Path
     output_dir: Path
+    jobs: int | None = None
 
     def __post_init__(self):
         if not isinstance(self.input_dir, Path):
@@ -29,25 +48,381 @@ class Args:
             raise FileNotFoundError(f"{self.input_dir} does not exist")
         if not self.output_dir.exists():
             raise FileNotFoundError(f"{self.output_dir} does not exist")
+        if self.jobs is not None and self.jobs < 1:
+            raise ValueError("jobs must be at least 1")
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert PDF and DJVU files to text")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=None,
+        help="Number of files to convert in parallel (default: CPU count)",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Ignore the output directory manifest and convert every file again",
+    )
+    parser.add_argument(
+        "--content-hash",
+        action="store_true",
+        help="Hash input files so touched but unchanged files are still skipped",
+    )
+    parser.add_argument(
+        "--ocr-workers",
+        type=positive_int,
+        default=None,
+        help="Pages OCR'd in parallel within one document (default: CPU count / documents OCR'd at once)",
+    )
+    parser.add_argument(
+        "--djvu-chunk-pages",
+        type=positive_int,
+        default=8,
+        help="Pages rendered per ddjvu call when OCR'ing a DJVU file",
+    )
+    parser.add_argument(
+        "--scratch-pages",
+        type=positive_int,
+        default=32,
+        help="Maximum rendered page images kept on disk per document while OCR'ing",
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        type=Path,
+        default=None,
+        help="Directory for rendered page images (default: system temp directory)",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=Path,
+        default=None,
+        help=f"Persistent directory for per-page OCR checkpoints (default: OUTPUT/{CHECKPOINT_DIR_NAME})",
+    )
+    parser.add_argument(
+        "--no-checkpoints",
+        action="store_true",
+        help="Don't checkpoint OCR'd pages, an interrupted OCR run starts over",
+    )
+    parser.add_argument(
+        "--result-cache-dir",
+        type=Path,
+        default=None,
+        help=f"Content addressed cache of converted texts, duplicates of a converted file are served from it (default: OUTPUT/{RESULT_CACHE_DIR_NAME})",
+    )
+    parser.add_argument(
+        "--result-cache-mb",
+        type=int,
+        default=2048,
+        help="Size cap of the result cache in MiB, least recently used texts are evicted beyond it",
+    )
+    parser.add_argument(
+        "--no-result-cache",
+        action="store_true",
+        help="Don't cache converted texts, duplicate files are converted again",
+    )
+    parser.add_argument(
+        "--ocr-mode",
+        choices=OCR_MODES,
+        default="force",
+        help="How ocrmypdf treats pages that already have text when OCR'ing a whole PDF",
+    )
+    parser.add_argument(
+        "--no-sidecar",
+        action="store_true",
+        help="Have ocrmypdf write a PDF and extract its text, instead of reading its text sidecar",
+    )
+    parser.add_argument(
+        "--ocrmypdf-jobs",
+        type=positive_int,
+        default=None,
+        help="Pages ocrmypdf OCRs in parallel within one document (default: CPU count / documents OCR'd at once)",
+    )
+    parser.add_argument(
+        "--tesseract-timeout",
+        type=float,
+        default=None,
+        help="Seconds ocrmypdf gives tesseract to OCR one page",
+    )
+    parser.add_argument(
+        "--tesseract-non-ocr-timeout",
+        type=float,
+        default=None,
+        help="Seconds ocrmypdf gives tesseract for page orientation analysis",
+    )
+    parser.add_argument(
+        "--ocr-language",
+        default=None,
+        help="Tesseract language pack(s) to OCR with, e.g. deu+eng, or auto to pick "
+        "them per document from a first OCR pass (default: tesseract's default)",
+    )
+    parser.add_argument(
+        "--text-page-timeout",
+        type=float,
+        default=10.0,
+        help="Seconds per page a text extraction or page rendering may take before it is killed",
+    )
+    parser.add_argument(
+        "--ocr-page-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds per page an OCR call may take before it is killed",
+    )
+    parser.add_argument(
+        "--min-timeout",
+        type=float,
+        default=60.0,
+        help="Lower bound of every converter timeout, in seconds",
+    )
+    parser.add_argument(
+        "--no-timeouts",
+        action="store_true",
+        help="Let converters run as long as they take",
+    )
+    parser.add_argument(
+        "--memory-limit-mb",
+        type=int,
+        default=None,
+        help="Address space limit of every converter process in MiB (default: unlimited)",
+    )
+    parser.add_argument(
+        "--cpu-limit",
+        type=int,
+        default=None,
+        help="CPU seconds limit of every converter process (default: unlimited)",
+    )
+    parser.add_argument(
+        "--language-backend",
+        choices=sorted(BACKENDS),
+        default="langdetect",
+        help="Language detection engine, fasttext and cld3 need their optional packages",
+    )
+    parser.add_argument(
+        "--pdf-text-backend",
+        choices=PDF_TEXT_BACKENDS,
+        default="pdftotext",
+        help="Text layer extraction, pdfium runs in a worker pool and needs the optional pypdfium2",
+    )
+    parser.add_argument(
+        "--pdfium-max-mb",
+        type=int,
+        default=DEFAULT_PDFIUM_MAX_BYTES // 1024**2,
+        help="Larger PDFs are extracted by pdftotext even with --pdf-text-backend pdfium",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=None,
+        help="Record per-stage timings of every document to this file",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=FORMATS,
+        default="jsonl",
+        help="jsonl appends one record per stage, prometheus rewrites a node_exporter textfile",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help=f"Also record every converted file in the SQLite index OUTPUT/{INDEX_NAME}",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="pool",
+        help="pool: one worker per file; pipeline: separate pools for extraction, OCR, detection and output",
+    )
+    parser.add_argument(
+        "--ocr-jobs",
+        type=positive_int,
+        default=None,
+        help="Documents OCR'd at the same time with --engine pipeline (default: --jobs)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULES,
+        default="fifo",
+        help="Order of conversion: scan order, shortest job first, or a fast lane for text extraction",
+    )
+    parser.add_argument(
+        "--fast-lane-jobs",
+        type=positive_int,
+        default=None,
+        help="Extra workers reserved for text extraction with --schedule lanes",
+    )
+    parser.add_argument(
+        "--queue",
+        type=Path,
+        default=None,
+        help="Shared SQLite job queue for multi-node runs, on storage every node mounts. "
+        "Runs as a worker that leases jobs from it, see --coordinator",
+    )
+    parser.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="With --queue: queue every file of the input tree and report progress until the workers are done",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="With --coordinator: exit right after queueing",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help="With --queue: how long a worker holds a job without renewing its lease",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and convert new or modified files as they arrive",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="In watch mode, rescan the tree instead of using inotify (for network mounts)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between rescans when polling",
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=10.0,
+        help="Seconds a file must stay unchanged before it is converted in watch mode",
+    )
+    return parser.parse_args()
 
 
 def main() -> int:
+    args = _parse_args()
+    # Load the language model once up front, a missing optional dependency fails fast
+    set_default_backend(args.language_backend)
+    configure_pdf_text_backend(
+        args.pdf_text_backend, args.pdfium_max_mb * 1024**2, workers=args.jobs
+    )
+    configure_metrics(args.metrics, args.metrics_format)
+    configure_limits(
+        ResourceLimits(
+            text_page_seconds=None if args.no_timeouts else args.text_page_timeout,
+            ocr_page_seconds=None if args.no_timeouts else args.ocr_page_timeout,
+            min_seconds=args.min_timeout,
+            memory_mb=args.memory_limit_mb,
+            cpu_seconds=args.cpu_limit,
+        )
+    )
 
     # Create output directory if it doesn't exist
     # OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
     input_dir = _INPUT_DIR
     output_dir = _OUTPUT_DIR
 
+    options = ConvertOptions(
+        ocr_workers=args.ocr_workers,
+        djvu_chunk_pages=args.djvu_chunk_pages,
+        max_scratch_pages=max(args.scratch_pages, args.djvu_chunk_pages),
+        scratch_dir=args.scratch_dir,
+        language_backend=args.language_backend,
+        checkpoint_dir=(
+            None
+            if args.no_checkpoints
+            else args.checkpoint_dir or output_dir / CHECKPOINT_DIR_NAME
+        ),
+        result_cache_dir=(
+            None
+            if args.no_result_cache
+            else args.result_cache_dir or output_dir / RESULT_CACHE_DIR_NAME
+        ),
+        result_cache_max_bytes=args.result_cache_mb * 1024**2,
+        ocr_mode=args.ocr_mode,
+        ocrmypdf_sidecar=not args.no_sidecar,
+        ocrmypdf_jobs=args.ocrmypdf_jobs,
+        tesseract_timeout=args.tesseract_timeout,
+        tesseract_non_ocr_timeout=args.tesseract_non_ocr_timeout,
+        ocr_language=args.ocr_language,
+    )
+
+    if args.queue is not None:
+        if args.coordinator:
+            run_coordinator(args.queue, input_dir, wait=not args.no_wait)
+            return 0
+        run_worker(
+            queue_path=args.queue,
+            input_dir=input_dir,
+            output_dir=output_dir,
+            jobs=args.jobs,
+            options=options,
+            use_index=args.index,
+            lease_seconds=args.lease_seconds,
+        )
+        return 0
+
+    if args.watch:
+        converted = watch_and_convert(
+            input_dir=input_dir,
+            output_dir=output_dir,
+            jobs=args.jobs,
+            options=options,
+            content_hash=args.content_hash,
+            use_inotify=not args.poll,
+            poll_interval=args.poll_interval,
+            settle_seconds=args.settle_seconds,
+            use_index=args.index,
+        )
+        print(f"Converted {converted} new or modified files while watching")
+        return 0
+
     # Call the function to scan and convert PDFs and DJVUs
-    # remaining_files = scan_and_convert_pdfs(input_dir=input_dir, output_dir=output_dir)
-    result: Result = scan_and_convert_pdfs(input_dir=input_dir, output_dir=output_dir)
-    remaining_files: list[Path] = result.untranstlatable
-    if remaining_files:
-        print(f"\nRemaining files that could not be converted: {len(remaining_files)}")
-        for item in remaining_files:
-            print(f"  - {item.name}")
+    # Outcomes are streamed to a file in the output directory as documents finish,
+    # memory stays flat however large the archive is
+    sink = JsonlResultSink(output_dir / OUTCOMES_NAME)
+    try:
+        summary = scan_and_convert_to_sink(
+            input_dir=input_dir,
+            output_dir=output_dir,
+            sink=sink,
+            jobs=args.jobs,
+            use_manifest=not args.no_manifest,
+            content_hash=args.content_hash,
+            options=options,
+            schedule=args.schedule,
+            fast_lane_jobs=args.fast_lane_jobs,
+            use_index=args.index,
+            engine=args.engine,
+            limits=(
+                StageLimits.for_jobs(args.jobs or default_jobs(), args.ocr_jobs)
+                if args.engine == "pipeline"
+                else None
+            ),
+        )
+    finally:
+        sink.close()
+    if summary.timed_out:
+        print(f"\nFiles given up after a converter timeout: {summary.timed_out}")
+        for outcome in read_outcomes(sink.path):
+            if outcome.timed_out:
+                print(f"  - {Path(outcome.input_file).name}")
+    if summary.failed:
+        print(f"\nRemaining files that could not be converted: {summary.failed}")
+        for outcome in read_outcomes(sink.path):
+            if not outcome.success:
+                print(f"  - {Path(outcome.input_file).name}")
     else:
         print("\nAll files were successfully converted!")
+    print(f"Outcome of every file: {sink.path}")
 
     return 0
 
@@ -0,0 +1,278 @@
+"""
+The format independent steps of converting one document.
+
+Every document goes through the same steps: extract (the embedded text layer), ocr
+(only when the text layer is missing or garbage), language and commit. Only the
+first two depend on the format, a Converter bundles them. convert_document() runs
+the steps back to back, the pipeline engine runs each one on its own pool.
+
+The text is written once, into a partial file next to the final output, and renamed
+to its language tagged name once the JSON is updated. A crash leaves no half-written
+.txt behind.
+
+With a result cache, a document whose content was converted before skips straight
+from the cache step to the commit, see result_cache.
+"""
+
+import shutil
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ingest.atomic import commit_file, partial_path
+from pdf_ingest.checkpoint import OcrCheckpoint, open_checkpoint
+from pdf_ingest.json_util import should_translate, update_json_with_language
+from pdf_ingest.language_detection import detect_language_from_file
+from pdf_ingest.manifest import hash_file
+from pdf_ingest.metrics import stage
+from pdf_ingest.ocr_language import record_collection_language
+from pdf_ingest.result_cache import (
+    CachedResult,
+    ResultCache,
+    open_result_cache,
+)
+from pdf_ingest.supervisor import is_timeout
+from pdf_ingest.text_quality import check_text_quality
+from pdf_ingest.types import ConvertOptions, TranslationItem
+
+# (input_file, txt_file_out) -> error
+TextExtractor = Callable[[Path, Path], Exception | None]
+# (input_file, txt_file_out, options, checkpoint) -> error
+OcrConverter = Callable[
+    [Path, Path, ConvertOptions, OcrCheckpoint | None], Exception | None
+]
+
+
+@dataclass
+class Converter:
+    """
+    The format specific steps of a conversion.
+    """
+
+    extract: TextExtractor
+    ocr: OcrConverter
+
+
+# TranslationItem.method as shown in the log
+_METHOD_NAMES = {
+    "text": "embedded text",
+    "ocr": "OCR",
+    "cache": "the cached text of a duplicate",
+}
+
+
+def _set_language(item: TranslationItem, lang_code: str, is_reliable: bool) -> None:
+    item.language = lang_code
+    item.language_reliable = is_reliable
+    item.should_translate = should_translate(lang_code)
+
+    # Update the output filename to include language code
+    stem = item.output_file.stem
+    suffix = item.output_file.suffix
+    new_filename = f"{stem}-{lang_code.upper()}{suffix}"
+    item.output_file = item.output_file.with_name(new_filename)
+
+
+def cache_step(item: TranslationItem, temp_output: Path, cache: ResultCache) -> bool:
+    """
+    Hash the input and, if a document with the same content was converted before,
+    put its text in place and take over its language.
+
+    Returns:
+        bool: True on a hit, the item then only needs commit_step()
+    """
+    with stage("cache", item.input_file) as lookup:
+        try:
+            item.content_hash = item.content_hash or hash_file(item.input_file)
+        except OSError as e:
+            print(f"Error hashing {item.input_file.name}: {e}")
+            lookup.ok = False
+            return False
+        cached = cache.lookup(item.content_hash)
+        if cached is None:
+            return False
+        try:
+            shutil.copyfile(cache.text_path(item.content_hash), temp_output)
+        except OSError as e:
+            print(f"Error reusing the cached text of {item.input_file.name}: {e}")
+            lookup.ok = False
+            return False
+    item.method = "cache"
+    item.pages = cached.pages
+    _set_language(item, cached.language, cached.language_reliable)
+    print(f"{item.input_file.name} is a duplicate, reusing its cached text")
+    return True
+
+
+def extract_step(
+    item: TranslationItem, temp_output: Path, converter: Converter
+) -> Exception | None:
+    """
+    Extract the text layer and check that it is actual text.
+
+    Returns:
+        Exception | None: None if the text is usable, otherwise why it is not. After a
+            timeout the document is given up, it is not OCR'd.
+    """
+    item.method = "text"
+    with stage("extract", item.input_file, output=temp_output) as extract:
+        err = converter.extract(item.input_file, temp_output)
+        if err is None:
+            # The extractor exits 0 on image-only documents, check what it actually produced
+            err = check_text_quality(temp_output)
+        extract.ok = err is None
+    item.pages = extract.pages or item.pages
+    if err is not None and not is_timeout(err):
+        print(
+            f"Regular conversion failed for {item.input_file.name} ({err}), trying OCR..."
+        )
+    return err
+
+
+def ocr_step(
+    item: TranslationItem,
+    temp_output: Path,
+    converter: Converter,
+    options: ConvertOptions,
+) -> tuple[Exception | None, OcrCheckpoint | None]:
+    """
+    OCR the document, resuming from its checkpoint if checkpoints are enabled.
+
+    Returns:
+        tuple: (error, checkpoint) where the checkpoint is to be cleared after the commit
+    """
+    item.method = "ocr"
+    checkpoint = open_checkpoint(item.input_file, options, item.content_hash)
+    with stage("ocr", item.input_file, output=temp_output) as ocr:
+        err = converter.ocr(item.input_file, temp_output, options, checkpoint)
+        ocr.ok = err is None
+    item.pages = ocr.pages or item.pages
+    if err is not None:
+        print(f"OCR conversion also failed for {item.input_file.name}")
+    return err, checkpoint
+
+
+def language_step(
+    item: TranslationItem, temp_output: Path, options: ConvertOptions
+) -> None:
+    """
+    Detect the language of the text and derive the language tagged output name.
+    """
+    with stage("language", item.input_file, source=temp_output):
+        lang_code, is_reliable = detect_language_from_file(
+            temp_output, backend=options.language_backend
+        )
+    _set_language(item, lang_code, is_reliable)
+    # Lets the OCR of the rest of the directory skip picking its language
+    record_collection_language(item.input_file, lang_code, is_reliable)
+
+
+def commit_step(
+    item: TranslationItem,
+    temp_output: Path,
+    checkpoint: OcrCheckpoint | None = None,
+    cache: ResultCache | None = None,
+) -> Exception | None:
+    """
+    Move the text to its final name, then update the JSON and add it to the cache.
+
+    The JSON marks the document as done, so it is only written once the text is in
+    place. A failed commit leaves the JSON as it was and the document is converted
+    again on the next run.
+
+    Returns:
+        Exception | None: None once the document is done
+    """
+    # Move the text to its final name, a rename in the same directory
+    with stage("commit", item.input_file, output=item.output_file) as commit:
+        try:
+            commit_file(temp_output, item.output_file)
+        except OSError as commit_err:
+            commit.ok = False
+            print(f"Error committing {item.output_file.name}: {commit_err}")
+            return commit_err
+
+    # Update JSON with language information
+    with stage("json", item.input_file, source=item.json_file, output=item.json_file):
+        update_json_with_language(
+            item.json_file, item.language, item.language_reliable, item.json_data
+        )
+    if checkpoint is not None:
+        # The text and JSON are written, the OCR'd pages are no longer needed
+        checkpoint.clear()
+    if cache is not None and item.content_hash and item.method != "cache":
+        result = CachedResult(
+            language=item.language,
+            language_reliable=item.language_reliable,
+            method=item.method,
+            pages=item.pages,
+        )
+        try:
+            cache.store(item.content_hash, item.output_file, result)
+        except OSError as e:
+            # The document is done, only its duplicates will be converted again
+            print(f"Error caching the text of {item.input_file.name}: {e}")
+    method = _METHOD_NAMES.get(item.method, item.method)
+    print(
+        f"Successfully converted {item.input_file.name} using {method} (language: {item.language})"
+    )
+    return None
+
+
+class ConversionCancelled(Exception):
+    """
+    The conversion was given up through TranslationItem.cancel.
+    """
+
+
+def cancelled(item: TranslationItem) -> ConversionCancelled | None:
+    """
+    The error to stop with if the item was cancelled, checked between steps.
+    """
+    if item.cancel is not None and item.cancel.is_set():
+        print(f"Giving up {item.input_file.name}, the conversion was cancelled")
+        return ConversionCancelled(f"{item.input_file.name} was cancelled")
+    return None
+
+
+def convert_document(
+    item: TranslationItem, converter: Converter, options: ConvertOptions | None = None
+) -> tuple[Exception | None, bool]:
+    """
+    Run all steps of one document on the calling thread.
+
+    Once item.cancel is set, the document is given up before its OCR or commit step
+    with a ConversionCancelled error, and nothing is written.
+
+    Args:
+        item: TranslationItem containing input and output file paths
+        converter: The format specific steps
+        options: Converter tuning shared by the whole run
+
+    Returns:
+        tuple: (error, success) where error is None if successful and success is True if file was processed
+    """
+    options = options or ConvertOptions()
+    cache = open_result_cache(options)
+    # The final name depends on the detected language, write to a partial file first
+    temp_output = partial_path(item.output_file, item.owner)
+    try:
+        if cache is not None and cache_step(item, temp_output, cache):
+            err = cancelled(item) or commit_step(item, temp_output)
+            return err, err is None
+        checkpoint: OcrCheckpoint | None = None
+        err = extract_step(item, temp_output, converter)
+        if is_timeout(err):
+            return err, False
+        if err is not None:
+            stop = cancelled(item)
+            if stop is not None:
+                return stop, False
+            err, checkpoint = ocr_step(item, temp_output, converter, options)
+            if err is not None:
+                return err, False
+        language_step(item, temp_output, options)
+        err = cancelled(item) or commit_step(item, temp_output, checkpoint, cache)
+        return err, err is None
+    finally:
+        temp_output.unlink(missing_ok=True)
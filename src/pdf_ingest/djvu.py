@@ -1,12 +1,21 @@
-import shutil
+import os
+import queue
 import subprocess
 import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from tempfile import TemporaryDirectory
 
-from pdf_ingest.json_util import update_json_with_language
-from pdf_ingest.language_detection import detect_language_from_file
-from pdf_ingest.types import TranslationItem
+from pdf_ingest.checkpoint import OcrCheckpoint
+from pdf_ingest.convert import Converter, convert_document
+from pdf_ingest.metrics import note_pages
+from pdf_ingest.ocr_language import resolve_ocr_language, tesseract_args
+from pdf_ingest.supervisor import cached_page_count, guess_pages, run, timeouts_enabled
+from pdf_ingest.text_quality import page_needs_ocr
+from pdf_ingest.types import ConvertOptions, TranslationItem
+
+# Pages are already OCR'd in parallel, keep each tesseract single threaded
+_TESSERACT_ENV = {**os.environ, "OMP_THREAD_LIMIT": "1"}
 
 
 def convert_djvu_to_text(djvu_file: Path, txt_file_out: Path) -> Exception | None:
@@ -14,149 +23,351 @@ def convert_djvu_to_text(djvu_file: Path, txt_file_out: Path) -> Exception | Non
     Convert a DJVU file to text using djvutxt
     """
     try:
-        subprocess.run(
+        run(
             ["djvutxt", str(djvu_file), str(txt_file_out)],
-            check=True,
+            # Reading the page count would cost another process per document
+            pages=guess_pages(djvu_file) if timeouts_enabled() else None,
         )
         return None
     except subprocess.CalledProcessError as e:
         print(f"Error converting {djvu_file.name} to text: {e}")
         return e
+    except subprocess.TimeoutExpired as e:
+        print(f"Timed out converting {djvu_file.name} to text: {e}")
+        return e
     except Exception as e:
         print(f"Unexpected error processing {djvu_file.name}: {e}")
         return e
 
 
+def get_djvu_page_count(djvu_file: Path) -> int | None:
+    """
+    Read the page count of a DJVU file with djvused, once per version of the file.
+
+    Returns:
+        int | None: The number of pages, or None if djvused could not tell
+    """
+    return cached_page_count(djvu_file, _read_djvu_page_count)
+
+
+def _read_djvu_page_count(djvu_file: Path) -> int | None:
+    try:
+        completed = run(
+            ["djvused", "-e", "n", str(djvu_file)], capture_output=True, text=True
+        )
+        return int(completed.stdout.strip())
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        print(f"Error reading page count of {djvu_file.name}: {e}")
+        return None
+
+
+def extract_djvu_page_text(djvu_file: Path, page: int) -> str | None:
+    """
+    Extract the hidden text layer of a single page with djvutxt.
+
+    Returns:
+        str | None: The page text, empty if the page has none, or None if djvutxt
+            failed on this page
+    """
+    try:
+        completed = run(
+            ["djvutxt", f"--page={page}", str(djvu_file)], capture_output=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting page {page} of {djvu_file.name}: {e}")
+        return None
+    return completed.stdout.decode("utf-8", errors="replace").rstrip("\f")
+
+
+class _ScratchBudget:
+    """
+    Counts rendered page images that have not been OCR'd yet.
+
+    The renderer reserves room for a whole chunk before calling ddjvu, and every OCR
+    task gives its page back once the image is deleted.
+    """
+
+    def __init__(self, max_pages: int) -> None:
+        self._max_pages = max_pages
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, pages: int) -> bool:
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._closed or self._in_use + pages <= self._max_pages
+            )
+            if self._closed:
+                return False
+            self._in_use += pages
+            return True
+
+    def release(self, pages: int = 1) -> None:
+        with self._cond:
+            self._in_use -= pages
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _render_djvu_pages(
+    djvu_file: Path, first: int, last: int, chunk_dir: Path
+) -> list[Path]:
+    """
+    Render a page range with a single ddjvu call, one TIFF per page.
+    """
+    chunk_dir.mkdir()
+    run(
+        [
+            "ddjvu",
+            "-format=tiff",
+            "-mode=black",
+            "-quality=150",
+            "-eachpage",
+            f"-page={first}-{last}",
+            str(djvu_file),
+            str(chunk_dir / "page-%04d.tif"),
+        ],
+        pages=last - first + 1,
+    )
+    images = sorted(chunk_dir.glob("page-*.tif"))
+    if len(images) != last - first + 1:
+        raise RuntimeError(
+            f"ddjvu rendered {len(images)} images for pages {first}-{last} of {djvu_file.name}"
+        )
+    return images
+
+
+def _page_ranges(pages: list[int], chunk_pages: int) -> list[tuple[int, int]]:
+    """
+    Group sorted page numbers into runs of consecutive pages, at most chunk_pages long.
+    """
+    ranges: list[tuple[int, int]] = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page - 1 and page - ranges[-1][0] < chunk_pages:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def _ocr_image(
+    image_file: Path,
+    budget: _ScratchBudget,
+    page: int,
+    checkpoint: OcrCheckpoint | None = None,
+    args: list[str] | None = None,
+) -> str:
+    """
+    OCR a rendered page with tesseract, then delete the image and free its budget.
+    The text is saved to the checkpoint, if given, as soon as it is ready.
+    """
+    try:
+        completed = run(
+            ["tesseract", str(image_file), "stdout", *(args or [])],
+            stage="ocr",
+            capture_output=True,
+            env=_TESSERACT_ENV,
+        )
+        text = completed.stdout.decode("utf-8", errors="replace")
+    finally:
+        image_file.unlink(missing_ok=True)
+        budget.release()
+    if checkpoint is not None:
+        checkpoint.save(page, text)
+    return text
+
+
+def _ocr_djvu_sample(
+    djvu_file: Path, page: int, temp_dir: Path, args: list[str]
+) -> str:
+    """
+    Render and OCR a single page, for picking the OCR language.
+    """
+    images = _render_djvu_pages(djvu_file, page, page, temp_dir / f"sample-{page:06d}")
+    try:
+        completed = run(
+            ["tesseract", str(images[0]), "stdout", *args],
+            stage="ocr",
+            capture_output=True,
+            env=_TESSERACT_ENV,
+        )
+    finally:
+        images[0].unlink(missing_ok=True)
+    return completed.stdout.decode("utf-8", errors="replace")
+
+
 def convert_djvu_to_text_via_ocr(
-    djvu_file: Path, txt_file_out: Path
+    djvu_file: Path,
+    txt_file_out: Path,
+    options: ConvertOptions | None = None,
+    checkpoint: OcrCheckpoint | None = None,
 ) -> Exception | None:
     """
     Convert a DJVU file to text using OCR with djvulibre-bin
+
+    The hidden text layer of every page is read first, pages where it is present and
+    passes text_quality.page_needs_ocr keep it. Only the other pages are rendered and
+    OCR'd.
+
+    Pages are rendered in chunks of options.djvu_chunk_pages and OCR'd on a thread pool
+    while the next chunk renders. At most options.max_scratch_pages rendered images
+    exist at any time, whatever the page count of the book, and each image is deleted
+    as soon as it has been OCR'd. Page sections are written in page order as soon as
+    they are ready.
+
+    With a checkpoint, every OCR'd page is saved as soon as it is done, and pages
+    saved by an earlier, interrupted run are not rendered or OCR'd again.
+
+    With options.ocr_language set to "auto", a few pages are OCR'd first to pick the
+    tesseract language, see ocr_language.
+
+    Args:
+        djvu_file: The DJVU file to OCR
+        txt_file_out: Where to write the text
+        options: Worker count, chunk size and scratch limits
+        checkpoint: Where to save and resume OCR'd pages
     """
+    options = options or ConvertOptions()
+    page_count = get_djvu_page_count(djvu_file)
+    if not page_count:
+        return ValueError(f"Could not determine the page count of {djvu_file.name}")
+    note_pages(page_count)
+    workers = options.ocr_workers or os.cpu_count() or 1
+    budget = _ScratchBudget(options.max_scratch_pages)
+    pending: queue.Queue[Future[str] | None] = queue.Queue()
+    done = checkpoint.pages() if checkpoint is not None else set()
+    # Page texts that need no OCR, from the text layer and the language samples
+    known: dict[int, str] = {}
+
     try:
+        for page in range(1, page_count + 1):
+            if page in done:
+                continue
+            text = extract_djvu_page_text(djvu_file, page)
+            if text is not None and not page_needs_ocr(text):
+                known[page] = text
+        todo = [
+            page
+            for page in range(1, page_count + 1)
+            if page not in done and page not in known
+        ]
+        print(f"{djvu_file.name}: OCR'ing {len(todo)} of {page_count} pages")
+
         # Create a temporary directory for intermediate files
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(dir=options.scratch_dir) as temp_dir:
             temp_dir_path = Path(temp_dir)
-
-            # Extract all pages as images using ddjvu
-            temp_image_pattern = temp_dir_path / f"{djvu_file.stem}-%04d.tif"
-            subprocess.run(
-                [
-                    "ddjvu",
-                    "-format=tiff",
-                    "-mode=black",
-                    "-quality=150",
-                    str(djvu_file),
-                    str(temp_image_pattern),
-                ],
-                check=True,
+            samples: dict[int, str] = {}
+            options = resolve_ocr_language(
+                djvu_file,
+                todo,
+                lambda page, args: _ocr_djvu_sample(
+                    djvu_file, page, temp_dir_path, args
+                ),
+                options,
+                text_hint="\n".join(known.values()),
+                samples=samples,
             )
+            if options.ocr_language not in (None, "eng"):
+                # OCR'd with the default model, redo them with the chosen language
+                samples.clear()
+            for page, text in samples.items():
+                if checkpoint is not None:
+                    checkpoint.save(page, text)
+            known.update(samples)
+            todo = [page for page in todo if page not in samples]
+            args = tesseract_args(options.ocr_language)
+            with ThreadPoolExecutor(max_workers=workers) as ocr_executor:
 
-            # Process each image with tesseract OCR and append to output file
-            with open(txt_file_out, "w", encoding="utf-8") as output_file:
-                for image_file in sorted(temp_dir_path.glob(f"{djvu_file.stem}-*.tif")):
-                    # Create temporary text file for this page
-                    temp_txt = temp_dir_path / f"{image_file.stem}.txt"
-
-                    # Run OCR on the image
-                    subprocess.run(
-                        ["tesseract", str(image_file), str(temp_txt.with_suffix(""))],
-                        check=True,
-                    )
-
-                    # Append the page text to the output file
-                    if temp_txt.exists():
-                        with open(temp_txt, "r", encoding="utf-8") as page_file:
-                            output_file.write(
-                                f"\n--- Page {image_file.stem.split('-')[-1]} ---\n\n"
+                def render_all() -> None:
+                    try:
+                        for first, last in _page_ranges(todo, options.djvu_chunk_pages):
+                            if not budget.acquire(last - first + 1):
+                                return
+                            chunk_dir = temp_dir_path / f"pages-{first:06d}"
+                            images = _render_djvu_pages(
+                                djvu_file, first, last, chunk_dir
                             )
-                            output_file.write(page_file.read())
-                            output_file.write("\n\n")
+                            for page, image in enumerate(images, start=first):
+                                pending.put(
+                                    ocr_executor.submit(
+                                        _ocr_image,
+                                        image,
+                                        budget,
+                                        page,
+                                        checkpoint,
+                                        args,
+                                    )
+                                )
+                    finally:
+                        pending.put(None)
+
+                with ThreadPoolExecutor(max_workers=1) as render_executor:
+                    renderer = render_executor.submit(render_all)
+                    drained = False
+                    try:
+                        with open(txt_file_out, "w", encoding="utf-8") as output_file:
+                            for page in range(1, page_count + 1):
+                                if page in known:
+                                    text = known[page]
+                                elif page in done:
+                                    assert checkpoint is not None
+                                    text = checkpoint.load(page) or ""
+                                else:
+                                    future = pending.get()
+                                    if future is None:
+                                        drained = True
+                                        break
+                                    text = future.result()
+                                output_file.write(f"\n--- Page {page:04d} ---\n\n")
+                                output_file.write(text)
+                                output_file.write("\n\n")
+                        if not drained:
+                            drained = pending.get() is None
+                        # Surface rendering errors
+                        renderer.result()
+                        if not drained:
+                            raise RuntimeError(
+                                f"Rendered more pages than expected from {djvu_file.name}"
+                            )
+                    finally:
+                        # Stop rendering and don't OCR the rest of the book after a failure
+                        budget.close()
+                        while not drained and (future := pending.get()) is not None:
+                            future.cancel()
 
         return None
     except subprocess.CalledProcessError as e:
         print(f"Error OCR'ing and converting {djvu_file.name} to text: {e}")
         return e
+    except subprocess.TimeoutExpired as e:
+        print(f"Timed out OCR'ing {djvu_file.name}: {e}")
+        return e
     except Exception as e:
         print(f"Unexpected error processing {djvu_file.name}: {e}")
         return e
 
 
-def process_djvu_file(item: TranslationItem) -> tuple[Exception | None, bool]:
+DJVU_CONVERTER = Converter(
+    extract=convert_djvu_to_text, ocr=convert_djvu_to_text_via_ocr
+)
+
+
+def process_djvu_file(
+    item: TranslationItem, options: ConvertOptions | None = None
+) -> tuple[Exception | None, bool]:
     """
-    Process a DJVU file and convert it to text.
-    Uses a temporary directory for the conversion process and then copies the result to the final destination.
+    Process a DJVU file and convert it to text, see convert.convert_document().
 
     Args:
         item: TranslationItem containing input and output file paths
+        options: Converter tuning shared by the whole run
 
     Returns:
         tuple: (error, success) where error is None if successful and success is True if file was processed
     """
-    with TemporaryDirectory() as temp_dir:
-        # Create a temporary output file path
-        temp_output = Path(temp_dir) / f"temp_{item.input_file.name}.txt"
-
-        # First try regular DJVU to text conversion
-        err = convert_djvu_to_text(djvu_file=item.input_file, txt_file_out=temp_output)
-        if err is not None:
-            print(
-                f"Regular conversion failed for {item.input_file.name}, trying OCR..."
-            )
-            # If regular conversion fails, try OCR
-            err = convert_djvu_to_text_via_ocr(
-                djvu_file=item.input_file, txt_file_out=temp_output
-            )
-            if err is not None:
-                print(f"OCR conversion also failed for {item.input_file.name}")
-                return err, False
-            else:
-                # Detect language from the temporary file
-                lang_code, is_reliable = detect_language_from_file(temp_output)
-                item.language = lang_code
-                item.should_translate = lang_code.lower() == "en"
-
-                # Update the output filename to include language code
-                stem = item.output_file.stem
-                suffix = item.output_file.suffix
-                new_filename = f"{stem}-{lang_code.upper()}{suffix}"
-                item.output_file = item.output_file.with_name(new_filename)
-
-                # Update JSON with language information
-                update_json_with_language(item.json_file, lang_code, is_reliable)
-
-                # Copy from temp location to final destination
-                try:
-                    shutil.copy2(temp_output, item.output_file)
-                    print(
-                        f"Successfully converted {item.input_file.name} using OCR (language: {lang_code})"
-                    )
-                    return None, True
-                except Exception as copy_err:
-                    print(f"Error copying file from temporary location: {copy_err}")
-                    return copy_err, False
-        else:
-            # Detect language from the temporary file
-            lang_code, is_reliable = detect_language_from_file(temp_output)
-            item.language = lang_code
-            item.should_translate = lang_code.lower() == "en"
-
-            # Update the output filename to include language code
-            stem = item.output_file.stem
-            suffix = item.output_file.suffix
-            new_filename = f"{stem}-{lang_code.upper()}{suffix}"
-            item.output_file = item.output_file.with_name(new_filename)
-
-            # Update JSON with language information
-            update_json_with_language(item.json_file, lang_code, is_reliable)
-
-            # Copy from temp location to final destination
-            try:
-                shutil.copy2(temp_output, item.output_file)
-                print(
-                    f"Successfully converted {item.input_file.name} using embedded text (language: {lang_code})"
-                )
-                return None, True
-            except Exception as copy_err:
-                print(f"Error copying file from temporary location: {copy_err}")
-                return copy_err, False
+    return convert_document(item, DJVU_CONVERTER, options)
@@ -1,9 +1,40 @@
 import json
+import os
 from pathlib import Path
 
+from pdf_ingest.atomic import partial_path
+
+
+def write_json_atomic(json_file: Path, json_data: dict, indent: int | None = 2) -> None:
+    """
+    Write a JSON file through a partial file and a rename, readers never see half of it.
+
+    Unlike the text output this is not fsynced: a sidecar lost to a power cut only
+    makes the next run convert the document again.
+
+    Args:
+        json_file: Path to the JSON file to write
+        json_data: The contents
+        indent: Indentation passed to json.dump
+    """
+    temp_file = partial_path(json_file)
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(json_data, f, indent=indent)
+    os.replace(temp_file, json_file)
+
+
+def should_translate(lang_code: str) -> bool:
+    """
+    Whether a document in this language is sent on to translation.
+    """
+    return lang_code.lower() == "en"
+
 
 def update_json_with_language(
-    json_file: Path, lang_code: str, is_reliable: bool
+    json_file: Path,
+    lang_code: str,
+    is_reliable: bool,
+    json_data: dict | None = None,
 ) -> None:
     """
     Update the JSON file with the language information.
@@ -12,25 +43,27 @@ def update_json_with_language(
         json_file: Path to the JSON file to update
         lang_code: Language code
         is_reliable: Whether the language detection is reliable
+        json_data: Current contents of the file if the caller knows them, saves reading it
     """
     try:
         # Read existing JSON data
-        json_data = {}
-        if json_file.exists():
+        data: dict = {}
+        if json_data is not None:
+            data = dict(json_data)
+        elif json_file.exists():
             with open(json_file, "r", encoding="utf-8") as f:
                 try:
-                    json_data = json.load(f)
+                    data = json.load(f)
                 except json.JSONDecodeError:
-                    json_data = {}
+                    data = {}
 
         # Update language information
-        json_data["language"] = lang_code
-        json_data["language_detection_reliable"] = is_reliable
-        json_data["should_translate"] = lang_code == "EN"
+        data["language"] = lang_code
+        data["language_detection_reliable"] = is_reliable
+        data["should_translate"] = should_translate(lang_code)
 
         # Write updated JSON data
-        with open(json_file, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=2)
+        write_json_atomic(json_file, data)
 
         print(
             f"Updated language information in {json_file}: {lang_code} (reliable: {is_reliable})"
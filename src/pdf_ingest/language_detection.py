@@ -1,41 +1,281 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-from langdetect import detect
+# Number of evenly spaced windows read from a text file for language detection
+SAMPLE_WINDOWS = 8
+# Size of each window in bytes
+SAMPLE_WINDOW_BYTES = 4096
+# Minimum confidence for a sampled detection to be reported as reliable
+MIN_CONFIDENCE = 0.6
+# Windows with fewer visible characters than this don't get a vote
+_MIN_WINDOW_CHARS = 20
 
+DEFAULT_BACKEND = "langdetect"
+# Path of the fastText language identification model (lid.176.bin or lid.176.ftz)
+FASTTEXT_MODEL_ENV = "PDF_INGEST_FASTTEXT_MODEL"
+_DEFAULT_FASTTEXT_MODEL = Path("/app/models/lid.176.ftz")
 
-def language_detect(text: str) -> tuple[str, bool]:
+
+@dataclass
+class LanguageSample:
     """
-    Detect the language of the given text using fasttext-langdetect.
+    Majority vote of the language detected in sampled windows of a file.
     """
-    try:
-        # fasttext returns ISO 639-1 language codes
-        language = detect(text)
-        # fasttext doesn't provide reliability info, so we'll consider it reliable
-        # if we get a non-empty result
-        is_reliable = bool(language)
-        return language, is_reliable
-    except Exception:
-        return "unknown", False
 
+    language: str
+    confidence: float  # 0..1, share of the windows backing the language, weighted by probability
+    votes: int  # windows that voted for the language
+    windows: int  # windows that had enough text to vote
+
+    @property
+    def is_reliable(self) -> bool:
+        return self.language != "unknown" and self.confidence >= MIN_CONFIDENCE
+
+
+class LanguageBackend(ABC):
+    """
+    A language identification engine.
+
+    Backends are created once per process by get_backend() and shared by all threads,
+    so the model is loaded once and reused across calls.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def _detect(self, text: str) -> tuple[str, float]:
+        """Return the ISO 639-1 code and probability of the most likely language."""
+
+    def detect(self, text: str) -> tuple[str, float]:
+        """
+        Detect the most likely language of the text.
+
+        Returns:
+            tuple: (language_code, probability), ("unknown", 0.0) if nothing was detected
+        """
+        if not text.strip():
+            return "unknown", 0.0
+        try:
+            return self._detect(text)
+        except Exception:
+            return "unknown", 0.0
+
+
+class LangdetectBackend(LanguageBackend):
+    """
+    Pure Python port of Google's language-detection, seeded to be deterministic.
+    """
+
+    name = "langdetect"
+
+    def __init__(self) -> None:
+        from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+
+        self._factory = DetectorFactory()
+        self._factory.load_profile(PROFILES_DIRECTORY)
+        # Without a seed langdetect samples n-grams randomly and results vary between runs
+        self._factory.seed = 0
 
-def detect_language_from_file(txt_file: Path) -> tuple[str, bool]:
+    def _detect(self, text: str) -> tuple[str, float]:
+        detector = self._factory.create()
+        detector.append(text)
+        best = detector.get_probabilities()[0]
+        return best.lang, best.prob
+
+
+class FastTextBackend(LanguageBackend):
+    """
+    Compiled fastText classifier with the lid.176 language identification model.
+
+    Needs the optional fasttext (or fasttext-wheel) package and a model file, taken
+    from the PDF_INGEST_FASTTEXT_MODEL environment variable.
+    """
+
+    name = "fasttext"
+
+    def __init__(self) -> None:
+        import fasttext  # type: ignore
+
+        model_path = Path(os.environ.get(FASTTEXT_MODEL_ENV, _DEFAULT_FASTTEXT_MODEL))
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"fastText model {model_path} does not exist, download lid.176.ftz and set {FASTTEXT_MODEL_ENV}"
+            )
+        self._model: Any = fasttext.load_model(str(model_path))
+
+    def _detect(self, text: str) -> tuple[str, float]:
+        # fastText predicts one line at a time. The low level predict avoids the numpy
+        # copy=False call in the Python wrapper that breaks with numpy 2.
+        predictions = self._model.f.predict(" ".join(text.split()), 1, 0.0, "replace")
+        if not predictions:
+            return "unknown", 0.0
+        probability, label = predictions[0]
+        return label.removeprefix("__label__"), float(probability)
+
+
+class Cld3Backend(LanguageBackend):
+    """
+    Google's Compact Language Detector v3 neural network, via the optional gcld3 package.
+    """
+
+    name = "cld3"
+
+    def __init__(self) -> None:
+        import gcld3  # type: ignore
+
+        self._lock = threading.Lock()
+        self._identifier: Any = gcld3.NNetLanguageIdentifier(  # type: ignore
+            min_num_bytes=0, max_num_bytes=SAMPLE_WINDOW_BYTES
+        )
+
+    def _detect(self, text: str) -> tuple[str, float]:
+        # The identifier keeps scratch state between calls
+        with self._lock:
+            result = self._identifier.FindLanguage(text=text)
+        if result.language == "und":
+            return "unknown", 0.0
+        return result.language, float(result.probability)
+
+
+BACKENDS: dict[str, type[LanguageBackend]] = {
+    backend.name: backend
+    for backend in (LangdetectBackend, FastTextBackend, Cld3Backend)
+}
+
+_backends: dict[str, LanguageBackend] = {}
+_backends_lock = threading.Lock()
+_default_backend_name = DEFAULT_BACKEND
+
+
+def get_backend(name: str | None = None) -> LanguageBackend:
+    """
+    Return the process wide instance of a backend, loading its model on first use.
+
+    Args:
+        name: One of BACKENDS, defaults to the backend chosen with set_default_backend()
+
+    Returns:
+        LanguageBackend: The shared backend instance
+    """
+    name = name or _default_backend_name
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown language backend {name!r}, expected one of {sorted(BACKENDS)}"
+        )
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            backend = BACKENDS[name]()
+            _backends[name] = backend
+        return backend
+
+
+def set_default_backend(name: str) -> None:
+    """
+    Choose the backend used when no backend is passed explicitly.
+
+    The backend is loaded right away, so a missing optional dependency or model fails
+    before any document is converted.
+    """
+    global _default_backend_name
+    get_backend(name)
+    _default_backend_name = name
+
+
+def language_detect(text: str, backend: str | None = None) -> tuple[str, bool]:
+    """
+    Detect the language of the given text.
+
+    Args:
+        text: The text to detect
+        backend: Name of the backend to use, defaults to the process default (langdetect)
+
+    Returns:
+        tuple: (language_code, is_reliable), ("unknown", False) if nothing was detected
+    """
+    language, _ = get_backend(backend).detect(text)
+    return language, language != "unknown"
+
+
+def _read_windows(txt_file: Path, windows: int, window_bytes: int) -> list[str]:
+    size = txt_file.stat().st_size
+    with open(txt_file, "rb") as f:
+        if size <= windows * window_bytes:
+            return [f.read().decode("utf-8", errors="ignore")]
+        chunks: list[str] = []
+        for i in range(windows):
+            f.seek(i * (size - window_bytes) // (windows - 1))
+            # Multi-byte characters cut at the window edges are dropped by errors="ignore"
+            chunks.append(f.read(window_bytes).decode("utf-8", errors="ignore"))
+        return chunks
+
+
+def sample_language_from_file(
+    txt_file: Path,
+    windows: int = SAMPLE_WINDOWS,
+    window_bytes: int = SAMPLE_WINDOW_BYTES,
+    backend: str | None = None,
+) -> LanguageSample:
+    """
+    Detect the language of a text file from evenly spaced windows.
+
+    At most windows * window_bytes bytes are read, so latency and memory don't grow
+    with the size of the file. Small files are detected in one go.
+
+    Args:
+        txt_file: Path to the text file
+        windows: Number of windows to read
+        window_bytes: Size of each window in bytes
+        backend: Name of the backend to use, defaults to the process default
+
+    Returns:
+        LanguageSample: The majority language and its confidence
+    """
+    language_backend = get_backend(backend)
+    votes: Counter[str] = Counter()
+    weights: dict[str, float] = {}
+    voting_windows = 0
+    for chunk in _read_windows(txt_file, max(windows, 2), window_bytes):
+        if sum(len(token) for token in chunk.split()) < _MIN_WINDOW_CHARS:
+            continue
+        voting_windows += 1
+        language, probability = language_backend.detect(chunk)
+        if language == "unknown":
+            continue
+        votes[language] += 1
+        weights[language] = weights.get(language, 0.0) + probability
+    if not votes:
+        return LanguageSample("unknown", 0.0, 0, voting_windows)
+    language, count = votes.most_common(1)[0]
+    return LanguageSample(
+        language=language,
+        confidence=weights[language] / voting_windows,
+        votes=count,
+        windows=voting_windows,
+    )
+
+
+def detect_language_from_file(
+    txt_file: Path, backend: str | None = None
+) -> tuple[str, bool]:
     """
     Detect the language of the text file.
 
     Args:
         txt_file: Path to the text file
+        backend: Name of the backend to use, defaults to the process default
 
     Returns:
         tuple: (language_code, is_reliable)
     """
     try:
-        # Read the text file
-        with open(txt_file, "r", encoding="utf-8") as f:
-            text = f.read()
-
-        # Detect language
-        lang_code, is_reliable = language_detect(text)
-        return lang_code, is_reliable
+        sample = sample_language_from_file(txt_file, backend=backend)
+        return sample.language, sample.is_reliable
 
     except Exception as e:
         print(f"Error detecting language: {e}")
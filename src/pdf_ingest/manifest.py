@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+MANIFEST_NAME = ".pdf_ingest_manifest.jsonl"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """
+    Stream a file through blake2b and return the hex digest.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    """
+    One finished conversion, as recorded in the manifest.
+    """
+
+    input_file: str  # posix path relative to the input directory
+    size: int
+    mtime_ns: int
+    content_hash: str | None
+    output_file: str  # posix path relative to the output directory
+    language: str
+    method: str
+    duration: float
+
+
+class Manifest:
+    """
+    Append-only JSONL record of finished conversions, stored in the output directory.
+
+    The whole file is loaded into a dict keyed by relative input path, so lookups are
+    O(1) per file. When an input is converted more than once, the last line wins.
+    """
+
+    def __init__(self, output_dir: Path, use_content_hash: bool = False) -> None:
+        self.output_dir = output_dir
+        self.path = output_dir / MANIFEST_NAME
+        self.use_content_hash = use_content_hash
+        self._entries: dict[str, ManifestEntry] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = ManifestEntry(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    # A crash mid-append can leave a truncated last line behind
+                    print(f"Ignoring malformed manifest line in {self.path}")
+                    continue
+                self._entries[entry.input_file] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, rel_path: Path) -> ManifestEntry | None:
+        return self._entries.get(rel_path.as_posix())
+
+    def is_done(self, input_file: Path, rel_path: Path) -> bool:
+        """
+        Check whether the input file was already converted and is unchanged since.
+
+        Args:
+            input_file: Absolute path of the input file
+            rel_path: Path of the input file relative to the input directory
+
+        Returns:
+            bool: True if the recorded output still exists and matches the input
+        """
+        entry = self.lookup(rel_path)
+        if entry is None:
+            return False
+        if not (self.output_dir / entry.output_file).exists():
+            return False
+        return self._unchanged(input_file, entry)
+
+    def stale_entry(self, input_file: Path, rel_path: Path) -> ManifestEntry | None:
+        """
+        The entry of an input file that was converted but has changed since.
+
+        Args:
+            input_file: Absolute path of the input file
+            rel_path: Path of the input file relative to the input directory
+
+        Returns:
+            ManifestEntry | None: The outdated entry, None if the file was never
+                converted or is unchanged
+        """
+        entry = self.lookup(rel_path)
+        if entry is None or self._unchanged(input_file, entry):
+            return None
+        return entry
+
+    def _unchanged(self, input_file: Path, entry: ManifestEntry) -> bool:
+        stat = input_file.stat()
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        # Same size but touched (copied, restored from backup, ...): the hash decides
+        if self.use_content_hash and entry.content_hash is not None:
+            return hash_file(input_file) == entry.content_hash
+        return False
+
+    def record(
+        self,
+        input_file: Path,
+        rel_path: Path,
+        output_file: Path,
+        language: str,
+        method: str,
+        duration: float,
+        content_hash: str | None = None,
+    ) -> ManifestEntry:
+        """
+        Append a finished conversion to the manifest. Safe to call from worker threads.
+
+        Args:
+            input_file: Absolute path of the input file
+            rel_path: Path of the input file relative to the input directory
+            output_file: Absolute path of the written text file
+            language: Detected language code
+            method: Extraction method, e.g. "text" or "ocr"
+            duration: Conversion wall time in seconds
+            content_hash: hash_file() of the input, if already known
+
+        Returns:
+            ManifestEntry: The recorded entry
+        """
+        stat = input_file.stat()
+        if self.use_content_hash:
+            content_hash = content_hash or hash_file(input_file)
+        else:
+            content_hash = None
+        entry = ManifestEntry(
+            input_file=rel_path.as_posix(),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            content_hash=content_hash,
+            output_file=output_file.relative_to(self.output_dir).as_posix(),
+            language=language,
+            method=method,
+            duration=round(duration, 3),
+        )
+        line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[entry.input_file] = entry
+        return entry
@@ -0,0 +1,164 @@
+"""
+Consolidated SQLite index of the per-document metadata.
+
+The sidecar JSON files are what downstream tools have always read, but querying a
+100k document library through them means opening 100k small files. The index keeps
+one row per input file (language, reliability, should_translate, method, page count,
+size and conversion time) in a single SQLite file in the output directory:
+
+    sqlite3 output/.pdf_ingest_index.sqlite \\
+        "SELECT language, count(*) FROM documents GROUP BY language"
+
+Rows are buffered and written in batches, one transaction per batch. SQLite is in the
+standard library and, unlike Parquet, can be updated in place as documents finish.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass, fields
+from pathlib import Path
+
+from pdf_ingest.types import TranslationItem
+
+INDEX_NAME = ".pdf_ingest_index.sqlite"
+
+_BATCH_SIZE = 256
+
+# The default rollback journal, WAL needs shared memory that network filesystems lack
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    input_file TEXT PRIMARY KEY,
+    output_file TEXT NOT NULL,
+    language TEXT NOT NULL,
+    language_reliable INTEGER NOT NULL,
+    should_translate INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    pages INTEGER,
+    size INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    converted_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class IndexRecord:
+    """
+    One converted document, as stored in the index.
+    """
+
+    input_file: str  # posix path relative to the input directory
+    output_file: str  # posix path relative to the output directory
+    language: str
+    language_reliable: bool
+    should_translate: bool
+    method: str
+    pages: int | None
+    size: int
+    duration: float
+    converted_at: float
+
+
+_COLUMNS = [f.name for f in fields(IndexRecord)]
+
+
+class MetadataIndex:
+    """
+    Thread safe, batched writer of IndexRecords.
+    """
+
+    def __init__(self, output_dir: Path, batch_size: int = _BATCH_SIZE) -> None:
+        self.output_dir = output_dir
+        self.path = output_dir / INDEX_NAME
+        self.batch_size = batch_size
+        self._pending: list[IndexRecord] = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+
+    def record(self, item: TranslationItem, rel_path: Path, duration: float) -> None:
+        """
+        Queue the row of a converted document.
+
+        Args:
+            item: The converted item, with its language and method filled in
+            rel_path: Path of the input file relative to the input directory
+            duration: Conversion time in seconds
+        """
+        try:
+            size = item.input_file.stat().st_size
+        except OSError:
+            size = 0
+        try:
+            output_file = item.output_file.relative_to(self.output_dir).as_posix()
+        except ValueError:
+            output_file = item.output_file.as_posix()
+        self.add(
+            IndexRecord(
+                input_file=rel_path.as_posix(),
+                output_file=output_file,
+                language=item.language,
+                language_reliable=item.language_reliable,
+                should_translate=item.should_translate,
+                method=item.method,
+                pages=item.pages,
+                size=size,
+                duration=round(duration, 4),
+                converted_at=time.time(),
+            )
+        )
+
+    def add(self, record: IndexRecord) -> None:
+        """
+        Queue a record, the batch is written once it is full.
+        """
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """
+        Write the queued records.
+        """
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO documents ({', '.join(_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                [astuple(record) for record in self._pending],
+            )
+        self._pending.clear()
+
+    def close(self) -> None:
+        """
+        Write the queued records and close the database.
+        """
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def records(self) -> list[IndexRecord]:
+        """
+        All written records, ordered by input file.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents ORDER BY input_file"
+            ).fetchall()
+        return [_from_row(row) for row in rows]
+
+
+def _from_row(row: tuple) -> IndexRecord:
+    record = IndexRecord(*row)
+    record.language_reliable = bool(record.language_reliable)
+    record.should_translate = bool(record.should_translate)
+    return record
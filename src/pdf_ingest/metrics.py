@@ -0,0 +1,244 @@
+"""
+Per-stage instrumentation of the conversion pipeline.
+
+Every stage of a document (cache, extract, ocr, language, json, commit) is wrapped in
+stage(), which records wall time, CPU time of reaped child processes, bytes in and out
+and the page count when a converter reports it with note_pages(). Records go to a JSON lines
+file or are aggregated into a Prometheus textfile, as set up with configure_metrics().
+Without configuration, stage() only measures and nothing is written.
+
+Child CPU time comes from getrusage(RUSAGE_CHILDREN), which is process wide: with
+several jobs in flight a stage is also charged for children of other threads that
+exit during it. Totals over a run are exact, per-document splits are approximate.
+"""
+
+import json
+import os
+import resource
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+FORMATS = ("jsonl", "prometheus")
+
+# Minimum time between two rewrites of the Prometheus textfile
+_TEXTFILE_INTERVAL = 10.0
+
+
+@dataclass
+class StageRecord:
+    """
+    Measurements of one stage of one document.
+    """
+
+    document: str
+    stage: str
+    ok: bool
+    wall_seconds: float
+    child_cpu_seconds: float
+    bytes_in: int
+    bytes_out: int
+    pages: int | None
+    timestamp: float
+
+
+@dataclass
+class _StageTotals:
+    count: int = 0
+    failures: int = 0
+    wall_seconds: float = 0.0
+    child_cpu_seconds: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    pages: int = 0
+
+
+@dataclass
+class _ActiveStage:
+    ok: bool = True
+    pages: int | None = None
+    output: Path | None = None
+
+
+class MetricsRecorder:
+    """
+    Thread safe sink for StageRecords.
+    """
+
+    def __init__(self, path: Path, fmt: str = "jsonl") -> None:
+        if fmt not in FORMATS:
+            raise ValueError(
+                f"Unknown metrics format {fmt!r}, expected one of {FORMATS}"
+            )
+        self.path = path
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self._totals: dict[str, _StageTotals] = {}
+        self._last_write = 0.0
+
+    def record(self, record: StageRecord) -> None:
+        with self._lock:
+            if self.fmt == "jsonl":
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(record)) + "\n")
+                return
+            totals = self._totals.setdefault(record.stage, _StageTotals())
+            totals.count += 1
+            totals.failures += not record.ok
+            totals.wall_seconds += record.wall_seconds
+            totals.child_cpu_seconds += record.child_cpu_seconds
+            totals.bytes_in += record.bytes_in
+            totals.bytes_out += record.bytes_out
+            totals.pages += record.pages or 0
+            if time.monotonic() - self._last_write >= _TEXTFILE_INTERVAL:
+                self._write_textfile()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self.fmt == "prometheus":
+                self._write_textfile()
+
+    def _write_textfile(self) -> None:
+        metrics = [
+            ("count", "counter", "Stages run"),
+            ("failures", "counter", "Stages that raised or reported an error"),
+            ("wall_seconds", "counter", "Wall time spent in the stage"),
+            (
+                "child_cpu_seconds",
+                "counter",
+                "CPU time of child processes reaped during the stage",
+            ),
+            ("bytes_in", "counter", "Bytes read by the stage"),
+            ("bytes_out", "counter", "Bytes written by the stage"),
+            ("pages", "counter", "Pages handled by the stage"),
+        ]
+        lines: list[str] = []
+        for name, kind, help_text in metrics:
+            metric = f"pdf_ingest_stage_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage_name, totals in sorted(self._totals.items()):
+                lines.append(
+                    f'{metric}{{stage="{stage_name}"}} {getattr(totals, name)}'
+                )
+        # node_exporter may read the file at any time, so replace it atomically
+        temp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self._last_write = time.monotonic()
+        try:
+            temp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # Losing a metrics snapshot must not fail the conversion
+            print(f"Error writing metrics to {self.path}: {e}")
+
+
+_recorder: MetricsRecorder | None = None
+_active = threading.local()
+
+
+def configure_metrics(path: Path | None, fmt: str = "jsonl") -> MetricsRecorder | None:
+    """
+    Send stage records to a file, or stop recording when path is None.
+
+    Args:
+        path: JSON lines file to append to, or Prometheus textfile to rewrite
+        fmt: "jsonl" or "prometheus"
+
+    Returns:
+        MetricsRecorder | None: The active recorder
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.flush()
+    _recorder = MetricsRecorder(path, fmt) if path is not None else None
+    return _recorder
+
+
+def flush_metrics() -> None:
+    """
+    Write out aggregated metrics, call once the run is finished.
+    """
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def note_pages(pages: int | None) -> None:
+    """
+    Report the page count of the document in the stage running on this thread.
+    """
+    active: _ActiveStage | None = getattr(_active, "stage", None)
+    if active is not None and pages is not None:
+        active.pages = pages
+
+
+def _children_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _file_size(path: Path | None) -> int:
+    try:
+        return path.stat().st_size if path is not None else 0
+    except OSError:
+        return 0
+
+
+@contextmanager
+def stage(
+    name: str, document: Path, source: Path | None = None, output: Path | None = None
+) -> Iterator[_ActiveStage]:
+    """
+    Measure one stage of one document.
+
+    The stage fails if its body raises, or if the body sets ok = False on the yielded
+    object. bytes_in is the size of source, bytes_out the size of output (if given)
+    once the stage is done.
+
+    Args:
+        name: Stage name, e.g. "extract" or "ocr"
+        document: The input document
+        source: The file the stage reads, defaults to the document
+        output: The file the stage writes
+    """
+    active = _ActiveStage(output=output)
+    previous = getattr(_active, "stage", None)
+    _active.stage = active
+    ok = True
+    wall_start = time.monotonic()
+    cpu_start = _children_cpu_seconds()
+    try:
+        yield active
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        _active.stage = previous
+        if _recorder is not None:
+            _recorder.record(
+                StageRecord(
+                    document=str(document),
+                    stage=name,
+                    ok=ok and active.ok,
+                    wall_seconds=round(time.monotonic() - wall_start, 4),
+                    child_cpu_seconds=round(_children_cpu_seconds() - cpu_start, 4),
+                    bytes_in=_file_size(source or document),
+                    bytes_out=_file_size(active.output),
+                    pages=active.pages,
+                    timestamp=time.time(),
+                )
+            )
+
+
+def load_records(path: Path) -> list[StageRecord]:
+    """
+    Read back a JSON lines metrics file.
+    """
+    records: list[StageRecord] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(StageRecord(**json.loads(line)))
+    return records
@@ -0,0 +1,271 @@
+"""
+Pick the tesseract language pack(s) for a document before OCR'ing it.
+
+Without -l tesseract reads everything as English, which is slower and less accurate
+on other languages, and the language detected afterwards is then based on bad OCR.
+With ConvertOptions.ocr_language set to "auto", a document is OCR'd in two passes:
+
+1. A few sample pages are OCR'd with the default model (or the document's own text
+   layer is used when it has some) and language_detection identifies the language.
+   When the detection is not confident enough, typically because the default model
+   made Latin garbage of a non-Latin script, tesseract's script detection
+   (-l osd --psm 0) picks a pack for the script instead.
+2. The whole document is OCR'd with the matching pack.
+
+Collections tend to be homogeneous, so the language of every converted document is
+remembered per directory. Once a directory has enough documents agreeing on one
+language, the sampling pass is skipped for the rest of it.
+"""
+
+import functools
+import subprocess
+import threading
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import replace
+from pathlib import Path
+
+from pdf_ingest.language_detection import get_backend
+from pdf_ingest.supervisor import run
+from pdf_ingest.types import ConvertOptions
+
+# Pages OCR'd in the first pass
+SAMPLE_PAGES = 3
+# Text from the text layer that is enough to detect the language without OCR
+MIN_HINT_CHARS = 500
+# More text layer only slows the detection down
+MAX_HINT_CHARS = 20_000
+# Documents of one directory that must agree before its language is reused
+MIN_COLLECTION_DOCUMENTS = 3
+MIN_COLLECTION_SHARE = 0.9
+# Probability the detection backend must give the language of the samples. Garbage
+# OCR still gets a language, but a less likely one than real text
+MIN_CONFIDENCE = 0.9
+
+# ISO 639-1 codes (as returned by the detection backends) to tesseract packs
+ISO_TO_TESSERACT = {
+    "af": "afr",
+    "ar": "ara",
+    "bg": "bul",
+    "bn": "ben",
+    "ca": "cat",
+    "cs": "ces",
+    "cy": "cym",
+    "da": "dan",
+    "de": "deu",
+    "el": "ell",
+    "en": "eng",
+    "es": "spa",
+    "et": "est",
+    "fa": "fas",
+    "fi": "fin",
+    "fr": "fra",
+    "he": "heb",
+    "hi": "hin",
+    "hr": "hrv",
+    "hu": "hun",
+    "id": "ind",
+    "it": "ita",
+    "ja": "jpn",
+    "ko": "kor",
+    "la": "lat",
+    "lt": "lit",
+    "lv": "lav",
+    "nl": "nld",
+    "no": "nor",
+    "pl": "pol",
+    "pt": "por",
+    "ro": "ron",
+    "ru": "rus",
+    "sk": "slk",
+    "sl": "slv",
+    "sq": "sqi",
+    "sr": "srp",
+    "sv": "swe",
+    "ta": "tam",
+    "th": "tha",
+    "tr": "tur",
+    "uk": "ukr",
+    "vi": "vie",
+    "zh": "chi_sim",
+    "zh-cn": "chi_sim",
+    "zh-tw": "chi_tra",
+}
+
+# Scripts reported by tesseract's orientation and script detection
+_SCRIPT_TO_TESSERACT = {
+    "Arabic": "ara",
+    "Bengali": "ben",
+    "Cyrillic": "rus",
+    "Devanagari": "hin",
+    "Greek": "ell",
+    "Han": "chi_sim",
+    "Hangul": "kor",
+    "Hebrew": "heb",
+    "Japanese": "jpn",
+    "Tamil": "tam",
+    "Thai": "tha",
+}
+
+# Arguments for tesseract's orientation and script detection
+OSD_ARGS = ["-l", "osd", "--psm", "0"]
+
+# (page, extra tesseract arguments) -> tesseract stdout
+SampleOcr = Callable[[int, list[str]], str]
+
+_collections: dict[Path, Counter[str]] = {}
+_collections_lock = threading.Lock()
+
+
+def tesseract_args(language: str | None) -> list[str]:
+    """
+    The -l arguments for a resolved ocr_language, none for the default model.
+    """
+    if not language or language == "auto":
+        return []
+    return ["-l", language]
+
+
+@functools.cache
+def installed_languages() -> frozenset[str]:
+    """
+    Language packs tesseract has installed, empty if tesseract could not tell.
+    """
+    try:
+        completed = run(["tesseract", "--list-langs"], capture_output=True, text=True)
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Error listing tesseract languages: {e}")
+        return frozenset()
+    # The first line is a header: List of available languages in "..." (N):
+    return frozenset(line.strip() for line in completed.stdout.splitlines()[1:])
+
+
+def to_tesseract(language: str) -> str | None:
+    """
+    The tesseract pack for an ISO 639-1 code, None if unknown or not installed.
+    """
+    pack = ISO_TO_TESSERACT.get(language.lower())
+    installed = installed_languages()
+    if pack is None or (installed and pack not in installed):
+        return None
+    return pack
+
+
+def sample_pages(candidates: list[int], count: int = SAMPLE_PAGES) -> list[int]:
+    """
+    Up to count pages spread evenly over the candidates, avoiding the first and last.
+    """
+    if len(candidates) <= count:
+        return list(candidates)
+    step = len(candidates) / (count + 1)
+    return [candidates[int(step * (i + 1))] for i in range(count)]
+
+
+def record_collection_language(document: Path, language: str, reliable: bool) -> None:
+    """
+    Remember the language of a converted document for the rest of its directory.
+    """
+    if not reliable or language == "unknown":
+        return
+    with _collections_lock:
+        _collections.setdefault(document.parent, Counter())[language] += 1
+
+
+def collection_language(document: Path) -> str | None:
+    """
+    The language the documents of this directory agree on, if enough have been seen.
+    """
+    with _collections_lock:
+        counts = _collections.get(document.parent)
+        if counts is None:
+            return None
+        total = sum(counts.values())
+        language, votes = counts.most_common(1)[0]
+    if total >= MIN_COLLECTION_DOCUMENTS and votes / total >= MIN_COLLECTION_SHARE:
+        return language
+    return None
+
+
+def _script_pack(osd_output: str) -> str | None:
+    for line in osd_output.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "Script":
+            pack = _SCRIPT_TO_TESSERACT.get(value.strip())
+            installed = installed_languages()
+            if pack is not None and (not installed or pack in installed):
+                return pack
+    return None
+
+
+def choose_ocr_language(
+    document: Path,
+    pages: list[int],
+    ocr_sample: SampleOcr,
+    backend: str | None = None,
+    text_hint: str = "",
+    samples: dict[int, str] | None = None,
+) -> str | None:
+    """
+    First pass of the two-pass OCR: find the tesseract pack for a document.
+
+    Args:
+        document: The document, its directory is the collection
+        pages: Pages that are going to be OCR'd, the samples are picked from them
+        ocr_sample: OCRs one page with extra tesseract arguments
+        backend: Language detection backend
+        text_hint: Text the document already has, e.g. from pages with a text layer
+        samples: Filled with the default model OCR of the sampled pages, so they can
+            be reused when the default model is what was chosen
+
+    Returns:
+        str | None: The tesseract pack, or None to use the default model
+    """
+    language = collection_language(document)
+    if language is not None and (pack := to_tesseract(language)):
+        return pack
+
+    text = text_hint[:MAX_HINT_CHARS]
+    sampled = sample_pages(pages)
+    if len(text.strip()) < MIN_HINT_CHARS:
+        for page in sampled:
+            page_text = ocr_sample(page, [])
+            if samples is not None:
+                samples[page] = page_text
+            text += "\n" + page_text
+    language, probability = get_backend(backend).detect(text)
+    if probability >= MIN_CONFIDENCE and (pack := to_tesseract(language)):
+        print(f"{document.name}: OCR'ing with tesseract language {pack}")
+        return pack
+
+    if sampled:
+        pack = _script_pack(ocr_sample(sampled[0], OSD_ARGS))
+        if pack is not None:
+            print(f"{document.name}: OCR'ing with tesseract language {pack} (script)")
+            return pack
+    return None
+
+
+def resolve_ocr_language(
+    document: Path,
+    pages: list[int],
+    ocr_sample: SampleOcr,
+    options: ConvertOptions,
+    text_hint: str = "",
+    samples: dict[int, str] | None = None,
+) -> ConvertOptions:
+    """
+    Options for OCR'ing one document, with an "auto" ocr_language resolved.
+
+    A failing first pass is not fatal, the document is then OCR'd with the default
+    model as before.
+    """
+    if options.ocr_language != "auto":
+        return options
+    try:
+        pack = choose_ocr_language(
+            document, pages, ocr_sample, options.language_backend, text_hint, samples
+        )
+    except (subprocess.CalledProcessError, OSError, RuntimeError) as e:
+        print(f"Error choosing the OCR language of {document.name}: {e}")
+        pack = None
+    return replace(options, ocr_language=pack)
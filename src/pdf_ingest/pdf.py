@@ -1,14 +1,27 @@
-import shutil
+import os
 import subprocess
 import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from tempfile import TemporaryDirectory
 
-from pdf_ingest.json_util import update_json_with_language
-from pdf_ingest.language_detection import detect_language_from_file
-from pdf_ingest.types import TranslationItem
+from pdf_ingest.checkpoint import OcrCheckpoint
+from pdf_ingest.convert import Converter, convert_document
+from pdf_ingest.metrics import note_pages
+from pdf_ingest.ocr_language import resolve_ocr_language, tesseract_args
+from pdf_ingest.pdf_text_backend import extract_pages_pdfium, use_pdfium
+from pdf_ingest.supervisor import (
+    cached_page_count,
+    guess_pages,
+    is_timeout,
+    run,
+    timeouts_enabled,
+)
+from pdf_ingest.text_quality import page_needs_ocr
+from pdf_ingest.types import ConvertOptions, TranslationItem
 
 _DISABLE_TEXT_EMBEDDING_EXTRACTION = False
+# Pages are OCR'd in parallel, keep each tesseract process to a single thread
+_TESSERACT_ENV = {**os.environ, "OMP_THREAD_LIMIT": "1"}
 
 
 def try_pdf_convert_to_text(pdf_file: Path, txt_file_out: Path) -> Exception | None:
@@ -16,39 +29,136 @@ def try_pdf_convert_to_text(pdf_file: Path, txt_file_out: Path) -> Exception | N
     if _DISABLE_TEXT_EMBEDDING_EXTRACTION:
         print(f"Skipping text extraction for {pdf_file.name} due to disabled setting.")
         return NotImplementedError("Text extraction is disabled.")
+    if use_pdfium(pdf_file) and _pdfium_convert_to_text(pdf_file, txt_file_out):
+        return None
     try:
-        subprocess.run(
-            ["pdftotext", str(pdf_file), txt_file_out],
-            check=True,
+        run(
+            ["pdftotext", str(pdf_file), str(txt_file_out)],
+            # Reading the page count would cost another process per document
+            pages=guess_pages(pdf_file) if timeouts_enabled() else None,
         )
         return None
     except subprocess.CalledProcessError as e:
         print(f"Error converting {pdf_file.name} to text: {e}")
         return e
+    except subprocess.TimeoutExpired as e:
+        print(f"Timed out converting {pdf_file.name} to text: {e}")
+        return e
+
+
+def _pdfium_convert_to_text(pdf_file: Path, txt_file_out: Path) -> bool:
+    """
+    Extract the text layer with the PDFium workers, in the same layout as pdftotext.
+
+    Returns:
+        bool: Whether the text was written, if not the caller falls back to pdftotext
+    """
+    try:
+        pages = extract_pages_pdfium(pdf_file)
+        # pdftotext ends every page with a form feed, keep the output interchangeable
+        txt_file_out.write_text(
+            "".join(page + "\f" for page in pages), encoding="utf-8"
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"PDFium could not extract {pdf_file.name}, using pdftotext: {e}")
+        return False
+    note_pages(len(pages))
+    return True
+
+
+_OCRMYPDF_MODE_FLAGS = {
+    "force": "--force-ocr",
+    "skip-text": "--skip-text",
+    "redo": "--redo-ocr",
+}
 
 
-def convert_pdf_to_text_via_ocr(pdf_file: Path, txt_file_out: Path) -> Exception | None:
+def ocrmypdf_command(
+    pdf_file: Path, output: Path | None, sidecar: Path | None, options: ConvertOptions
+) -> list[str]:
     """
-    uses ocrmypdf to write a pdf to a temporary file,
-    then pdftotext to convert it to text, which is
-    written to the output file"""
+    Build the ocrmypdf command line.
 
+    Args:
+        pdf_file: The PDF to OCR
+        output: Where to write the OCR'd PDF, None to write no PDF at all
+        sidecar: Where to write the recognised text, if anywhere
+        options: OCR mode, job count and tesseract timeouts
+
+    Returns:
+        list[str]: The command
+    """
+    # Only the text is kept, so don't spend time optimizing or converting to PDF/A
+    command = ["ocrmypdf", _OCRMYPDF_MODE_FLAGS[options.ocr_mode], "--optimize", "0"]
+    command += tesseract_args(options.ocr_language)
+    if options.ocrmypdf_jobs is not None:
+        command += ["--jobs", str(options.ocrmypdf_jobs)]
+    if options.tesseract_timeout is not None:
+        command += ["--tesseract-timeout", str(options.tesseract_timeout)]
+    if options.tesseract_non_ocr_timeout is not None:
+        command += [
+            "--tesseract-non-ocr-timeout",
+            str(options.tesseract_non_ocr_timeout),
+        ]
+    if sidecar is not None:
+        command += ["--sidecar", str(sidecar)]
+    if output is None:
+        command += ["--output-type", "none", str(pdf_file), "-"]
+    else:
+        command += ["--output-type", "pdf", str(pdf_file), str(output)]
+    return command
+
+
+def convert_pdf_to_text_via_ocr(
+    pdf_file: Path, txt_file_out: Path, options: ConvertOptions | None = None
+) -> Exception | None:
+    """
+    OCR the whole document with ocrmypdf.
+
+    By default ocrmypdf writes the recognised text straight to txt_file_out as a
+    sidecar and produces no PDF. The sidecar only holds text that ocrmypdf recognised
+    itself, so with the "skip-text" and "redo" modes (or ocrmypdf_sidecar off) it
+    writes the OCR'd PDF to a temporary file instead, and pdftotext converts that.
+
+    ocrmypdf knows nothing of an "auto" ocr_language, the language is picked from a
+    few sample pages first, see ocr_language.
+    """
+    options = options or ConvertOptions()
+    pages = get_pdf_page_count(pdf_file) if timeouts_enabled() else None
     try:
+        if options.ocr_language == "auto":
+            page_count = get_pdf_page_count(pdf_file) or 0
+            with tempfile.TemporaryDirectory(dir=options.scratch_dir) as temp_dir:
+                options = resolve_ocr_language(
+                    pdf_file,
+                    list(range(1, page_count + 1)),
+                    lambda page, args: ocr_pdf_page(
+                        pdf_file, page, Path(temp_dir), args
+                    ),
+                    options,
+                )
+
+        if options.ocrmypdf_sidecar and options.ocr_mode == "force":
+            run(
+                ocrmypdf_command(pdf_file, None, txt_file_out, options),
+                pages=pages,
+                stage="ocr",
+            )
+            return None
+
         # Create a temporary directory for the OCR'd PDF
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(dir=options.scratch_dir) as temp_dir:
             temp_pdf = Path(temp_dir) / f"{pdf_file.stem}_ocr.pdf"
 
             # Run OCR on the PDF
-            subprocess.run(
-                ["ocrmypdf", "--force-ocr", str(pdf_file), str(temp_pdf)],
-                check=True,
+            run(
+                ocrmypdf_command(pdf_file, temp_pdf, None, options),
+                pages=pages,
+                stage="ocr",
             )
 
             # Convert the OCR'd PDF to text
-            subprocess.run(
-                ["pdftotext", str(temp_pdf), str(txt_file_out)],
-                check=True,
-            )
+            run(["pdftotext", str(temp_pdf), str(txt_file_out)], pages=pages)
 
             # The temporary file will be automatically deleted when the context manager exits
 
@@ -56,88 +166,249 @@ def convert_pdf_to_text_via_ocr(pdf_file: Path, txt_file_out: Path) -> Exception
     except subprocess.CalledProcessError as e:
         print(f"Error OCR'ing and converting {pdf_file.name} to text: {e}")
         return e
+    except subprocess.TimeoutExpired as e:
+        print(f"Timed out OCR'ing {pdf_file.name}: {e}")
+        return e
     except Exception as e:
         print(f"Unexpected error processing {pdf_file.name}: {e}")
         return e
 
 
-def process_pdf_file(item: TranslationItem) -> tuple[Exception | None, bool]:
+def get_pdf_page_count(pdf_file: Path) -> int | None:
     """
-    Process a PDF file and convert it to text.
-    Uses a temporary directory for the conversion process and then copies the result to the final destination.
+    Read the page count of a PDF with pdfinfo, once per version of the file.
+
+    Returns:
+        int | None: The number of pages, or None if pdfinfo could not tell
+    """
+    return cached_page_count(pdf_file, _read_pdf_page_count)
 
-    Args:
-        item: TranslationItem containing input and output file paths
+
+def _read_pdf_page_count(pdf_file: Path) -> int | None:
+    try:
+        completed = run(
+            ["pdfinfo", str(pdf_file)],
+            capture_output=True,
+            text=True,
+            errors="replace",
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Error reading page count of {pdf_file.name}: {e}")
+        return None
+    for line in completed.stdout.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "Pages":
+            try:
+                return int(value.strip())
+            except ValueError:
+                return None
+    return None
+
+
+def extract_pdf_page_text(pdf_file: Path, page: int) -> str | None:
+    """
+    Extract the text layer of a single page with pdftotext.
 
     Returns:
-        tuple: (error, success) where error is None if successful and success is True if file was processed
+        str | None: The page text, or None if pdftotext failed on this page
     """
-    with TemporaryDirectory() as temp_dir:
-        # Create a temporary output file path
-        temp_output = Path(temp_dir) / f"temp_{item.input_file.name}.txt"
+    try:
+        completed = run(
+            ["pdftotext", "-f", str(page), "-l", str(page), str(pdf_file), "-"],
+            capture_output=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting page {page} of {pdf_file.name}: {e}")
+        return None
+    # pdftotext ends every page with a form feed, the caller adds its own separators
+    return completed.stdout.decode("utf-8", errors="replace").rstrip("\f")
+
 
-        # First try regular PDF to text conversion
-        err = try_pdf_convert_to_text(
-            pdf_file=item.input_file, txt_file_out=temp_output
+def ocr_pdf_page(
+    pdf_file: Path, page: int, temp_dir: Path, args: list[str] | None = None
+) -> str:
+    """
+    Render a single page with pdftoppm and OCR it with tesseract.
+
+    Args:
+        pdf_file: The PDF
+        page: Page number, starting at 1
+        temp_dir: Where to render the page image, it is deleted afterwards
+        args: Extra tesseract arguments, e.g. -l deu
+
+    Returns:
+        str: The recognised page text
+    """
+    image_prefix = temp_dir / f"page-{page:05d}"
+    run(
+        [
+            "pdftoppm",
+            "-f",
+            str(page),
+            "-l",
+            str(page),
+            "-r",
+            "300",
+            "-gray",
+            "-png",
+            "-singlefile",
+            str(pdf_file),
+            str(image_prefix),
+        ]
+    )
+    image_file = image_prefix.with_suffix(".png")
+    try:
+        completed = run(
+            ["tesseract", str(image_file), "stdout", *(args or [])],
+            stage="ocr",
+            capture_output=True,
+            env=_TESSERACT_ENV,
         )
-        if err is not None:
-            print(
-                f"Regular conversion failed for {item.input_file.name}, trying OCR..."
-            )
-            # If regular conversion fails, try OCR
-            err = convert_pdf_to_text_via_ocr(
-                pdf_file=item.input_file, txt_file_out=temp_output
-            )
-            if err is not None:
-                print(f"OCR conversion also failed for {item.input_file.name}")
-                return err, False
+    finally:
+        image_file.unlink(missing_ok=True)
+    return completed.stdout.decode("utf-8", errors="replace")
+
+
+def convert_pdf_to_text_per_page(
+    pdf_file: Path,
+    txt_file_out: Path,
+    options: ConvertOptions | None = None,
+    checkpoint: OcrCheckpoint | None = None,
+) -> Exception | None:
+    """
+    Extract the text layer page by page and OCR only the pages that lack one.
+
+    Pages whose pdftotext output is empty or garbage (see text_quality.page_needs_ocr)
+    are rendered and OCR'd individually, everything else keeps its embedded text.
+    The pages are OCR'd on a pool of options.ocr_workers threads, one single threaded
+    tesseract process each. Pages are written in order, separated by form feeds like
+    pdftotext does.
+    OCR'd pages are saved to the checkpoint, if given, and taken from it on a rerun.
+    With ocr_language "auto", the tesseract language is chosen from the text layer
+    or a few sample pages first, see ocr_language.
+    """
+    options = options or ConvertOptions()
+    page_count = get_pdf_page_count(pdf_file)
+    if not page_count:
+        return ValueError(f"Could not determine the page count of {pdf_file.name}")
+    note_pages(page_count)
+    try:
+        pages: list[str | None] = []
+        ocr_pages: list[int] = []
+        for page in range(1, page_count + 1):
+            text = extract_pdf_page_text(pdf_file, page)
+            if text is None or page_needs_ocr(text):
+                ocr_pages.append(page)
+                pages.append(None)
             else:
-                # Detect language from the temporary file
-                lang_code, is_reliable = detect_language_from_file(temp_output)
-                item.language = lang_code
-                item.should_translate = lang_code.lower() == "en"
+                pages.append(text)
 
-                # Update the output filename to include language code
-                stem = item.output_file.stem
-                suffix = item.output_file.suffix
-                new_filename = f"{stem}-{lang_code.upper()}{suffix}"
-                item.output_file = item.output_file.with_name(new_filename)
+        print(f"{pdf_file.name}: OCR'ing {len(ocr_pages)} of {page_count} pages")
+        with tempfile.TemporaryDirectory(dir=options.scratch_dir) as temp_dir:
+            done = checkpoint.pages() if checkpoint is not None else set()
+            samples: dict[int, str] = {}
+            page_options = resolve_ocr_language(
+                pdf_file,
+                [page for page in ocr_pages if page not in done],
+                lambda page, args: ocr_pdf_page(pdf_file, page, Path(temp_dir), args),
+                options,
+                text_hint="\n".join(text for text in pages if text),
+                samples=samples,
+            )
+            args = tesseract_args(page_options.ocr_language)
+            if page_options.ocr_language not in (None, "eng"):
+                # The samples were read with the default model, English
+                samples.clear()
+
+            def ocr_page(page: int) -> str:
+                text = ocr_pdf_page(pdf_file, page, Path(temp_dir), args)
+                if checkpoint is not None:
+                    checkpoint.save(page, text)
+                return text
 
-                # Update JSON with language information
-                update_json_with_language(item.json_file, lang_code, is_reliable)
+            todo: list[int] = []
+            for page in ocr_pages:
+                text = checkpoint.load(page) if checkpoint is not None else None
+                if text is None:
+                    text = samples.get(page)
+                    if text is None:
+                        todo.append(page)
+                        continue
+                    if checkpoint is not None:
+                        checkpoint.save(page, text)
+                pages[page - 1] = text
 
-                # Copy from temp location to final destination
+            workers = options.ocr_workers or os.cpu_count() or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures: dict[int, Future[str]] = {
+                    page: executor.submit(ocr_page, page) for page in todo
+                }
                 try:
-                    shutil.copy2(temp_output, item.output_file)
-                    print(
-                        f"Successfully converted {item.input_file.name} using OCR (language: {lang_code})"
-                    )
-                    return None, True
-                except Exception as copy_err:
-                    print(f"Error copying file from temporary location: {copy_err}")
-                    return copy_err, False
-        else:
-            # Detect language from the temporary file
-            lang_code, is_reliable = detect_language_from_file(temp_output)
-            item.language = lang_code
-            item.should_translate = lang_code.lower() == "en"
-
-            # Update the output filename to include language code
-            stem = item.output_file.stem
-            suffix = item.output_file.suffix
-            new_filename = f"{stem}-{lang_code.upper()}{suffix}"
-            item.output_file = item.output_file.with_name(new_filename)
-
-            # Update JSON with language information
-            update_json_with_language(item.json_file, lang_code, is_reliable)
-
-            # Copy from temp location to final destination
-            try:
-                shutil.copy2(temp_output, item.output_file)
-                print(
-                    f"Successfully converted {item.input_file.name} using embedded text (language: {lang_code})"
-                )
-                return None, True
-            except Exception as copy_err:
-                print(f"Error copying file from temporary location: {copy_err}")
-                return copy_err, False
+                    for page, future in futures.items():
+                        pages[page - 1] = future.result()
+                finally:
+                    # Don't OCR the rest of the document after a failure
+                    executor.shutdown(cancel_futures=True)
+
+        with open(txt_file_out, "w", encoding="utf-8") as output_file:
+            for text in pages:
+                output_file.write(text or "")
+                output_file.write("\f")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error OCR'ing and converting {pdf_file.name} to text: {e}")
+        return e
+    except subprocess.TimeoutExpired as e:
+        print(f"Timed out OCR'ing {pdf_file.name}: {e}")
+        return e
+    except Exception as e:
+        print(f"Unexpected error processing {pdf_file.name}: {e}")
+        return e
+
+
+def convert_pdf_to_text_with_ocr(
+    pdf_file: Path,
+    txt_file_out: Path,
+    options: ConvertOptions,
+    checkpoint: OcrCheckpoint | None = None,
+) -> Exception | None:
+    """
+    OCR only the pages without a usable text layer, falling back to OCR'ing the
+    whole document with ocrmypdf when that fails. A document that timed out is not
+    tried again.
+    """
+    err = convert_pdf_to_text_per_page(
+        pdf_file=pdf_file,
+        txt_file_out=txt_file_out,
+        options=options,
+        checkpoint=checkpoint,
+    )
+    if err is not None and not is_timeout(err):
+        print(
+            f"Per-page conversion failed for {pdf_file.name}, OCR'ing the whole document..."
+        )
+        err = convert_pdf_to_text_via_ocr(
+            pdf_file=pdf_file, txt_file_out=txt_file_out, options=options
+        )
+    return err
+
+
+PDF_CONVERTER = Converter(
+    extract=try_pdf_convert_to_text, ocr=convert_pdf_to_text_with_ocr
+)
+
+
+def process_pdf_file(
+    item: TranslationItem, options: ConvertOptions | None = None
+) -> tuple[Exception | None, bool]:
+    """
+    Process a PDF file and convert it to text, see convert.convert_document().
+
+    Args:
+        item: TranslationItem containing input and output file paths
+        options: Converter tuning shared by the whole run
+
+    Returns:
+        tuple: (error, success) where error is None if successful and success is True if file was processed
+    """
+    return convert_document(item, PDF_CONVERTER, options)
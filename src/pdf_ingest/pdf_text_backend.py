@@ -0,0 +1,200 @@
+"""
+Where the text layer of a born-digital PDF is extracted.
+
+    pdftotext  one supervised pdftotext process per document (the default)
+    pdfium     PDFium, via the optional pypdfium2 package, in a pool of long lived
+               worker processes
+
+On a corpus of small born-digital PDFs most of the time of a pdftotext run goes into
+starting the process and the temporary file round trip, not into the extraction. The
+pdfium backend sends each document to a worker that already has PDFium loaded and
+gets the pages back in memory. PDFium is not thread safe, one process per worker
+keeps the extraction parallel across cores all the same.
+
+The workers are supervised like the converter processes, see supervisor: each call
+is timed on the page count guessed from the file size, and a worker that runs out of
+time is killed with the rest of its pool, which is started again on the next call.
+The address space limit applies to every worker. Any failure, timeout included,
+falls back to pdftotext, and files beyond a size limit always go to pdftotext.
+"""
+
+import multiprocessing
+import os
+import resource
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+from pdf_ingest.supervisor import current_limits, guess_pages
+
+PDF_TEXT_BACKENDS = ("pdftotext", "pdfium")
+DEFAULT_PDF_TEXT_BACKEND = "pdftotext"
+DEFAULT_PDFIUM_MAX_BYTES = 4 * 1024 * 1024
+
+_backend_name = DEFAULT_PDF_TEXT_BACKEND
+_pdfium_max_bytes = DEFAULT_PDFIUM_MAX_BYTES
+_pdfium_workers: int | None = None
+_pool: ProcessPoolExecutor | None = None
+# One per worker, a document is only handed over once a worker is free, so that its
+# timeout covers the extraction and not the wait
+_slots = threading.BoundedSemaphore(1)
+_pool_lock = threading.Lock()
+
+
+class PdfiumTimeout(Exception):
+    """
+    A PDFium worker ran out of time, it was killed with its pool.
+    """
+
+
+def configure_pdf_text_backend(
+    name: str, max_bytes: int | None = None, workers: int | None = None
+) -> None:
+    """
+    Choose how the text layer of PDFs is extracted, for the whole process.
+
+    pypdfium2 is imported right away, so a missing optional dependency fails before
+    any document is converted. The worker pool of the previous configuration is shut
+    down, the next pool starts on first use.
+
+    Args:
+        name: One of PDF_TEXT_BACKENDS
+        max_bytes: Larger PDFs are always extracted by pdftotext, None keeps the
+            current limit
+        workers: PDFium worker processes, usually the number of jobs, defaults to
+            the CPU count
+    """
+    global _backend_name, _pdfium_max_bytes, _pdfium_workers
+    if name not in PDF_TEXT_BACKENDS:
+        raise ValueError(
+            f"Unknown PDF text backend {name!r}, expected one of {PDF_TEXT_BACKENDS}"
+        )
+    if max_bytes is not None and max_bytes < 0:
+        raise ValueError(f"max_bytes must be >= 0, got {max_bytes}")
+    if workers is not None and workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if name == "pdfium":
+        import pypdfium2  # type: ignore  # noqa: F401  # pylint: disable=unused-import
+    shutdown_pdfium_pool()
+    _backend_name = name
+    if max_bytes is not None:
+        _pdfium_max_bytes = max_bytes
+    _pdfium_workers = workers
+
+
+def pdf_text_backend() -> str:
+    """The configured backend name."""
+    return _backend_name
+
+
+def use_pdfium(pdf_file: Path) -> bool:
+    """
+    Whether the text layer of this file is extracted by the PDFium workers.
+    """
+    if _backend_name != "pdfium":
+        return False
+    try:
+        return pdf_file.stat().st_size <= _pdfium_max_bytes
+    except OSError:
+        return False
+
+
+def _init_worker(memory_mb: int | None) -> None:
+    if memory_mb is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _read_pages(path: str) -> list[str]:
+    # Runs in a worker process
+    import pypdfium2  # type: ignore
+
+    pages: list[str] = []
+    document: Any = pypdfium2.PdfDocument(path)
+    try:
+        for index in range(len(document)):
+            page = document[index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+            pages.append(text.replace("\r\n", "\n").replace("\r", "\n"))
+    finally:
+        document.close()
+    return pages
+
+
+def _get_pool() -> tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            limits = current_limits()
+            workers = _pdfium_workers or os.cpu_count() or 1
+            _slots = threading.BoundedSemaphore(workers)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # Forking a process full of threads is not safe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(limits.memory_mb if limits is not None else None,),
+            )
+        return _pool, _slots
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # A hung PDFium call cannot be interrupted, only its process can be killed
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+
+
+def shutdown_pdfium_pool() -> None:
+    """
+    Stop the PDFium workers, if any are running.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_pages_pdfium(pdf_file: Path) -> list[str]:
+    """
+    Extract the text layer of every page with PDFium, in a worker process.
+
+    Returns:
+        list[str]: The text of each page, with "\\n" line endings
+
+    Raises:
+        PdfiumTimeout: The worker ran out of time and was killed
+        BrokenProcessPool: A worker died, e.g. killed along with a hung one, the
+            pool is started again on the next call
+        Exception: Whatever PDFium raised, e.g. pypdfium2.PdfiumError
+    """
+    limits = current_limits()
+    timeout = limits.timeout(guess_pages(pdf_file)) if limits is not None else None
+    pool, slots = _get_pool()
+    with slots:
+        future: Future[list[str]] = pool.submit(_read_pages, str(pdf_file))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            _kill_pool(pool)
+            raise PdfiumTimeout(
+                f"PDFium timed out after {timeout}s on {pdf_file.name}"
+            ) from None
+        except BrokenProcessPool:
+            # A worker died, the pool is replaced on the next call
+            _kill_pool(pool)
+            raise
@@ -0,0 +1,264 @@
+"""
+Staged conversion engine: every step of a document runs on its own pool.
+
+    discover -> probe -> extract -> [ocr] -> language -> commit
+
+The scan (discover) feeds the probe stage, which reads the page count and estimated
+cost of each file. Text extraction is cheap and goes straight on to language
+detection when the text layer is good; only documents that need it are queued for
+OCR, cheapest first. Each stage has its own worker count and a bounded queue in
+front of it, so cheap extractions never wait behind a long OCR job, the OCR pool can
+be sized to the cores on its own, and a slow stage pushes back on the scan instead
+of letting work pile up in memory.
+
+With a result cache, the probe stage also looks up the content hash of each file and
+sends duplicates of converted documents straight to the commit.
+"""
+
+import itertools
+import math
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ingest.atomic import partial_path
+from pdf_ingest.checkpoint import OcrCheckpoint
+from pdf_ingest.convert import (
+    Converter,
+    cache_step,
+    commit_step,
+    extract_step,
+    language_step,
+    ocr_step,
+)
+from pdf_ingest.djvu import DJVU_CONVERTER
+from pdf_ingest.pdf import PDF_CONVERTER
+from pdf_ingest.result_cache import open_result_cache
+from pdf_ingest.scheduling import estimate_cost
+from pdf_ingest.supervisor import is_timeout
+from pdf_ingest.types import ConvertOptions, TranslationItem
+
+CONVERTERS = {".pdf": PDF_CONVERTER, ".djvu": DJVU_CONVERTER}
+
+# (discovery index, item, error, success, seconds since submit)
+DoneCallback = Callable[[int, TranslationItem, Exception | None, bool, float], None]
+
+# Queue tie breaker, keeps equal priorities in submission order
+_sequence = itertools.count()
+
+
+@dataclass
+class StageLimits:
+    """
+    Worker threads per stage.
+    """
+
+    probe: int
+    extract: int
+    ocr: int
+    language: int
+    commit: int
+
+    def __post_init__(self):
+        for name, value in vars(self).items():
+            if value < 1:
+                raise ValueError(f"{name} must be at least 1, got {value}")
+
+    @classmethod
+    def for_jobs(cls, jobs: int, ocr_jobs: int | None = None) -> "StageLimits":
+        """
+        jobs workers per stage, except OCR which gets ocr_jobs if given.
+        """
+        return cls(
+            probe=jobs,
+            extract=jobs,
+            ocr=ocr_jobs or jobs,
+            language=jobs,
+            commit=jobs,
+        )
+
+
+@dataclass
+class _Job:
+    index: int
+    item: TranslationItem
+    converter: Converter
+    temp_output: Path
+    start: float
+    cost: float = 0.0
+    checkpoint: OcrCheckpoint | None = None
+    finished: bool = False
+
+
+class _Stage:
+    """
+    A bounded priority queue drained by a fixed number of worker threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        handler: Callable[[_Job], None],
+        on_error: Callable[[_Job, Exception], None],
+        maxsize: int,
+    ) -> None:
+        self.name = name
+        self._handler = handler
+        self._on_error = on_error
+        self._queue: queue.PriorityQueue[tuple[float, int, _Job | None]] = (
+            queue.PriorityQueue(maxsize)
+        )
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, job: _Job, priority: float = 0.0) -> None:
+        """
+        Queue a job, lower priorities first. Blocks while the queue is full.
+        """
+        self._queue.put((priority, next(_sequence), job))
+
+    def _run(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._handler(job)
+            except Exception as e:
+                print(
+                    f"Unexpected error in {self.name} of {job.item.input_file.name}: {e}"
+                )
+                self._on_error(job, e)
+
+    def close(self) -> None:
+        """
+        Let the workers finish what is queued, then stop them.
+        """
+        for _ in self._threads:
+            self._queue.put((math.inf, next(_sequence), None))
+        for thread in self._threads:
+            thread.join()
+
+
+class Pipeline:
+    """
+    Converts submitted items stage by stage and reports each one to on_done.
+
+    on_done is called from the worker threads, exactly once per submitted item.
+    """
+
+    def __init__(
+        self,
+        limits: StageLimits,
+        on_done: DoneCallback,
+        options: ConvertOptions | None = None,
+        queue_size: int | None = None,
+    ) -> None:
+        self.options = options or ConvertOptions()
+        self._on_done = on_done
+        self._cache = open_result_cache(self.options)
+
+        def make_stage(name: str, workers: int, handler) -> _Stage:
+            # Room for a second round of work per worker, more only costs memory
+            maxsize = queue_size or workers * 2
+            return _Stage(name, workers, handler, self._finish, maxsize)
+
+        # Created downstream first, so no handler can run before its next stage exists
+        self._commit = make_stage("commit", limits.commit, self._commit_job)
+        self._language = make_stage("language", limits.language, self._language_job)
+        self._ocr = make_stage("ocr", limits.ocr, self._ocr_job)
+        self._extract = make_stage("extract", limits.extract, self._extract_job)
+        self._probe = make_stage("probe", limits.probe, self._probe_job)
+
+    def submit(self, index: int, item: TranslationItem) -> None:
+        """
+        Queue an item for conversion. Blocks while the probe stage is backed up.
+        """
+        converter = CONVERTERS.get(item.input_file.suffix.lower())
+        if converter is None:
+            print(f"Unsupported file type: {item.input_file.suffix}")
+            err = Exception(f"Unsupported file type: {item.input_file.suffix}")
+            self._on_done(index, item, err, False, 0.0)
+            return
+        job = _Job(
+            index=index,
+            item=item,
+            converter=converter,
+            # The final name depends on the detected language, write to a partial file first
+            temp_output=partial_path(item.output_file, item.owner),
+            start=time.monotonic(),
+        )
+        self._probe.put(job)
+
+    def close(self) -> None:
+        """
+        Wait for every submitted item to be done, then stop the workers.
+        """
+        # Upstream first: once a stage is closed nothing can be queued behind it anymore
+        for stage in (
+            self._probe,
+            self._extract,
+            self._ocr,
+            self._language,
+            self._commit,
+        ):
+            stage.close()
+
+    def _probe_job(self, job: _Job) -> None:
+        if self._cache is not None and cache_step(
+            job.item, job.temp_output, self._cache
+        ):
+            self._commit.put(job)
+            return
+        try:
+            estimate = estimate_cost(job.item.input_file)
+            job.cost = estimate.cost
+            job.item.pages = estimate.pages
+        except Exception as e:
+            # The estimate only orders the OCR queue, convert the file anyway
+            print(f"Error probing {job.item.input_file.name}: {e}")
+        self._extract.put(job)
+
+    def _extract_job(self, job: _Job) -> None:
+        err = extract_step(job.item, job.temp_output, job.converter)
+        if err is None:
+            self._language.put(job)
+        elif is_timeout(err):
+            self._finish(job, err)
+        else:
+            # Cheap documents first, so a short scan is not stuck behind a whole book
+            self._ocr.put(job, priority=job.cost)
+
+    def _ocr_job(self, job: _Job) -> None:
+        err, job.checkpoint = ocr_step(
+            job.item, job.temp_output, job.converter, self.options
+        )
+        if err is None:
+            self._language.put(job)
+        else:
+            self._finish(job, err)
+
+    def _language_job(self, job: _Job) -> None:
+        language_step(job.item, job.temp_output, self.options)
+        self._commit.put(job)
+
+    def _commit_job(self, job: _Job) -> None:
+        err = commit_step(job.item, job.temp_output, job.checkpoint, self._cache)
+        self._finish(job, err)
+
+    def _finish(self, job: _Job, err: Exception | None) -> None:
+        if job.finished:
+            # on_done itself failed, it must not be called twice for the same item
+            return
+        job.finished = True
+        job.temp_output.unlink(missing_ok=True)
+        duration = time.monotonic() - job.start
+        self._on_done(job.index, job.item, err, err is None, duration)
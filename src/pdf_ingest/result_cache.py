@@ -0,0 +1,162 @@
+"""
+Content addressed cache of conversion results, shared by duplicate documents.
+
+Archives hold the same book many times, under other names and in other folders. The
+manifest only knows paths, so every copy would be converted again, OCR included.
+The cache keys the text and metadata of each converted document by the content hash
+of its input, and a duplicate is served by copying the cached text and writing its
+JSON, in milliseconds.
+
+Texts are copied in and out rather than hard linked, so an output edited in place
+later on (cleanup, translation, ...) does not change what the cache serves, and an
+evicted entry really frees its disk space.
+
+The cache is capped in size, the least recently used entries are evicted first. Use
+is tracked with the mtime of the cached text, so the order survives restarts.
+"""
+
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pdf_ingest.atomic import partial_path
+from pdf_ingest.json_util import write_json_atomic
+from pdf_ingest.types import ConvertOptions
+
+RESULT_CACHE_DIR_NAME = ".pdf_ingest_results"
+
+
+@dataclass
+class CachedResult:
+    """
+    Metadata of a cached conversion, stored next to its text.
+    """
+
+    language: str
+    language_reliable: bool
+    method: str  # how the text was first obtained: "text" or "ocr"
+    pages: int | None
+
+
+class ResultCache:
+    """
+    Thread safe store of converted texts, keyed by input content hash.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        # digest -> size of the cached text, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        found: list[tuple[int, str, int]] = []
+        for text_file in self.root.glob("*.txt"):
+            try:
+                stat = text_file.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime_ns, text_file.stem, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self._bytes += size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes of cached text.
+        """
+        return self._bytes
+
+    def text_path(self, digest: str) -> Path:
+        return self.root / f"{digest}.txt"
+
+    def _meta_path(self, digest: str) -> Path:
+        return self.root / f"{digest}.json"
+
+    def lookup(self, digest: str) -> CachedResult | None:
+        """
+        The cached result of an input, None on a miss. A hit counts as a use.
+        """
+        with self._lock:
+            if digest not in self._entries:
+                return None
+            self._entries.move_to_end(digest)
+        try:
+            with open(self._meta_path(digest), "r", encoding="utf-8") as f:
+                result = CachedResult(**json.load(f))
+            os.utime(self.text_path(digest))
+        except (OSError, json.JSONDecodeError, TypeError) as e:
+            print(f"Dropping broken result cache entry {digest}: {e}")
+            with self._lock:
+                self._remove_locked(digest)
+            return None
+        return result
+
+    def store(self, digest: str, text_file: Path, result: CachedResult) -> None:
+        """
+        Add a converted text to the cache, evicting the least recently used entries
+        beyond max_bytes.
+
+        Args:
+            digest: Content hash of the input
+            text_file: The committed text, copied into the cache
+            result: Its metadata
+        """
+        target = self.text_path(digest)
+        temp_file = partial_path(target)
+        # The metadata goes first, a text without it is not a valid entry
+        write_json_atomic(self._meta_path(digest), asdict(result), indent=None)
+        shutil.copyfile(text_file, temp_file)
+        os.replace(temp_file, target)
+        size = target.stat().st_size
+        with self._lock:
+            self._bytes -= self._entries.pop(digest, 0)
+            self._entries[digest] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def _remove_locked(self, digest: str) -> None:
+        self._bytes -= self._entries.pop(digest, 0)
+        self.text_path(digest).unlink(missing_ok=True)
+        self._meta_path(digest).unlink(missing_ok=True)
+
+
+_caches: dict[Path, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def open_result_cache(options: ConvertOptions | None) -> ResultCache | None:
+    """
+    The result cache of the run, shared by every document and thread.
+
+    The cache is an optimization, so a directory that cannot be used only disables it.
+
+    Returns:
+        ResultCache | None: The cache, or None when caching is off
+    """
+    if options is None or options.result_cache_dir is None:
+        return None
+    root = options.result_cache_dir
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            try:
+                cache = ResultCache(root, options.result_cache_max_bytes)
+            except OSError as e:
+                print(f"Error opening the result cache in {root}: {e}")
+                return None
+            _caches[root] = cache
+        return cache
@@ -0,0 +1,261 @@
+"""
+Where the outcome of every document of a run goes.
+
+A Result lists every input, output and error of a run, which on a million document
+run is a lot of memory (errors keep their subprocess state) and is lost if the
+process dies. A ResultSink takes the outcomes one by one as documents finish and
+keeps a ResultSummary of counters:
+
+    MemoryResultSink  keeps every outcome, for scan_and_convert_pdfs() and its Result
+    JsonlResultSink   appends each outcome to a JSON lines file as it happens and
+                      keeps nothing else in memory, the Result can be rebuilt from
+                      the file on demand, also after a crash
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pdf_ingest.supervisor import is_timeout
+from pdf_ingest.types import Result, TranslationItem
+
+OUTCOMES_NAME = ".pdf_ingest_outcomes.jsonl"
+
+
+@dataclass(slots=True)
+class ResultSummary:
+    """
+    Counters of a run, the only per-run state a streaming sink keeps.
+    """
+
+    documents: int = 0
+    converted: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    missing_json: int = 0
+
+    def add(self, success: bool, timed_out: bool, json_exists: bool) -> None:
+        self.documents += 1
+        if success:
+            self.converted += 1
+        else:
+            self.failed += 1
+        if timed_out:
+            self.timed_out += 1
+        if not json_exists:
+            self.missing_json += 1
+
+
+@dataclass
+class Outcome:
+    """
+    One finished document, as written by JsonlResultSink.
+    """
+
+    position: int  # discovery order
+    input_file: str
+    output_file: str
+    success: bool
+    error: str | None  # "ExceptionType: message"
+    timed_out: bool
+    json_exists: bool
+
+
+class ResultSink(ABC):
+    """
+    Receives the outcome of every document, from any worker thread.
+    """
+
+    def __init__(self) -> None:
+        self.summary = ResultSummary()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        position: int,
+        item: TranslationItem,
+        err: Exception | None,
+        success: bool,
+    ) -> None:
+        """
+        Take the outcome of one document.
+
+        Args:
+            position: Discovery order of the document, the Result is in this order
+            item: The document
+            err: Why it failed, if it did
+            success: Whether the text was written
+        """
+        with self._lock:
+            self.summary.add(success, is_timeout(err), item.json_exists)
+            self._store(position, item, err, success)
+
+    @abstractmethod
+    def _store(
+        self,
+        position: int,
+        item: TranslationItem,
+        err: Exception | None,
+        success: bool,
+    ) -> None:
+        """Keep an outcome, called under the sink lock."""
+
+    @abstractmethod
+    def to_result(self) -> Result:
+        """Build the Result of every outcome recorded so far, in discovery order."""
+
+    def close(self) -> None:
+        """Release what the sink holds, outcomes recorded afterwards are lost."""
+
+
+class MemoryResultSink(ResultSink):
+    """
+    Keeps every outcome in memory, exceptions included.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._outcomes: list[tuple[int, TranslationItem, Exception | None, bool]] = []
+
+    def _store(
+        self,
+        position: int,
+        item: TranslationItem,
+        err: Exception | None,
+        success: bool,
+    ) -> None:
+        self._outcomes.append((position, item, err, success))
+
+    def to_result(self) -> Result:
+        with self._lock:
+            outcomes = sorted(self._outcomes, key=lambda outcome: outcome[0])
+        result = _empty_result()
+        for _, item, err, success in outcomes:
+            _add_to_result(
+                result,
+                item.input_file,
+                item.output_file,
+                err,
+                success,
+                is_timeout(err),
+                item.json_exists,
+            )
+        return result
+
+
+class JsonlResultSink(ResultSink):
+    """
+    Streams outcomes to a JSON lines file, one line per document as soon as it is done.
+
+    The file is started over by every run.
+    """
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _store(
+        self,
+        position: int,
+        item: TranslationItem,
+        err: Exception | None,
+        success: bool,
+    ) -> None:
+        outcome = Outcome(
+            position=position,
+            input_file=str(item.input_file),
+            output_file=str(item.output_file),
+            success=success,
+            error=None if err is None else f"{type(err).__name__}: {err}",
+            timed_out=is_timeout(err),
+            json_exists=item.json_exists,
+        )
+        try:
+            self._file.write(json.dumps(asdict(outcome), ensure_ascii=False) + "\n")
+            # Readable by to_result() and by other processes right away
+            self._file.flush()
+        except OSError as e:
+            # The document itself is done, only its line in the report is lost
+            print(f"Error writing the outcome of {item.input_file.name}: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def outcomes(self) -> Iterator[Outcome]:
+        """
+        The outcomes written so far, in the order they finished.
+        """
+        return read_outcomes(self.path)
+
+    def to_result(self) -> Result:
+        """
+        Rebuild the Result from the file. Errors come back as plain Exceptions that
+        carry the original type name and message.
+        """
+        outcomes = sorted(self.outcomes(), key=lambda outcome: outcome.position)
+        result = _empty_result()
+        for outcome in outcomes:
+            _add_to_result(
+                result,
+                Path(outcome.input_file),
+                Path(outcome.output_file),
+                None if outcome.error is None else Exception(outcome.error),
+                outcome.success,
+                outcome.timed_out,
+                outcome.json_exists,
+            )
+        return result
+
+
+def read_outcomes(path: Path) -> Iterator[Outcome]:
+    """
+    Read the outcomes of a JSON lines file written by JsonlResultSink, one at a time.
+
+    A truncated last line, left by a crash mid-write, is skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield Outcome(**json.loads(line))
+            except (json.JSONDecodeError, TypeError):
+                print(f"Ignoring malformed outcome line in {path}")
+
+
+def _empty_result() -> Result:
+    return Result(
+        input_files=[],
+        output_files=[],
+        untranstlatable=[],
+        errors=[],
+        missing_json_files=[],
+    )
+
+
+def _add_to_result(
+    result: Result,
+    input_file: Path,
+    output_file: Path,
+    err: Exception | None,
+    success: bool,
+    timed_out: bool,
+    json_exists: bool,
+) -> None:
+    result.input_files.append(input_file)
+    if success:
+        result.output_files.append(output_file)
+    else:
+        result.untranstlatable.append(input_file)
+        if err is not None:
+            result.errors.append(err)
+        if timed_out:
+            result.timed_out.append(input_file)
+    if not json_exists:
+        result.missing_json_files.append(input_file)
@@ -8,11 +8,31 @@
 
 
 import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
 
 from pdf_ingest.djvu import process_djvu_file
+from pdf_ingest.json_util import write_json_atomic
+from pdf_ingest.manifest import Manifest
+from pdf_ingest.metadata_index import MetadataIndex
+from pdf_ingest.metrics import flush_metrics
 from pdf_ingest.pdf import process_pdf_file
-from pdf_ingest.types import Result, TranslationItem
+from pdf_ingest.pipeline import Pipeline, StageLimits
+from pdf_ingest.result_sink import MemoryResultSink, ResultSink, ResultSummary
+from pdf_ingest.scheduling import (
+    SCHEDULES,
+    estimate_cost,
+    shortest_first,
+    split_lanes,
+)
+from pdf_ingest.types import ConvertOptions, Result, TranslationItem
 
 HERE = Path(__file__).parent.resolve()
 TEST_DATA = HERE / "input"
@@ -38,161 +58,540 @@ def prompt_for_input_dir() -> Path:
             )
 
 
-def _scan_for_untreated_files(
-    input_dir: Path, output_dir: Path
-) -> list[TranslationItem]:
+SUPPORTED_SUFFIXES = (".pdf", ".djvu")
+
+ENGINES = ("pool", "pipeline")
+
+
+def iter_documents(input_dir: Path) -> Iterator[Path]:
     """
-    Scan for PDF and DJVU files in the input directory that don't have corresponding
-    text files in the output directory. Also checks for corresponding JSON files.
+    Walk the input tree once with os.scandir and yield PDF and DJVU files as they are found.
+
+    Suffixes are matched case-insensitively and entries are sorted per directory, so
+    the order is stable across runs without listing the whole tree first. Like
+    Path.glob("**/*.pdf"), symlinked files are yielded but symlinked directories are
+    not entered, so a symlink cycle cannot make the walk loop.
+    """
+    stack = [str(input_dir)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
+            continue
+        subdirs: list[str] = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(
+                    follow_symlinks=True
+                ) and entry.name.lower().endswith(SUPPORTED_SUFFIXES):
+                    yield Path(entry.path)
+            except OSError as e:
+                print(f"Error reading {entry.path}: {e}")
+        # Depth first, in name order
+        stack.extend(reversed(subdirs))
+
+
+def make_untreated_item(
+    file_path: Path,
+    input_dir: Path,
+    output_dir: Path,
+    manifest: Manifest | None = None,
+    created_dirs: set[Path] | None = None,
+) -> TranslationItem | None:
+    """
+    Build the work item for one input file, unless it has already been treated.
+
+    Creates the output directory and an empty JSON file for the item.
 
     Args:
+        file_path: The PDF or DJVU file
         input_dir: Directory containing PDF and DJVU files
         output_dir: Directory where text files will be saved
+        manifest: Manifest of finished conversions, files recorded there are skipped
+        created_dirs: Output directories already created, updated in place
 
     Returns:
-        list[TranslationItem]: List of files to process with their metadata
+        TranslationItem | None: The item to process, or None if the file is already done
+    """
+    # Print the name of the file
+    print(f"Found file: {file_path.name}")
+
+    # Determine the relative path from input_dir
+    rel_path = file_path.relative_to(input_dir)
+
+    # The manifest knows the language-tagged output name, so check it first
+    if manifest is not None and manifest.is_done(file_path, rel_path):
+        print(f"{rel_path} is recorded in the manifest. Skipping conversion.")
+        return None
+
+    # Converted before but modified since: the old text and its sidecar JSON describe
+    # the previous version, so neither may cause the file to be skipped
+    stale = manifest.stale_entry(file_path, rel_path) if manifest is not None else None
+    if stale is not None:
+        print(f"{rel_path} changed since it was converted. Converting it again.")
+        (output_dir / stale.output_file).unlink(missing_ok=True)
+
+    # Create the output file path with the same relative structure
+    # We'll update this with language code later after detection
+    txt_file_output = output_dir / rel_path.with_suffix(".txt")
+
+    # Create parent directories for output file if they don't exist
+    if created_dirs is None or txt_file_output.parent not in created_dirs:
+        txt_file_output.parent.mkdir(exist_ok=True, parents=True)
+        if created_dirs is not None:
+            created_dirs.add(txt_file_output.parent)
+
+    # Check if output file already exists
+    if txt_file_output.exists():
+        print(f"Text file {txt_file_output} already exists. Skipping conversion.")
+        return None
+
+    # Check if corresponding .json file exists
+    json_file = output_dir / rel_path.with_suffix(".json")
+    json_exists = json_file.exists()
+
+    # Skip if JSON file already exists (translation already done)
+    if json_exists and stale is None:
+        # now check that the json is not empty
+        with open(json_file, "r") as f:
+            try:
+                json_data = json.load(f)
+
+                key = "language_detection_reliable"
+                if json_data.get(key):
+                    print(
+                        f"JSON file {json_file} already exists. Skipping this file as it's already processed."
+                    )
+                    return None
+            except json.JSONDecodeError:
+                pass
+
+    # Print the full path of the file
+    print(f"Input file: {file_path.name}")
+    print(f"Output file: {txt_file_output.name}")
+
+    # Create empty JSON file if it doesn't exist
+    print(f"JSON file {json_file} does not exist. Translation not done.")
+    # Create empty JSON file
+    json_data = {"language": ""}
+    write_json_atomic(json_file, json_data, indent=None)
+    print(f"Created empty JSON file: {json_file}")
+
+    return TranslationItem(
+        input_file=file_path,
+        output_file=txt_file_output,
+        json_file=json_file,
+        json_exists=json_exists,
+        json_data=json_data,
+    )
+
+
+def _iter_untreated_files(
+    input_dir: Path, output_dir: Path, manifest: Manifest | None = None
+) -> Iterator[TranslationItem]:
     """
-    # Iterate on all the pdf and djvu files in the input directory, including subfolders
-    files_to_process: list[TranslationItem] = []  # input/output path
+    Yield PDF and DJVU files in the input directory that don't have corresponding
+    text files in the output directory, as soon as they are discovered. Also checks
+    for corresponding JSON files.
 
+    Args:
+        input_dir: Directory containing PDF and DJVU files
+        output_dir: Directory where text files will be saved
+        manifest: Manifest of finished conversions, files recorded there are skipped
+
+    Yields:
+        TranslationItem: The next file to process with its metadata
+    """
     # Create output directory if it doesn't exist
     # output_dir.mkdir(exist_ok=True, parents=True)
     assert input_dir.exists(), f"Input directory {input_dir} does not exist"
     assert output_dir.exists(), f"Output directory {output_dir} does not exist"
 
-    search_list = list(input_dir.glob("**/*.pdf"))
-    search_list += list(input_dir.glob("**/*.djvu"))
+    # Output directories already created, so mkdir runs once per directory, not per file
+    created_dirs: set[Path] = set()
 
     # Find all PDF and DJVU files recursively
-    for file_path in search_list:
-        # Skip directories
-        if file_path.is_dir():
-            continue
-
-        # Print the name of the file
-        print(f"Found file: {file_path.name}")
+    for file_path in iter_documents(input_dir):
+        item = make_untreated_item(
+            file_path, input_dir, output_dir, manifest, created_dirs
+        )
+        if item is not None:
+            yield item
 
-        # Determine the relative path from input_dir
-        rel_path = file_path.relative_to(input_dir)
 
-        # Create the output file path with the same relative structure
-        # We'll update this with language code later after detection
-        txt_file_output = output_dir / rel_path.with_suffix(".txt")
+def _scan_for_untreated_files(
+    input_dir: Path, output_dir: Path, manifest: Manifest | None = None
+) -> list[TranslationItem]:
+    """
+    Scan for PDF and DJVU files in the input directory that don't have corresponding
+    text files in the output directory. Also checks for corresponding JSON files.
 
-        # Create parent directories for output file if they don't exist
-        txt_file_output.parent.mkdir(exist_ok=True, parents=True)
+    Args:
+        input_dir: Directory containing PDF and DJVU files
+        output_dir: Directory where text files will be saved
+        manifest: Manifest of finished conversions, files recorded there are skipped
 
-        # Check if output file already exists
-        if txt_file_output.exists():
-            print(f"Text file {txt_file_output} already exists. Skipping conversion.")
-            continue
+    Returns:
+        list[TranslationItem]: List of files to process with their metadata
+    """
+    return list(_iter_untreated_files(input_dir, output_dir, manifest))
 
-        # Check if corresponding .json file exists
-        json_file = output_dir / rel_path.with_suffix(".json")
-        json_exists = json_file.exists()
-
-        # Skip if JSON file already exists (translation already done)
-        if json_exists:
-            # now check that the json is not empty
-            with open(json_file, "r") as f:
-                try:
-                    json_data = json.load(f)
-
-                    key = "language_detection_reliable"
-                    if json_data.get(key):
-                        print(
-                            f"JSON file {json_file} already exists. Skipping this file as it's already processed."
-                        )
-                        continue
-                except json.JSONDecodeError:
-                    pass
-
-        # Print the full path of the file
-        print(f"Input file: {file_path.name}")
-        print(f"Output file: {txt_file_output.name}")
-
-        assert not json_exists
-        # Create empty JSON file if it doesn't exist
-        print(f"JSON file {json_file} does not exist. Translation not done.")
-        # Create empty JSON file
-        with open(json_file, "w") as f:
-            json.dump({"language": ""}, f)
-        print(f"Created empty JSON file: {json_file}")
-
-        files_to_process.append(
-            TranslationItem(
-                input_file=file_path,
-                output_file=txt_file_output,
-                json_file=json_file,
-                json_exists=json_exists,
-            )
-        )
 
-    return files_to_process
+def default_jobs() -> int:
+    """
+    Default number of worker threads, one per available CPU.
+    """
+    return os.cpu_count() or 1
 
 
-def scan_and_convert_pdfs(input_dir: Path, output_dir: Path) -> Result:
+def share_cpus(options: ConvertOptions | None, documents: int) -> ConvertOptions:
     """
-    Scan for PDF and DJVU files in the input directory and convert them to text files in the output directory.
-    Also checks for corresponding .json files - missing .json files indicate translation is not done.
+    Split the CPUs among the documents OCR'd at the same time.
+
+    Each document OCRs its pages in parallel too, with ocr_workers tesseract processes
+    (PDF and DJVU alike), or ocrmypdf_jobs when a PDF falls back to ocrmypdf. Left at
+    their CPU count defaults, jobs documents would run up to jobs x CPU count OCR
+    processes at once. Values set explicitly are kept.
 
     Args:
-        input_dir: Directory containing PDF and DJVU files
-        output_dir: Directory where text files will be saved
+        options: The converter tuning of the run
+        documents: How many documents may be OCR'd at the same time
 
     Returns:
-        Result: Object containing lists of input files, output files, errors, and missing json files
+        ConvertOptions: The options with the per document worker counts filled in
     """
-
-    # Iterate on all the pdf and djvu files in the input directory
-    files_to_process = _scan_for_untreated_files(
-        input_dir=input_dir, output_dir=output_dir
+    options = options or ConvertOptions()
+    workers = max(1, (os.cpu_count() or 1) // max(1, documents))
+    return replace(
+        options,
+        ocr_workers=options.ocr_workers or workers,
+        ocrmypdf_jobs=options.ocrmypdf_jobs or workers,
     )
 
-    print(f"Found {len(files_to_process)} files to process")
 
-    input_files: list[Path] = []
-    output_files: list[Path] = []
-    errors: list[Exception] = []
-    remaining_files: list[TranslationItem] = []
+def process_item(
+    item: TranslationItem, options: ConvertOptions | None = None
+) -> tuple[Exception | None, bool]:
+    """
+    Dispatch a single item to the matching converter.
+
+    Never raises: any exception escaping a converter is returned as the error so that
+    one bad document cannot take down the rest of the batch.
 
-    for item in files_to_process:
-        # Add input file to the list
-        input_files.append(item.input_file)
+    Args:
+        item: TranslationItem containing input and output file paths
+        options: Converter tuning shared by the whole run
 
-        # Handle different file types
-        suffix = item.input_file.suffix.lower()
+    Returns:
+        tuple: (error, success) where error is None if successful and success is True if file was processed
+    """
+    suffix = item.input_file.suffix.lower()
+    try:
         if suffix == ".pdf":
-            err, success = process_pdf_file(item)
-        elif suffix == ".djvu":
-            err, success = process_djvu_file(item)
+            return process_pdf_file(item, options)
+        if suffix == ".djvu":
+            return process_djvu_file(item, options)
+    except Exception as e:
+        print(f"Unexpected error processing {item.input_file.name}: {e}")
+        return e, False
+    print(f"Unsupported file type: {item.input_file.suffix}")
+    return Exception(f"Unsupported file type: {item.input_file.suffix}"), False
+
+
+def process_and_record(
+    item: TranslationItem,
+    input_dir: Path,
+    manifest: Manifest | None,
+    options: ConvertOptions | None,
+    index: MetadataIndex | None = None,
+) -> tuple[Exception | None, bool]:
+    """
+    Convert one item with process_item() and record it in the manifest and the
+    metadata index on success.
+    """
+    start = time.monotonic()
+    err, success = process_item(item, options)
+    if success:
+        record_success(item, input_dir, manifest, index, time.monotonic() - start)
+    return err, success
+
+
+def record_success(
+    item: TranslationItem,
+    input_dir: Path,
+    manifest: Manifest | None,
+    index: MetadataIndex | None,
+    duration: float,
+) -> None:
+    """
+    Record a converted item in the manifest and the metadata index, if enabled.
+
+    Never raises: the text file is already written, a missing record only costs a rerun.
+    """
+    rel_path = item.input_file.relative_to(input_dir)
+    if manifest is not None:
+        try:
+            manifest.record(
+                input_file=item.input_file,
+                rel_path=rel_path,
+                output_file=item.output_file,
+                language=item.language,
+                method=item.method,
+                duration=duration,
+                content_hash=item.content_hash,
+            )
+        except OSError as e:
+            print(f"Error recording {item.input_file.name} in the manifest: {e}")
+    if index is not None:
+        try:
+            index.record(item, rel_path, duration)
+        except sqlite3.Error as e:
+            print(f"Error recording {item.input_file.name} in the index: {e}")
+
+
+def _convert_scheduled(
+    items: list[TranslationItem],
+    convert: Callable[[TranslationItem], tuple[Exception | None, bool]],
+    jobs: int,
+    schedule: str,
+    fast_lane_jobs: int,
+    sink: ResultSink,
+) -> None:
+    """
+    Estimate the cost of every item, then convert them in the order of the schedule.
+    Outcomes go to the sink, with the position of the item in items.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        estimates = list(executor.map(estimate_cost, [i.input_file for i in items]))
+
+    if schedule == "sjf":
+        lanes = [(shortest_first(estimates), jobs)]
+    else:
+        fast, slow = split_lanes(estimates)
+        # With only one kind of work there is nothing to keep apart
+        if fast and slow:
+            lanes = [(fast, fast_lane_jobs), (slow, jobs)]
         else:
-            print(f"Unsupported file type: {item.input_file.suffix}")
-            remaining_files.append(item)
-            errors.append(Exception(f"Unsupported file type: {item.input_file.suffix}"))
-            continue
+            lanes = [(fast or slow, jobs)]
+        print(f"Fast lane: {len(fast)} file(s), OCR lane: {len(slow)} file(s)")
+
+    executors = [ThreadPoolExecutor(max_workers=workers) for _, workers in lanes]
+    try:
+        for (order, _), executor in zip(lanes, executors):
+            for index in order:
+                executor.submit(_convert_into, sink, index, items[index], convert)
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True)
+
+
+def _convert_pipelined(
+    items: Iterator[TranslationItem],
+    limits: StageLimits,
+    options: ConvertOptions | None,
+    input_dir: Path,
+    manifest: Manifest | None,
+    index: MetadataIndex | None,
+    sink: ResultSink,
+) -> None:
+    """
+    Feed the items to a Pipeline as they are discovered, outcomes go to the sink.
+    """
 
+    def on_done(
+        position: int,
+        item: TranslationItem,
+        err: Exception | None,
+        success: bool,
+        duration: float,
+    ) -> None:
+        sink.record(position, item, err, success)
         if success:
-            output_files.append(item.output_file)
-            # Language detection and JSON update already done during processing
-        else:
-            remaining_files.append(item)
-            if err is not None:
-                errors.append(err)
-
-    # Create list of untranslatable files from remaining_files
-    untranslatable = [item.input_file for item in remaining_files]
-
-    # Create list of missing JSON files from files_to_process
-    missing_json_files = [
-        item.input_file for item in files_to_process if not item.json_exists
-    ]
-
-    # Create and return the Result object
-    return Result(
-        input_files=input_files,
-        output_files=output_files,
-        untranstlatable=untranslatable,
-        errors=errors,
-        missing_json_files=missing_json_files,
+            record_success(item, input_dir, manifest, index, duration)
+
+    pipeline = Pipeline(limits, on_done, options)
+    try:
+        for position, item in enumerate(items):
+            pipeline.submit(position, item)
+    finally:
+        pipeline.close()
+
+
+def _convert_into(
+    sink: ResultSink,
+    position: int,
+    item: TranslationItem,
+    convert: Callable[[TranslationItem], tuple[Exception | None, bool]],
+) -> None:
+    err, success = convert(item)
+    sink.record(position, item, err, success)
+
+
+def scan_and_convert_to_sink(
+    input_dir: Path,
+    output_dir: Path,
+    sink: ResultSink,
+    jobs: int | None = None,
+    use_manifest: bool = True,
+    content_hash: bool = False,
+    options: ConvertOptions | None = None,
+    schedule: str = "fifo",
+    fast_lane_jobs: int | None = None,
+    use_index: bool = False,
+    engine: str = "pool",
+    limits: StageLimits | None = None,
+) -> ResultSummary:
+    """
+    Like scan_and_convert_pdfs(), but the outcome of every file goes to the sink as
+    soon as it is known, nothing is collected in memory. For very large runs, with a
+    JsonlResultSink.
+
+    Args:
+        sink: Where the outcomes go, see scan_and_convert_pdfs() for the others
+
+    Returns:
+        ResultSummary: The counters of the sink
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs < 1:
+        raise ValueError(f"jobs must be at least 1, got {jobs}")
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown schedule {schedule!r}, expected one of {SCHEDULES}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "pipeline" and schedule != "fifo":
+        raise ValueError(
+            "The pipeline engine orders its OCR queue itself, use schedule='fifo'"
+        )
+    if fast_lane_jobs is None:
+        fast_lane_jobs = max(1, jobs // 4)
+    if engine == "pipeline":
+        limits = limits or StageLimits.for_jobs(jobs)
+        options = share_cpus(options, limits.ocr)
+    else:
+        options = share_cpus(options, jobs)
+
+    manifest: Manifest | None = None
+    if use_manifest:
+        manifest = Manifest(output_dir, use_content_hash=content_hash)
+        print(f"Loaded {len(manifest)} entries from {manifest.path}")
+
+    index: MetadataIndex | None = None
+    if use_index:
+        index = MetadataIndex(output_dir)
+
+    convert = partial(
+        process_and_record,
+        input_dir=input_dir,
+        manifest=manifest,
+        options=options,
+        index=index,
+    )
+
+    # In scan order, conversion starts as soon as the first file is discovered and the
+    # scan keeps going in this thread while the workers are busy
+    print(f"Scanning {input_dir} and converting with {jobs} job(s)")
+    untreated = _iter_untreated_files(
+        input_dir=input_dir, output_dir=output_dir, manifest=manifest
+    )
+    if engine == "pipeline":
+        _convert_pipelined(
+            untreated,
+            limits or StageLimits.for_jobs(jobs),
+            options,
+            input_dir,
+            manifest,
+            index,
+            sink,
+        )
+    elif schedule != "fifo":
+        files_to_process = list(untreated)
+        print(f"Estimating the cost of {len(files_to_process)} file(s) ({schedule})")
+        _convert_scheduled(
+            files_to_process, convert, jobs, schedule, fast_lane_jobs, sink
+        )
+    elif jobs == 1:
+        for position, item in enumerate(untreated):
+            _convert_into(sink, position, item, convert)
+    else:
+        # Bound the work queued ahead of the workers, without waiting on any particular file
+        slots = threading.BoundedSemaphore(jobs * 2)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for position, item in enumerate(untreated):
+                slots.acquire()
+                future = executor.submit(_convert_into, sink, position, item, convert)
+                future.add_done_callback(lambda _: slots.release())
+    flush_metrics()
+    if index is not None:
+        index.close()
+
+    print(f"Processed {sink.summary.documents} files")
+    return sink.summary
+
+
+def scan_and_convert_pdfs(
+    input_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    use_manifest: bool = True,
+    content_hash: bool = False,
+    options: ConvertOptions | None = None,
+    schedule: str = "fifo",
+    fast_lane_jobs: int | None = None,
+    use_index: bool = False,
+    engine: str = "pool",
+    limits: StageLimits | None = None,
+) -> Result:
+    """
+    Scan for PDF and DJVU files in the input directory and convert them to text files in the output directory.
+    Also checks for corresponding .json files - missing .json files indicate translation is not done.
+
+    Files are converted concurrently on a thread pool. The heavy lifting happens in
+    external processes (pdftotext, ocrmypdf, tesseract), so threads are enough to keep
+    every core busy. The Result lists are always in scan order, regardless of the order
+    in which files finish.
+
+    With the "sjf" and "lanes" schedules the whole tree is scanned and every file is
+    probed for its cost first, see pdf_ingest.scheduling.
+
+    The "pipeline" engine runs probing, text extraction, OCR, language detection and
+    the commit on separate pools instead, see pdf_ingest.pipeline.
+
+    Args:
+        input_dir: Directory containing PDF and DJVU files
+        output_dir: Directory where text files will be saved
+        jobs: Number of files to convert in parallel, defaults to the CPU count
+        use_manifest: Record finished files in the output directory manifest and skip them on reruns
+        content_hash: Also store a content hash in the manifest, so touched but unchanged files are skipped
+        options: Converter tuning shared by every file, e.g. OCR workers and scratch limits
+        schedule: "fifo" (scan order), "sjf" (shortest job first) or "lanes" (fast lane for text extraction)
+        fast_lane_jobs: Workers of the fast lane on top of jobs, defaults to a quarter of jobs
+        use_index: Also record every converted file in the SQLite metadata index of the output directory
+        engine: "pool" (one worker per file) or "pipeline" (one pool per stage)
+        limits: Workers per stage of the pipeline engine, defaults to jobs for every stage
+
+    Returns:
+        Result: Object containing lists of input files, output files, errors, and missing json files
+    """
+    sink = MemoryResultSink()
+    scan_and_convert_to_sink(
+        input_dir=input_dir,
+        output_dir=output_dir,
+        sink=sink,
+        jobs=jobs,
+        use_manifest=use_manifest,
+        content_hash=content_hash,
+        options=options,
+        schedule=schedule,
+        fast_lane_jobs=fast_lane_jobs,
+        use_index=use_index,
+        engine=engine,
+        limits=limits,
     )
+    return sink.to_result()
@@ -0,0 +1,104 @@
+"""
+Cost-aware ordering of the work queue.
+
+A 2,000 page scan that needs OCR costs as much as hundreds of born-digital PDFs, so
+converting in scan order lets one such book hold up everything behind it. Before
+dispatch, every file is probed for its page count (pdfinfo/djvused) and whether a
+sample page has a usable text layer. The estimate drives one of:
+
+    fifo   scan order, conversion starts while the scan is still running
+    sjf    shortest job first, most documents finish early
+    lanes  a fast lane of workers for text extraction, the main pool takes the OCR
+           work longest first, so no big book is left to run alone at the end
+"""
+
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ingest.djvu import extract_djvu_page_text, get_djvu_page_count
+from pdf_ingest.pdf import extract_pdf_page_text, get_pdf_page_count
+from pdf_ingest.supervisor import BYTES_PER_PAGE_GUESS
+from pdf_ingest.text_quality import page_needs_ocr
+
+SCHEDULES = ("fifo", "sjf", "lanes")
+
+# Relative cost of one page, OCR is roughly 40x slower than pdftotext
+TEXT_PAGE_COST = 1.0
+OCR_PAGE_COST = 40.0
+
+
+@dataclass
+class CostEstimate:
+    """
+    Estimated conversion cost of one input file.
+    """
+
+    pages: int
+    size: int
+    has_text: bool
+
+    @property
+    def cost(self) -> float:
+        page_cost = TEXT_PAGE_COST if self.has_text else OCR_PAGE_COST
+        return self.pages * page_cost
+
+
+def estimate_cost(input_file: Path) -> CostEstimate:
+    """
+    Probe a PDF or DJVU file for its page count and text layer.
+
+    The text layer of a middle page decides whether the file is expected to need OCR.
+    When the page count cannot be read, it is guessed from the file size.
+
+    Args:
+        input_file: The PDF or DJVU file
+
+    Returns:
+        CostEstimate: The estimate, never fails
+    """
+    try:
+        size = input_file.stat().st_size
+    except OSError:
+        size = 0
+    is_pdf = input_file.suffix.lower() == ".pdf"
+    if is_pdf:
+        pages = get_pdf_page_count(input_file)
+    else:
+        pages = get_djvu_page_count(input_file)
+    if pages is None or pages < 1:
+        pages = max(1, size // BYTES_PER_PAGE_GUESS)
+
+    # A middle page, covers and title pages are often images even in digital files
+    extract_page_text = extract_pdf_page_text if is_pdf else extract_djvu_page_text
+    try:
+        text = extract_page_text(input_file, pages // 2 + 1)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Error probing the text layer of {input_file.name}: {e}")
+        text = None
+    has_text = text is not None and not page_needs_ocr(text)
+    return CostEstimate(pages=pages, size=size, has_text=has_text)
+
+
+def shortest_first(estimates: list[CostEstimate]) -> list[int]:
+    """
+    Indices of the estimates, cheapest first. Equal costs go smallest file first,
+    remaining ties keep scan order.
+    """
+    return sorted(
+        range(len(estimates)), key=lambda i: (estimates[i].cost, estimates[i].size)
+    )
+
+
+def split_lanes(estimates: list[CostEstimate]) -> tuple[list[int], list[int]]:
+    """
+    Split the estimates into a fast lane of text extractions, cheapest first, and
+    the OCR work, most expensive first.
+
+    Returns:
+        tuple: (fast, slow) lists of indices into estimates
+    """
+    order = shortest_first(estimates)
+    fast = [i for i in order if estimates[i].has_text]
+    slow = [i for i in reversed(order) if not estimates[i].has_text]
+    return fast, slow
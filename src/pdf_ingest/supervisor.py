@@ -0,0 +1,249 @@
+"""
+Supervised runs of the external converters (pdftotext, ocrmypdf, tesseract, ddjvu, ...).
+
+A single pathological document can make a converter spin forever or eat all the
+memory of the container, taking every other job in flight down with it. Once limits
+are set with configure_limits(), every converter process gets:
+
+- a wall clock timeout that scales with the pages it works on, per page cost of its
+  stage ("text" for extraction and rendering, "ocr" for recognition), with a floor
+- RLIMIT_AS and RLIMIT_CPU, set on the child right after it is spawned and inherited
+  by the processes it starts
+- its own process group, killed as a whole on timeout, so no tesseract started by
+  ocrmypdf is left behind
+
+A timeout raises subprocess.TimeoutExpired, converters return it like any other error
+and the document is reported in Result.timed_out. Without limits, run() behaves like
+subprocess.run().
+
+Counting pages costs a process of its own (pdfinfo, djvused). Whole document text
+extraction, which is fast per page, is timed on a page count guessed from the file
+size instead, and counts that are read are remembered per file version with
+cached_page_count(), so the scheduler and the OCR path of a document share one.
+"""
+
+import os
+import resource
+import signal
+import subprocess
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+STAGES = ("text", "ocr")
+
+# Rough size of a scanned page, used to guess page counts without reading them
+BYTES_PER_PAGE_GUESS = 100_000
+_PAGE_COUNT_CACHE_SIZE = 4096
+
+
+@dataclass
+class ResourceLimits:
+    """
+    Limits of every external converter process.
+    """
+
+    # Wall clock seconds per page of text extraction or rendering, no timeout if None
+    text_page_seconds: float | None = None
+    # Wall clock seconds per page of OCR, no timeout if None
+    ocr_page_seconds: float | None = None
+    # Lower bound of every timeout, covers process startup and tiny documents
+    min_seconds: float = 60.0
+    # Address space of each process in MiB, unlimited if None
+    memory_mb: int | None = None
+    # CPU seconds of each process, unlimited if None
+    cpu_seconds: int | None = None
+
+    def __post_init__(self):
+        for name in (
+            "text_page_seconds",
+            "ocr_page_seconds",
+            "memory_mb",
+            "cpu_seconds",
+        ):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+        if self.min_seconds < 0:
+            raise ValueError("min_seconds must not be negative")
+
+    def timeout(self, pages: int | None, stage: str = "text") -> float | None:
+        """
+        Wall clock timeout of a call working on pages pages, None for no timeout.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage {stage!r}, expected one of {STAGES}")
+        per_page = self.ocr_page_seconds if stage == "ocr" else self.text_page_seconds
+        if per_page is None:
+            return None
+        return max(self.min_seconds, per_page * (pages or 0))
+
+
+_limits: ResourceLimits | None = None
+
+
+def configure_limits(limits: ResourceLimits | None) -> None:
+    """
+    Apply limits to every converter process started from now on, None to lift them.
+    """
+    global _limits
+    _limits = limits
+
+
+def current_limits() -> ResourceLimits | None:
+    """
+    The limits set with configure_limits(), for work that runs in other processes.
+    """
+    return _limits
+
+
+def timeouts_enabled() -> bool:
+    """
+    Whether calls are timed, callers only need to count pages for run() then.
+    """
+    limits = _limits
+    return limits is not None and (
+        limits.text_page_seconds is not None or limits.ocr_page_seconds is not None
+    )
+
+
+def guess_pages(path: Path) -> int:
+    """
+    Page count guessed from the file size, at least 1.
+    """
+    try:
+        return max(1, path.stat().st_size // BYTES_PER_PAGE_GUESS)
+    except OSError:
+        return 1
+
+
+_page_counts: OrderedDict[tuple[str, int, int], int | None] = OrderedDict()
+_page_counts_lock = threading.Lock()
+
+
+def cached_page_count(path: Path, count: Callable[[Path], int | None]) -> int | None:
+    """
+    Page count of a file, read with count only once per version of the file.
+
+    Args:
+        path: The document
+        count: Reads the page count, None if it cannot tell
+
+    Returns:
+        int | None: What count returned for this size and mtime of the file
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return count(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _page_counts_lock:
+        if key in _page_counts:
+            _page_counts.move_to_end(key)
+            return _page_counts[key]
+    pages = count(path)
+    with _page_counts_lock:
+        _page_counts[key] = pages
+        while len(_page_counts) > _PAGE_COUNT_CACHE_SIZE:
+            _page_counts.popitem(last=False)
+    return pages
+
+
+def is_timeout(err: BaseException | None) -> bool:
+    """
+    Whether a converter error is a timeout, retrying such a document only wastes time.
+    """
+    return isinstance(err, subprocess.TimeoutExpired)
+
+
+def _set_rlimits(pid: int, limits: ResourceLimits) -> None:
+    # preexec_fn is not safe with threads, so the limits are set from the outside.
+    # The child may run for a moment without them, which is harmless: it is still
+    # starting up, and everything it spawns later inherits them.
+    caps = []
+    if limits.memory_mb is not None:
+        caps.append((resource.RLIMIT_AS, limits.memory_mb * 1024 * 1024))
+    if limits.cpu_seconds is not None:
+        caps.append((resource.RLIMIT_CPU, limits.cpu_seconds))
+    for which, value in caps:
+        try:
+            resource.prlimit(pid, which, (value, value))
+        except ProcessLookupError:
+            # Already done
+            return
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run(
+    command: list[str],
+    pages: int | None = 1,
+    stage: str = "text",
+    check: bool = True,
+    capture_output: bool = False,
+    text: bool = False,
+    errors: str | None = None,
+    env: dict[str, str] | None = None,
+) -> subprocess.CompletedProcess:
+    """
+    Run a converter like subprocess.run(), within the configured limits.
+
+    Args:
+        command: The command line
+        pages: Pages the command works on, scales the timeout
+        stage: "text" or "ocr", the per page cost of the command
+        check: Raise CalledProcessError on a non-zero exit code
+        capture_output: Capture stdout and stderr
+        text: Decode the captured output
+        errors: Decoding error handler
+        env: Environment of the process
+
+    Returns:
+        subprocess.CompletedProcess: The finished process
+
+    Raises:
+        subprocess.TimeoutExpired: The process group ran out of time and was killed
+    """
+    limits = _limits
+    timeout = limits.timeout(pages, stage) if limits is not None else None
+    pipe = subprocess.PIPE if capture_output else None
+    with subprocess.Popen(
+        command,
+        stdout=pipe,
+        stderr=pipe,
+        text=text,
+        errors=errors,
+        env=env,
+        # Without a timeout there is nothing to kill, and children stay in our group
+        # so that Ctrl-C reaches them as before
+        process_group=0 if timeout is not None else None,
+    ) as process:
+        if limits is not None:
+            _set_rlimits(process.pid, limits)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_group(process)
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(
+                command, timeout or 0, output=stdout, stderr=stderr
+            ) from None
+        except BaseException:
+            if timeout is not None:
+                _kill_group(process)
+            else:
+                process.kill()
+            raise
+    returncode = process.returncode
+    if check and returncode:
+        raise subprocess.CalledProcessError(
+            returncode, command, output=stdout, stderr=stderr
+        )
+    return subprocess.CompletedProcess(command, returncode, stdout, stderr)
@@ -0,0 +1,347 @@
+"""
+Synthetic PDF/DJVU corpus for benchmarks.
+
+Born-digital PDFs are written directly with the standard Helvetica font, so their text
+is limited to Latin-1. Image-only and mixed PDFs rasterise those pages with pdftoppm,
+DJVU files are encoded from the same rasters with c44 and bundled with djvm. Kinds
+whose tools are missing are skipped.
+"""
+
+import json
+import random
+import shutil
+import subprocess
+import tempfile
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+CORPUS_INDEX = "corpus.json"
+KINDS = ("text", "image", "mixed", "djvu")
+
+_PAGE_WIDTH = 612
+_PAGE_HEIGHT = 792
+_LINES_PER_PAGE = 46
+_CHARS_PER_LINE = 90
+_RASTER_DPI = 150
+
+# Seed sentences per language, shuffled into pages of plausible looking prose
+_SENTENCES: dict[str, list[str]] = {
+    "en": [
+        "The committee will meet again next week to discuss the annual budget.",
+        "She walked along the river every morning before the city woke up.",
+        "Old maps of the harbour show a lighthouse that no longer exists.",
+        "The results of the survey were published in the spring edition.",
+        "Farmers in the valley planted wheat, barley and a little rye.",
+    ],
+    "fr": [
+        "Le comité se réunira de nouveau la semaine prochaine pour discuter du budget.",
+        "Elle se promenait le long de la rivière chaque matin avant le réveil de la ville.",
+        "Les anciennes cartes du port montrent un phare qui n'existe plus.",
+        "Les résultats de l'enquête ont été publiés dans l'édition du printemps.",
+        "Les agriculteurs de la vallée cultivaient du blé, de l'orge et un peu de seigle.",
+    ],
+    "de": [
+        "Der Ausschuss wird sich nächste Woche erneut treffen, um den Haushalt zu besprechen.",
+        "Sie ging jeden Morgen am Fluss entlang, bevor die Stadt erwachte.",
+        "Alte Karten des Hafens zeigen einen Leuchtturm, den es nicht mehr gibt.",
+        "Die Ergebnisse der Umfrage wurden in der Frühjahrsausgabe veröffentlicht.",
+        "Die Bauern im Tal pflanzten Weizen, Gerste und ein wenig Roggen.",
+    ],
+    "es": [
+        "El comité se reunirá de nuevo la próxima semana para discutir el presupuesto.",
+        "Ella caminaba por la orilla del río cada mañana antes de que despertara la ciudad.",
+        "Los mapas antiguos del puerto muestran un faro que ya no existe.",
+        "Los resultados de la encuesta se publicaron en la edición de primavera.",
+        "Los campesinos del valle sembraban trigo, cebada y un poco de centeno.",
+    ],
+    "it": [
+        "Il comitato si riunirà di nuovo la prossima settimana per discutere il bilancio.",
+        "Camminava lungo il fiume ogni mattina prima che la città si svegliasse.",
+        "Le vecchie mappe del porto mostrano un faro che non esiste più.",
+        "I risultati dell'indagine sono stati pubblicati nell'edizione di primavera.",
+        "I contadini della valle seminavano grano, orzo e un po' di segale.",
+    ],
+    "pt": [
+        "O comitê se reunirá novamente na próxima semana para discutir o orçamento.",
+        "Ela caminhava à beira do rio todas as manhãs antes de a cidade acordar.",
+        "Os mapas antigos do porto mostram um farol que já não existe.",
+        "Os resultados da pesquisa foram publicados na edição da primavera.",
+        "Os agricultores do vale plantavam trigo, cevada e um pouco de centeio.",
+    ],
+    "nl": [
+        "De commissie komt volgende week opnieuw bijeen om de begroting te bespreken.",
+        "Ze liep elke ochtend langs de rivier voordat de stad wakker werd.",
+        "Oude kaarten van de haven tonen een vuurtoren die niet meer bestaat.",
+        "De resultaten van het onderzoek werden in de voorjaarseditie gepubliceerd.",
+        "De boeren in het dal plantten tarwe, gerst en een beetje rogge.",
+    ],
+}
+LANGUAGES = tuple(_SENTENCES)
+
+
+@dataclass
+class CorpusDocument:
+    """
+    One generated document, as listed in corpus.json.
+    """
+
+    path: str  # relative to the corpus directory
+    kind: str  # one of KINDS
+    language: str
+    pages: int
+
+
+@dataclass
+class _Raster:
+    width: int
+    height: int
+    pixels: bytes  # 8 bit grayscale, row major
+
+
+def _page_lines(language: str, rng: random.Random) -> list[str]:
+    words: list[str] = []
+    while sum(len(w) + 1 for w in words) < _LINES_PER_PAGE * _CHARS_PER_LINE:
+        words += rng.choice(_SENTENCES[language]).split()
+    lines: list[str] = []
+    line = ""
+    for word in words:
+        if len(line) + len(word) + 1 > _CHARS_PER_LINE:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return lines[:_LINES_PER_PAGE]
+
+
+def _escape_pdf_text(text: str) -> bytes:
+    raw = text.encode("latin-1", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _text_content(lines: list[str]) -> bytes:
+    parts = [b"BT /F1 11 Tf 14 TL 54 740 Td"]
+    for line in lines:
+        parts.append(b"(" + _escape_pdf_text(line) + b") Tj T*")
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+def write_pdf(path: Path, pages: list[list[str] | _Raster]) -> None:
+    """
+    Write a minimal PDF where each page is either lines of Helvetica text or a
+    full page grayscale image.
+
+    Args:
+        path: Where to write the PDF
+        pages: Text lines or a raster for every page
+    """
+    objects: list[bytes] = [
+        b"",
+        b"",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids: list[int] = []
+    for page in pages:
+        if isinstance(page, _Raster):
+            image = zlib.compress(page.pixels)
+            objects.append(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n"
+                % (page.width, page.height, len(image))
+                + image
+                + b"\nendstream"
+            )
+            image_id = len(objects)
+            content = b"q %d 0 0 %d 0 0 cm /Im1 Do Q" % (_PAGE_WIDTH, _PAGE_HEIGHT)
+            resources = b"<< /XObject << /Im1 %d 0 R >> >>" % image_id
+        else:
+            content = _text_content(page)
+            resources = b"<< /Font << /F1 3 0 R >> >>"
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+            % (_PAGE_WIDTH, _PAGE_HEIGHT, resources, content_id)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets: list[int] = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    path.write_bytes(bytes(out))
+
+
+def _read_pgm(pgm_file: Path) -> _Raster:
+    data = pgm_file.read_bytes()
+    fields: list[bytes] = []
+    pos = 0
+    # Header: magic, width, height, maxval, separated by whitespace, comments start with #
+    while len(fields) < 4:
+        while data[pos : pos + 1].isspace():
+            pos += 1
+        if data[pos : pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        start = pos
+        while not data[pos : pos + 1].isspace():
+            pos += 1
+        fields.append(data[start:pos])
+    if fields[0] != b"P5" or int(fields[3]) > 255:
+        raise ValueError(f"{pgm_file.name} is not an 8 bit binary PGM")
+    width, height = int(fields[1]), int(fields[2])
+    pixels = data[pos + 1 : pos + 1 + width * height]
+    return _Raster(width, height, pixels)
+
+
+def _rasterize(pdf_file: Path, work_dir: Path) -> list[Path]:
+    prefix = work_dir / "raster"
+    subprocess.run(
+        ["pdftoppm", "-r", str(_RASTER_DPI), "-gray", str(pdf_file), str(prefix)],
+        check=True,
+        capture_output=True,
+    )
+    return sorted(work_dir.glob("raster-*.pgm"))
+
+
+def _write_djvu(djvu_file: Path, pgm_files: list[Path], work_dir: Path) -> None:
+    page_files: list[Path] = []
+    for pgm_file in pgm_files:
+        page_file = work_dir / f"{pgm_file.stem}.djvu"
+        subprocess.run(
+            ["c44", "-dpi", str(_RASTER_DPI), str(pgm_file), str(page_file)],
+            check=True,
+            capture_output=True,
+        )
+        page_files.append(page_file)
+    subprocess.run(
+        ["djvm", "-c", str(djvu_file)] + [str(p) for p in page_files],
+        check=True,
+        capture_output=True,
+    )
+
+
+def available_kinds() -> list[str]:
+    """
+    Document kinds that can be generated with the tools on PATH.
+    """
+    kinds = ["text"]
+    if shutil.which("pdftoppm"):
+        kinds += ["image", "mixed"]
+        if shutil.which("c44") and shutil.which("djvm"):
+            kinds.append("djvu")
+    return kinds
+
+
+def generate_document(
+    path: Path, kind: str, language: str, pages: int, seed: int
+) -> None:
+    """
+    Generate a single synthetic document.
+
+    Args:
+        path: Where to write the document
+        kind: "text" (born-digital PDF), "image" (image-only PDF), "mixed" (every third page scanned) or "djvu"
+        language: One of LANGUAGES
+        pages: Number of pages
+        seed: Seed for the generated prose
+    """
+    rng = random.Random(seed)
+    text_pages = [_page_lines(language, rng) for _ in range(pages)]
+    if kind == "text":
+        write_pdf(path, list(text_pages))
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        source_pdf = work_dir / "source.pdf"
+        write_pdf(source_pdf, list(text_pages))
+        pgm_files = _rasterize(source_pdf, work_dir)
+        if kind == "djvu":
+            _write_djvu(path, pgm_files, work_dir)
+            return
+        rasters = [_read_pgm(pgm_file) for pgm_file in pgm_files]
+        if kind == "image":
+            write_pdf(path, list(rasters))
+        elif kind == "mixed":
+            write_pdf(
+                path,
+                [rasters[i] if i % 3 == 2 else text_pages[i] for i in range(pages)],
+            )
+        else:
+            raise ValueError(f"Unknown document kind {kind!r}")
+
+
+def generate_corpus(
+    corpus_dir: Path,
+    docs_per_kind: int = 8,
+    page_counts: tuple[int, ...] = (1, 3, 10, 30),
+    kinds: list[str] | None = None,
+    seed: int = 0,
+) -> list[CorpusDocument]:
+    """
+    Generate a corpus of synthetic documents and index it in corpus.json.
+
+    Languages and page counts are cycled through, so every run with the same arguments
+    produces the same corpus.
+
+    Args:
+        corpus_dir: Directory to write the documents to, created if missing
+        docs_per_kind: Number of documents of each kind
+        page_counts: Page counts to cycle through
+        kinds: Kinds to generate, defaults to every kind the installed tools allow
+        seed: Base seed for the generated prose
+
+    Returns:
+        list[CorpusDocument]: The generated documents
+    """
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    supported = available_kinds()
+    kinds = kinds or supported
+    documents: list[CorpusDocument] = []
+    for kind in kinds:
+        if kind not in supported:
+            print(
+                f"Skipping {kind} documents, the tools to generate them are not installed"
+            )
+            continue
+        suffix = ".djvu" if kind == "djvu" else ".pdf"
+        for i in range(docs_per_kind):
+            language = LANGUAGES[i % len(LANGUAGES)]
+            pages = page_counts[i % len(page_counts)]
+            rel_path = Path(kind) / f"{kind}-{i:04d}-{language}-{pages}p{suffix}"
+            (corpus_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            generate_document(
+                corpus_dir / rel_path, kind, language, pages, seed=seed + len(documents)
+            )
+            documents.append(
+                CorpusDocument(
+                    path=rel_path.as_posix(), kind=kind, language=language, pages=pages
+                )
+            )
+            print(f"Generated {rel_path}")
+    with open(corpus_dir / CORPUS_INDEX, "w", encoding="utf-8") as f:
+        json.dump([asdict(doc) for doc in documents], f, indent=2)
+    return documents
+
+
+def load_corpus(corpus_dir: Path) -> list[CorpusDocument]:
+    """
+    Read the corpus.json index written by generate_corpus().
+    """
+    with open(corpus_dir / CORPUS_INDEX, "r", encoding="utf-8") as f:
+        return [CorpusDocument(**doc) for doc in json.load(f)]
@@ -0,0 +1,206 @@
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ingest.metrics import note_pages
+
+# A page with fewer visible characters than this is treated as having no text layer
+MIN_PAGE_CHARS = 20
+# Share of visible characters that must be printable (no control, private-use or U+FFFD)
+MIN_PRINTABLE_RATIO = 0.9
+# Share of visible characters that must be letters or digits, broken font encodings
+# tend to come out as runs of punctuation and symbols
+MIN_ALNUM_RATIO = 0.5
+
+# Document level gate, applied to the whole extracted text before language detection
+MIN_CHARS_PER_PAGE = 50
+MIN_WORD_RATE = 0.5
+# Longest token still counted as a word in space separated scripts
+_MAX_WORD_LENGTH = 30
+# Share of letters a non-ASCII token needs to count as a word
+_MIN_LETTER_SHARE = 0.8
+# Character statistics are computed on evenly spaced windows to bound the cost
+_SAMPLE_WINDOWS = 32
+_SAMPLE_WINDOW_CHARS = 4096
+
+_NON_PRINTABLE_CATEGORIES = {"Cc", "Cf", "Co", "Cn", "Cs"}
+_REPLACEMENT_CHAR = "\ufffd"
+
+
+@dataclass
+class TextStats:
+    """
+    Character counts used to judge whether extracted text is usable.
+    """
+
+    chars: int = 0  # non-whitespace characters
+    printable: int = 0  # non-whitespace characters that are printable
+    alnum: int = 0  # non-whitespace characters that are letters or digits
+
+    @property
+    def printable_ratio(self) -> float:
+        return self.printable / self.chars if self.chars else 0.0
+
+    @property
+    def alnum_ratio(self) -> float:
+        return self.alnum / self.chars if self.chars else 0.0
+
+
+def text_stats(text: str) -> TextStats:
+    """
+    Count visible, printable and alphanumeric characters in the text.
+
+    Args:
+        text: Extracted text
+
+    Returns:
+        TextStats: The character counts
+    """
+    stats = TextStats()
+    for ch in text:
+        if ch.isspace():
+            continue
+        stats.chars += 1
+        if ch == _REPLACEMENT_CHAR:
+            continue
+        if unicodedata.category(ch) in _NON_PRINTABLE_CATEGORIES:
+            continue
+        stats.printable += 1
+        if ch.isalnum():
+            stats.alnum += 1
+    return stats
+
+
+def page_needs_ocr(text: str) -> bool:
+    """
+    Decide whether a single page of extracted text is missing or garbage.
+
+    Args:
+        text: Text extracted from the page's text layer
+
+    Returns:
+        bool: True if the page should be OCR'd instead
+    """
+    stats = text_stats(text)
+    if stats.chars < MIN_PAGE_CHARS:
+        return True
+    if stats.printable_ratio < MIN_PRINTABLE_RATIO:
+        return True
+    return stats.alnum_ratio < MIN_ALNUM_RATIO
+
+
+class LowQualityTextError(Exception):
+    """
+    Raised (or returned) when extracted text fails the quality gate.
+    """
+
+
+@dataclass
+class QualityReport:
+    """
+    Outcome of the document level quality gate.
+    """
+
+    passed: bool
+    reason: str
+    pages: int
+    chars_per_page: float
+    printable_ratio: float
+    word_rate: float
+
+
+def _is_word(token: str) -> bool:
+    word = token.strip(".,;:!?\"'()[]{}«»„“”‘’-–—…")
+    if not word:
+        return False
+    if word.isascii():
+        return word.isalpha() and len(word) <= _MAX_WORD_LENGTH
+    # Scripts written without spaces (CJK, Thai) produce long runs with inner punctuation
+    letters = sum(1 for ch in word if ch.isalpha())
+    return letters / len(word) >= _MIN_LETTER_SHARE
+
+
+def word_rate(text: str) -> float:
+    """
+    Share of whitespace separated tokens that look like words.
+
+    There is no dictionary per language here, so a "word" is a token made only of
+    letters once surrounding punctuation is stripped. OCR noise and broken font
+    encodings mix letters, digits and symbols and score low.
+    """
+    tokens = text.split()
+    if not tokens:
+        return 0.0
+    return sum(1 for token in tokens if _is_word(token)) / len(tokens)
+
+
+def _sample(text: str) -> str:
+    budget = _SAMPLE_WINDOWS * _SAMPLE_WINDOW_CHARS
+    if len(text) <= budget:
+        return text
+    stride = len(text) // _SAMPLE_WINDOWS
+    return "\n".join(
+        text[i * stride : i * stride + _SAMPLE_WINDOW_CHARS]
+        for i in range(_SAMPLE_WINDOWS)
+    )
+
+
+def assess_text(text: str) -> QualityReport:
+    """
+    Run the quality gate on extracted text.
+
+    Pages are counted from the form feeds pdftotext and djvutxt put between pages.
+
+    Args:
+        text: The extracted text of the whole document
+
+    Returns:
+        QualityReport: Whether the text passed, and why not
+    """
+    pages = max(1, text.count("\f"))
+    # str.split runs in C, so counting visible characters stays cheap on large files
+    visible_chars = sum(len(token) for token in text.split())
+    chars_per_page = visible_chars / pages
+    sample = _sample(text)
+    stats = text_stats(sample)
+    rate = word_rate(sample)
+
+    reason = ""
+    if chars_per_page < MIN_CHARS_PER_PAGE:
+        reason = f"{chars_per_page:.0f} characters per page"
+    elif stats.printable_ratio < MIN_PRINTABLE_RATIO:
+        reason = f"{stats.printable_ratio:.0%} printable characters"
+    elif rate < MIN_WORD_RATE:
+        reason = f"{rate:.0%} word-like tokens"
+    return QualityReport(
+        passed=not reason,
+        reason=reason,
+        pages=pages,
+        chars_per_page=chars_per_page,
+        printable_ratio=stats.printable_ratio,
+        word_rate=rate,
+    )
+
+
+def check_text_quality(txt_file: Path) -> LowQualityTextError | None:
+    """
+    Run the quality gate on an extracted text file.
+
+    Args:
+        txt_file: Path to the text file
+
+    Returns:
+        LowQualityTextError | None: None if the text is usable, otherwise the error describing why not
+    """
+    try:
+        with open(txt_file, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError as e:
+        return LowQualityTextError(f"Could not read {txt_file.name}: {e}")
+    report = assess_text(text)
+    note_pages(report.pages)
+    if report.passed:
+        return None
+    return LowQualityTextError(
+        f"{txt_file.name} failed the text quality gate: {report.reason}"
+    )
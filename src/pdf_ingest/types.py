@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
@@ -14,6 +15,17 @@ class TranslationItem:
     json_exists: bool
     language: str = ""
     should_translate: bool = False
+    method: str = ""  # how the text was obtained: "text" or "ocr"
+    language_reliable: bool = False
+    pages: int | None = None  # page count, when the converter could tell
+    # Contents of json_file as last written by the scan, None if unknown
+    json_data: dict | None = None
+    # Content hash of input_file, once something needed it
+    content_hash: str | None = None
+    # Queue worker converting the item, keeps its partial files apart from others'
+    owner: str | None = None
+    # Set to give the conversion up before its next step, e.g. after a lost lease
+    cancel: threading.Event | None = None
 
     def __post_init__(self):
         if not isinstance(self.input_file, Path):
@@ -26,6 +38,78 @@ class TranslationItem:
             raise FileNotFoundError(f"{self.input_file} does not exist")
 
 
+# How ocrmypdf treats pages that already have text, see ConvertOptions.ocr_mode
+OCR_MODES = ("force", "skip-text", "redo")
+
+
+@dataclass
+class ConvertOptions:
+    """
+    Tuning knobs for the converters, shared by every file of a run.
+    """
+
+    # Pages OCR'd in parallel within one document, defaults to the CPU count shared
+    # among the documents converted at once, see scan_and_convert.share_cpus()
+    ocr_workers: int | None = None
+    # Pages rendered per ddjvu call when OCR'ing a DJVU file
+    djvu_chunk_pages: int = 8
+    # Upper bound on rendered page images waiting on disk for OCR, per document
+    max_scratch_pages: int = 32
+    # Where page images are rendered, defaults to the system temp directory
+    scratch_dir: Path | None = None
+    # Language detection backend, see language_detection.BACKENDS
+    language_backend: str = "langdetect"
+    # Persistent directory for per-page OCR checkpoints, disabled when None
+    checkpoint_dir: Path | None = None
+    # Content addressed cache of converted texts, serves duplicates, disabled when None
+    result_cache_dir: Path | None = None
+    # Size cap of the cached texts, least recently used entries are evicted beyond it
+    result_cache_max_bytes: int = 2 * 1024**3
+    # Tesseract language pack(s), e.g. "deu" or "deu+eng", "auto" to detect them from
+    # a first pass over a few sample pages, None for tesseract's default (English)
+    ocr_language: str | None = None
+    # Whole document OCR with ocrmypdf: "force" rasterizes and OCRs every page,
+    # "skip-text" leaves pages with text alone, "redo" replaces only old OCR text
+    ocr_mode: str = "force"
+    # Read the text from ocrmypdf's sidecar instead of writing a PDF and running
+    # pdftotext on it, only possible with ocr_mode "force"
+    ocrmypdf_sidecar: bool = True
+    # Pages ocrmypdf works on in parallel, shared like ocr_workers, when None (only if
+    # a converter is called directly) ocrmypdf's own default, the CPU count
+    ocrmypdf_jobs: int | None = None
+    # Seconds tesseract may spend on OCR, and on orientation analysis, of one page
+    tesseract_timeout: float | None = None
+    tesseract_non_ocr_timeout: float | None = None
+
+    def __post_init__(self):
+        if self.ocr_workers is not None and self.ocr_workers < 1:
+            raise ValueError("ocr_workers must be at least 1")
+        if self.djvu_chunk_pages < 1:
+            raise ValueError("djvu_chunk_pages must be at least 1")
+        if self.max_scratch_pages < self.djvu_chunk_pages:
+            raise ValueError("max_scratch_pages must be at least djvu_chunk_pages")
+        if self.scratch_dir is not None and not isinstance(self.scratch_dir, Path):
+            raise TypeError("scratch_dir must be a Path object")
+        if self.checkpoint_dir is not None and not isinstance(
+            self.checkpoint_dir, Path
+        ):
+            raise TypeError("checkpoint_dir must be a Path object")
+        if self.result_cache_dir is not None and not isinstance(
+            self.result_cache_dir, Path
+        ):
+            raise TypeError("result_cache_dir must be a Path object")
+        if self.result_cache_max_bytes < 0:
+            raise ValueError("result_cache_max_bytes must not be negative")
+        if self.ocr_mode not in OCR_MODES:
+            raise ValueError(f"ocr_mode must be one of {OCR_MODES}")
+        if self.ocrmypdf_jobs is not None and self.ocrmypdf_jobs < 1:
+            raise ValueError("ocrmypdf_jobs must be at least 1")
+        for name in ("tesseract_timeout", "tesseract_non_ocr_timeout"):
+            value = getattr(self, name)
+            if value is not None and value < 0:
+                raise ValueError(f"{name} must not be negative")
+
+
 @dataclass
 class Result:
     """
@@ -37,6 +121,8 @@ class Result:
     untranstlatable: list[Path]
     errors: list[Exception]
     missing_json_files: list[Path]
+    # Inputs given up because a converter ran out of time, also in untranstlatable
+    timed_out: list[Path] = field(default_factory=list)
 
     def __post_init__(self):
         if not isinstance(self.input_files, list):
@@ -47,6 +133,8 @@ class Result:
             raise TypeError("errors must be a list of Exception objects")
         if not isinstance(self.missing_json_files, list):
             raise TypeError("missing_json_files must be a list of Path objects")
+        if not isinstance(self.timed_out, list):
+            raise TypeError("timed_out must be a list of Path objects")
 
         for file in self.input_files:
             if not isinstance(file, Path):
@@ -57,3 +145,6 @@ class Result:
         for file in self.missing_json_files:
             if not isinstance(file, Path):
                 raise TypeError("missing_json_files must be a list of Path objects")
+        for file in self.timed_out:
+            if not isinstance(file, Path):
+                raise TypeError("timed_out must be a list of Path objects")
@@ -0,0 +1,272 @@
+"""
+Watch mode: keep running and convert PDF and DJVU files as they land in the input directory.
+
+Changes are picked up with inotify through the optional watchdog package, or by
+rescanning the tree every poll interval on network mounts where inotify sees nothing.
+Either way a file is only converted once its size and mtime have stayed the same for
+the settle time, so uploads still being written are left alone.
+"""
+
+import os
+import queue
+import signal
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from pdf_ingest.manifest import Manifest
+from pdf_ingest.metadata_index import MetadataIndex
+from pdf_ingest.scan_and_convert import (
+    SUPPORTED_SUFFIXES,
+    default_jobs,
+    iter_documents,
+    make_untreated_item,
+    process_and_record,
+    scan_and_convert_pdfs,
+    share_cpus,
+)
+from pdf_ingest.types import ConvertOptions
+
+# How often the debouncer is checked when inotify delivers the changes
+_INOTIFY_TICK = 1.0
+
+_Signature = tuple[int, int]  # (size, mtime_ns)
+
+
+def _signature(path: Path) -> _Signature | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Debouncer:
+    """
+    Tracks changed files until their size and mtime have been stable for settle_seconds.
+    """
+
+    def __init__(self, settle_seconds: float) -> None:
+        self.settle_seconds = settle_seconds
+        self._pending: dict[Path, tuple[_Signature, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def observe(self, path: Path, signature: _Signature | None, now: float) -> None:
+        """
+        Note that a file changed, or disappeared when signature is None.
+        """
+        if signature is None:
+            self._pending.pop(path, None)
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != signature:
+            self._pending[path] = (signature, now)
+
+    def ready(
+        self, now: float, stat: Callable[[Path], _Signature | None] = _signature
+    ) -> list[Path]:
+        """
+        Pop the files that have settled, rechecking their signature first.
+        """
+        settled: list[Path] = []
+        for path, (signature, since) in list(self._pending.items()):
+            current = stat(path)
+            if current != signature:
+                self.observe(path, current, now)
+            elif now - since >= self.settle_seconds:
+                del self._pending[path]
+                settled.append(path)
+        return sorted(settled)
+
+
+class _PollingSource:
+    """
+    Rescans the tree and reports files whose size or mtime changed since the last scan.
+    """
+
+    def __init__(self, input_dir: Path) -> None:
+        self._input_dir = input_dir
+        self._snapshot: dict[Path, _Signature] = {}
+        self.changes()  # Files present at startup are handled by the initial batch
+
+    def changes(self) -> Iterable[Path]:
+        snapshot: dict[Path, _Signature] = {}
+        changed: list[Path] = []
+        for path in iter_documents(self._input_dir):
+            signature = _signature(path)
+            if signature is None:
+                continue
+            snapshot[path] = signature
+            if self._snapshot.get(path) != signature:
+                changed.append(path)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifySource:
+    """
+    Collects created, modified and moved-in files from a watchdog (inotify) observer.
+    """
+
+    def __init__(self, input_dir: Path) -> None:
+        from watchdog.events import FileSystemEvent, FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        events: queue.SimpleQueue[Path] = queue.SimpleQueue()
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event: FileSystemEvent) -> None:
+                if event.is_directory or event.event_type not in (
+                    "created",
+                    "modified",
+                    "moved",
+                    "closed",
+                ):
+                    return
+                path = getattr(event, "dest_path", "") or event.src_path
+                path = os.fsdecode(path)
+                if path.lower().endswith(SUPPORTED_SUFFIXES):
+                    events.put(Path(path))
+
+        self._events = events
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), str(input_dir), recursive=True)
+        self._observer.start()
+
+    def changes(self) -> Iterable[Path]:
+        changed: list[Path] = []
+        while True:
+            try:
+                changed.append(self._events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def close(self) -> None:
+        self._observer.stop()
+        self._observer.join()
+
+
+def _make_source(input_dir: Path, use_inotify: bool) -> _PollingSource | _InotifySource:
+    if use_inotify:
+        try:
+            return _InotifySource(input_dir)
+        except ImportError:
+            print("watchdog is not installed, falling back to polling")
+        except OSError as e:
+            # e.g. the inotify watch limit, or a filesystem without inotify support
+            print(f"inotify is not available ({e}), falling back to polling")
+    return _PollingSource(input_dir)
+
+
+def _converted(path: Path, future: Future[tuple[Exception | None, bool]]) -> int:
+    # One file failing must not stop the watch
+    try:
+        return int(future.result()[1])
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Error converting {path}: {e}")
+        return 0
+
+
+def watch_and_convert(
+    input_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    options: ConvertOptions | None = None,
+    content_hash: bool = False,
+    use_inotify: bool = True,
+    poll_interval: float = 5.0,
+    settle_seconds: float = 10.0,
+    stop_event: threading.Event | None = None,
+    use_index: bool = False,
+) -> int:
+    """
+    Convert everything pending once, then keep converting new and modified files.
+
+    Runs until stop_event is set, or until SIGINT/SIGTERM when called from the main thread.
+
+    Args:
+        input_dir: Directory containing PDF and DJVU files
+        output_dir: Directory where text files will be saved
+        jobs: Number of files to convert in parallel, defaults to the CPU count
+        options: Converter tuning shared by every file
+        content_hash: Store content hashes in the manifest
+        use_inotify: Use inotify through watchdog when available, otherwise poll
+        poll_interval: Seconds between rescans when polling
+        settle_seconds: Seconds a file must stay unchanged before it is converted
+        stop_event: Set to stop watching
+        use_index: Also record converted files in the SQLite metadata index
+
+    Returns:
+        int: Number of files converted after the initial batch
+    """
+    jobs = jobs or default_jobs()
+    options = share_cpus(options, jobs)
+    stop_event = stop_event or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+
+    # Start listening before the catch-up batch, so nothing landing during it is missed
+    source = _make_source(input_dir, use_inotify)
+    tick = _INOTIFY_TICK if isinstance(source, _InotifySource) else poll_interval
+    print(f"Watching {input_dir} ({type(source).__name__.strip('_')})")
+
+    scan_and_convert_pdfs(
+        input_dir=input_dir,
+        output_dir=output_dir,
+        jobs=jobs,
+        content_hash=content_hash,
+        options=options,
+        use_index=use_index,
+    )
+
+    manifest = Manifest(output_dir, use_content_hash=content_hash)
+    index = MetadataIndex(output_dir) if use_index else None
+    debouncer = Debouncer(settle_seconds)
+    in_flight: dict[Path, Future[tuple[Exception | None, bool]]] = {}
+    converted = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                for path in source.changes():
+                    debouncer.observe(path, _signature(path), now)
+                for path, future in list(in_flight.items()):
+                    if future.done():
+                        del in_flight[path]
+                        converted += _converted(path, future)
+                for path in debouncer.ready(time.monotonic()):
+                    if path in in_flight:
+                        # Changed again while converting, look at it once that is done
+                        debouncer.observe(path, _signature(path), time.monotonic())
+                        continue
+                    try:
+                        item = make_untreated_item(
+                            path, input_dir, output_dir, manifest
+                        )
+                    except Exception as e:  # pylint: disable=broad-except
+                        print(f"Error looking at {path}: {e}")
+                        continue
+                    if item is None:
+                        continue
+                    in_flight[path] = executor.submit(
+                        process_and_record, item, input_dir, manifest, options, index
+                    )
+                if index is not None and not in_flight:
+                    # Idle, make what was converted so far visible to queries
+                    index.flush()
+                stop_event.wait(tick)
+            print(f"Stopping, waiting for {len(in_flight)} conversion(s) to finish")
+        converted += sum(_converted(path, future) for path, future in in_flight.items())
+    finally:
+        source.close()
+        if index is not None:
+            index.close()
+    return converted
@@ -0,0 +1,442 @@
+"""
+Distributed mode: many nodes convert one archive through a shared job queue.
+
+The queue is a SQLite file on storage every node mounts, next to the archive. A
+coordinator scans the input tree once and queues every document by its path relative
+to the input directory. Workers, on any number of nodes, lease a few jobs at a time,
+convert them and mark them done.
+
+A lease is held for lease_seconds and renewed by a heartbeat while the conversion
+runs. When a worker dies its leases expire and the next worker to ask for work puts
+them back in the queue, after max_attempts expiries a job is marked failed. Claims
+happen in an exclusive transaction, so a job is leased to one worker at a time, and
+a worker that lost its lease cannot mark the job done. It also gives the conversion
+up before its next step, so the document is written by its new holder only, and
+writes its partial files under names of its own meanwhile. Conversion failures are
+final (a broken PDF stays broken), only lost leases are retried.
+
+Workers don't use the manifest, concurrent appends to one file from several nodes are
+not safe on network filesystems, the queue records what is done instead. Like the
+metadata index, the queue uses SQLite's default rollback journal, WAL needs shared
+memory that network filesystems lack.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ingest.convert import ConversionCancelled
+from pdf_ingest.metadata_index import MetadataIndex
+from pdf_ingest.metrics import flush_metrics
+from pdf_ingest.scan_and_convert import (
+    default_jobs,
+    iter_documents,
+    make_untreated_item,
+    process_and_record,
+    share_cpus,
+)
+from pdf_ingest.types import ConvertOptions
+
+STATES = ("pending", "leased", "done", "failed")
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Seconds a connection waits for another node's transaction to finish
+_BUSY_TIMEOUT = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    input_file TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires)"
+
+
+@dataclass
+class Lease:
+    """
+    A job leased to a worker.
+    """
+
+    input_file: str  # posix path relative to the input directory
+    attempt: int
+
+
+def default_worker_id() -> str:
+    """
+    Name of this worker in the queue, unique per host and process.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Thread safe handle on the shared job queue.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if lease_seconds <= 0:
+            raise ValueError("lease_seconds must be positive")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Wall clock, shared by the nodes, unlike time.monotonic()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly, the claims need BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            path, timeout=_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        with self._transaction():
+            self._conn.execute(_SCHEMA)
+            self._conn.execute(_INDEX)
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def enqueue(self, input_files: Iterable[str]) -> int:
+        """
+        Queue jobs, files already in the queue (in any state) are left alone.
+
+        Returns:
+            int: Number of new jobs
+        """
+        now = self._clock()
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (input_file, state, updated_at) "
+                "VALUES (?, 'pending', ?)",
+                ((input_file, now) for input_file in input_files),
+            )
+            return self._conn.total_changes - before
+
+    def lease(self, worker: str, count: int = 1) -> list[Lease]:
+        """
+        Lease up to count pending jobs, after requeueing the expired leases.
+        """
+        now = self._clock()
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' "
+                "ELSE 'pending' END, worker = NULL, lease_expires = NULL, "
+                "error = 'lease expired', updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires < ?",
+                (self.max_attempts, now, now),
+            )
+            rows = self._conn.execute(
+                "SELECT input_file, attempts FROM jobs WHERE state = 'pending' "
+                "ORDER BY input_file LIMIT ?",
+                (count,),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE input_file = ?",
+                [
+                    (worker, now + self.lease_seconds, now, input_file)
+                    for input_file, _ in rows
+                ],
+            )
+        return [Lease(input_file, attempts + 1) for input_file, attempts in rows]
+
+    def heartbeat(self, worker: str, input_files: Iterable[str]) -> set[str]:
+        """
+        Extend the leases of this worker.
+
+        Returns:
+            set[str]: The jobs whose lease was lost, e.g. after a long pause
+        """
+        files = list(input_files)
+        now = self._clock()
+        lost: set[str] = set()
+        with self._transaction():
+            for input_file in files:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                    "WHERE input_file = ? AND worker = ? AND state = 'leased'",
+                    (now + self.lease_seconds, now, input_file, worker),
+                )
+                if cursor.rowcount == 0:
+                    lost.add(input_file)
+        return lost
+
+    def complete(
+        self, worker: str, input_file: str, ok: bool, error: str | None = None
+    ) -> bool:
+        """
+        Mark a leased job done or failed.
+
+        Returns:
+            bool: False if the worker no longer held the lease, the job is then left
+                to whoever holds it now
+        """
+        with self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, lease_expires = NULL, "
+                "updated_at = ? WHERE input_file = ? AND worker = ? AND state = 'leased'",
+                ("done" if ok else "failed", error, self._clock(), input_file, worker),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of jobs per state.
+        """
+        with self._transaction():
+            rows = self._conn.execute(
+                "SELECT state, count(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT under the handle lock, rolled back on errors.
+
+    IMMEDIATE takes the write lock up front, so two nodes can never both read a job
+    as pending and then lease it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock) -> None:
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> None:
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self._lock.release()
+
+
+def enqueue_tree(work_queue: WorkQueue, input_dir: Path) -> int:
+    """
+    Queue every PDF and DJVU file of the input tree.
+
+    Returns:
+        int: Number of new jobs
+    """
+    return work_queue.enqueue(
+        path.relative_to(input_dir).as_posix() for path in iter_documents(input_dir)
+    )
+
+
+def run_coordinator(
+    queue_path: Path,
+    input_dir: Path,
+    wait: bool = True,
+    poll_interval: float = 10.0,
+    stop_event: threading.Event | None = None,
+) -> dict[str, int]:
+    """
+    Queue the input tree, then report progress until every job is done or failed.
+
+    The coordinator holds no state of its own, it can be restarted, or run again to
+    queue files added to the archive since.
+
+    Args:
+        queue_path: The shared queue database
+        input_dir: Directory containing PDF and DJVU files
+        wait: Wait for the workers to drain the queue
+        poll_interval: Seconds between progress reports
+        stop_event: Set to stop waiting
+
+    Returns:
+        dict: Number of jobs per state
+    """
+    stop_event = stop_event or threading.Event()
+    work_queue = WorkQueue(queue_path)
+    try:
+        added = enqueue_tree(work_queue, input_dir)
+        counts = work_queue.counts()
+        print(f"Queued {added} new file(s) in {queue_path}: {counts}")
+        while wait and (counts["pending"] or counts["leased"]):
+            if stop_event.wait(poll_interval):
+                break
+            counts = work_queue.counts()
+            print(f"Queue: {counts}")
+        return counts
+    finally:
+        work_queue.close()
+
+
+def run_worker(
+    queue_path: Path,
+    input_dir: Path,
+    output_dir: Path,
+    jobs: int | None = None,
+    options: ConvertOptions | None = None,
+    use_index: bool = False,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    poll_interval: float = 10.0,
+    worker_id: str | None = None,
+    stop_event: threading.Event | None = None,
+) -> int:
+    """
+    Lease jobs from the shared queue and convert them, until the queue is drained.
+
+    Up to jobs documents are converted at a time. The worker exits once no job is
+    pending or leased anymore, while other workers still hold leases it waits, in
+    case they expire.
+
+    Args:
+        queue_path: The shared queue database
+        input_dir: Directory containing PDF and DJVU files, the same tree on every node
+        output_dir: Directory where text files will be saved
+        jobs: Number of files to convert in parallel, defaults to the CPU count
+        options: Converter tuning shared by every file
+        use_index: Also record converted files in the SQLite metadata index
+        lease_seconds: How long a lease lasts without a heartbeat
+        poll_interval: Seconds to wait when there is nothing to lease
+        worker_id: Name of the worker in the queue, defaults to host:pid
+        stop_event: Set to stop leasing, the conversions in flight are finished
+
+    Returns:
+        int: Number of files converted by this worker
+    """
+    jobs = jobs or default_jobs()
+    options = share_cpus(options, jobs)
+    worker = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    work_queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    index = MetadataIndex(output_dir) if use_index else None
+    # None for a job whose document needed no conversion
+    in_flight: dict[str, Future[tuple[Exception | None, bool] | None]] = {}
+    cancels: dict[str, threading.Event] = {}
+    in_flight_lock = threading.Lock()
+    heartbeat_stop = threading.Event()
+
+    def heartbeat() -> None:
+        # Three beats per lease, one missed beat does not lose it
+        while not heartbeat_stop.wait(lease_seconds / 3):
+            with in_flight_lock:
+                held = list(in_flight)
+            if not held:
+                continue
+            try:
+                lost = work_queue.heartbeat(worker, held)
+            except sqlite3.Error as e:
+                print(f"Error renewing leases: {e}")
+                continue
+            for input_file in lost:
+                print(f"Lost the lease of {input_file}, giving it up to its new holder")
+                with in_flight_lock:
+                    cancel = cancels.get(input_file)
+                if cancel is not None:
+                    cancel.set()
+
+    def convert(
+        lease: Lease, cancel: threading.Event
+    ) -> tuple[Exception | None, bool] | None:
+        item = make_untreated_item(input_dir / lease.input_file, input_dir, output_dir)
+        if item is None:
+            # Converted before the queue existed, or by a worker that lost its lease
+            return None
+        # Another worker may hold the document too once our lease is lost, our partial
+        # files must not be its
+        item.owner = worker
+        item.cancel = cancel
+        return process_and_record(item, input_dir, None, options, index)
+
+    print(f"Worker {worker} converting with {jobs} job(s) from {queue_path}")
+    beater = threading.Thread(target=heartbeat, name="heartbeat", daemon=True)
+    beater.start()
+    converted = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while True:
+                for input_file, future in list(in_flight.items()):
+                    if not future.done():
+                        continue
+                    skipped = False
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        # e.g. deleted from the archive since it was queued
+                        print(f"Error preparing {input_file}: {e}")
+                        outcome = e, False
+                    if outcome is None:
+                        skipped = True
+                        outcome = None, True
+                    err, success = outcome
+                    with in_flight_lock:
+                        del in_flight[input_file]
+                        del cancels[input_file]
+                    if isinstance(err, ConversionCancelled):
+                        # The lease is someone else's now, leave the job to them
+                        continue
+                    error = None if err is None else f"{type(err).__name__}: {err}"
+                    if work_queue.complete(worker, input_file, success, error):
+                        converted += success and not skipped
+                if stop_event.is_set():
+                    if not in_flight:
+                        break
+                    stop_event.wait(1.0)
+                    continue
+                free = jobs - len(in_flight)
+                leases = work_queue.lease(worker, free) if free else []
+                for lease in leases:
+                    cancel = threading.Event()
+                    with in_flight_lock:
+                        cancels[lease.input_file] = cancel
+                        in_flight[lease.input_file] = executor.submit(
+                            convert, lease, cancel
+                        )
+                if leases:
+                    continue
+                if not in_flight:
+                    counts = work_queue.counts()
+                    if not counts["pending"] and not counts["leased"]:
+                        break
+                # Nothing to lease right now, wait for our conversions or expiries
+                if in_flight:
+                    wait(
+                        in_flight.values(),
+                        timeout=poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                else:
+                    stop_event.wait(poll_interval)
+    finally:
+        heartbeat_stop.set()
+        beater.join()
+        flush_metrics()
+        if index is not None:
+            index.close()
+        work_queue.close()
+    print(f"Worker {worker} converted {converted} file(s)")
+    return converted
@@ -0,0 +1,33 @@
+"""
+Fake converters shared by the unit tests, they write canned English text.
+"""
+
+from pathlib import Path
+
+from pdf_ingest.convert import Converter
+from pdf_ingest.types import ConvertOptions
+
+ENGLISH = (
+    "The committee met on Tuesday to discuss the budget for the coming year. "
+    "Several members raised concerns about the cost of the new library building. "
+) * 20
+
+
+def extract_text(input_file: Path, txt_file_out: Path) -> Exception | None:
+    """Text layer extraction, documents named "scan..." have none."""
+    if "scan" in input_file.name:
+        txt_file_out.write_text("", encoding="utf-8")
+        return ValueError("no text layer")
+    txt_file_out.write_text(ENGLISH, encoding="utf-8")
+    return None
+
+
+def ocr_text(
+    input_file: Path, txt_file_out: Path, options: ConvertOptions, checkpoint
+) -> Exception | None:
+    """OCR that always succeeds."""
+    txt_file_out.write_text(ENGLISH, encoding="utf-8")
+    return None
+
+
+FAKE_CONVERTER = Converter(extract=extract_text, ocr=ocr_text)
@@ -0,0 +1,32 @@
+"""
+Unit test file.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from pdf_ingest.atomic import commit_file, partial_path
+
+
+class AtomicTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_commit_replaces_target(self) -> None:
+        """The partial file is hidden, and committing moves it over the target."""
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "book-EN.txt"
+            target.write_text("old", encoding="utf-8")
+            partial = partial_path(target)
+            assert partial.parent == target.parent
+            assert partial.name.startswith(".")
+            assert partial.suffix != ".txt"
+
+            partial.write_text("new", encoding="utf-8")
+            commit_file(partial, target)
+            assert target.read_text(encoding="utf-8") == "new"
+            assert not partial.exists()
+
+
+if __name__ == "__main__":
+    unittest.main()
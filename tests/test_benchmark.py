@@ -0,0 +1,79 @@
+"""
+Unit test file.
+"""
+
+import importlib.util
+import re
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pdf_ingest.benchmark import compare_pdf_text_backends, percentile, run_benchmark
+from pdf_ingest.synthetic import generate_corpus, load_corpus
+
+
+class BenchmarkTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_percentile(self) -> None:
+        """Percentiles interpolate between ranks."""
+        values = [4.0, 1.0, 3.0, 2.0]
+        assert percentile(values, 0) == 1.0
+        assert percentile(values, 50) == 2.5
+        assert percentile(values, 100) == 4.0
+        assert percentile([], 90) == 0.0
+
+    def test_generate_text_corpus(self) -> None:
+        """Born-digital PDFs have a valid xref table and are indexed."""
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus_dir = Path(tmp)
+            documents = generate_corpus(
+                corpus_dir, docs_per_kind=2, page_counts=(2,), kinds=["text"]
+            )
+            assert [doc.pages for doc in load_corpus(corpus_dir)] == [2, 2]
+            data = (corpus_dir / documents[0].path).read_bytes()
+            assert data.startswith(b"%PDF-1.4")
+            xref = data[int(data.rsplit(b"startxref\n", 1)[1].split()[0]) :]
+            assert xref.startswith(b"xref")
+            offsets = [int(m) for m in re.findall(rb"(\d{10}) 00000 n", xref)]
+            for number, offset in enumerate(offsets, start=1):
+                assert data[offset:].startswith(b"%d 0 obj" % number)
+
+    @unittest.skipUnless(shutil.which("pdftotext"), "pdftotext is not installed")
+    def test_run_benchmark(self) -> None:
+        """A small corpus is converted and measured."""
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus_dir = Path(tmp) / "corpus"
+            output_dir = Path(tmp) / "output"
+            output_dir.mkdir()
+            generate_corpus(
+                corpus_dir, docs_per_kind=2, page_counts=(1, 2), kinds=["text"]
+            )
+            report = run_benchmark(corpus_dir, output_dir, jobs=2)
+            assert report["converted"] == 2, report
+            assert report["pages"] == 3, report
+            assert report["latency_seconds"]["document"]["count"] == 2
+
+    @unittest.skipUnless(
+        shutil.which("pdftotext") and importlib.util.find_spec("pypdfium2"),
+        "pdftotext or pypdfium2 is not installed",
+    )
+    def test_compare_pdf_text_backends(self) -> None:
+        """Both backends are measured with one job and in parallel."""
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus_dir = Path(tmp) / "corpus"
+            output_dir = Path(tmp) / "output"
+            output_dir.mkdir()
+            generate_corpus(
+                corpus_dir, docs_per_kind=4, page_counts=(1,), kinds=["text"]
+            )
+            report = compare_pdf_text_backends(corpus_dir, output_dir, jobs=2)
+            assert sorted(report["jobs"]) == ["1", "2"]
+            for run in report["jobs"].values():
+                assert run["backends"]["pdfium"]["converted"] == 4, run
+                assert run["backends"]["pdftotext"]["converted"] == 4, run
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Unit test file.
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import checkpoint as checkpoint_module
+from pdf_ingest.checkpoint import OcrCheckpoint, open_checkpoint
+from pdf_ingest.djvu import _page_ranges
+from pdf_ingest.types import ConvertOptions
+
+
+class CheckpointTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_save_and_resume(self) -> None:
+        """Saved pages survive a restart and follow the file contents, not its name."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            book = root / "book.djvu"
+            book.write_bytes(b"AT&TFORM book")
+            work_dir = root / "work"
+
+            checkpoint = OcrCheckpoint(work_dir, book)
+            assert checkpoint.pages() == set()
+            checkpoint.save(1, "first page")
+            checkpoint.save(3, "third page")
+
+            moved = book.rename(root / "renamed.djvu")
+            resumed = open_checkpoint(moved, ConvertOptions(checkpoint_dir=work_dir))
+            assert resumed is not None
+            assert resumed.pages() == {1, 3}
+            assert resumed.load(3) == "third page"
+            assert resumed.load(2) is None
+
+            resumed.clear()
+            assert not resumed.path.exists()
+
+    def test_temp_file_is_unique_to_the_writer(self) -> None:
+        """Workers on two hosts saving the same page never share a temporary file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            book = Path(tmp) / "book.djvu"
+            book.write_bytes(b"AT&TFORM book")
+            checkpoint = OcrCheckpoint(Path(tmp) / "work", book)
+            temp_files: list[str] = []
+
+            def replace(src: Path, dst: Path) -> None:
+                temp_files.append(Path(src).name)
+                os.unlink(src)
+
+            with mock.patch.object(checkpoint_module.os, "replace", replace):
+                for host in ("node-a", "node-b"):
+                    with mock.patch.object(
+                        checkpoint_module.socket, "gethostname", return_value=host
+                    ):
+                        checkpoint.save(2, f"second page from {host}")
+            assert len(set(temp_files)) == 2
+            assert all(f".{os.getpid()}." in name for name in temp_files)
+
+    def test_disabled_without_directory(self) -> None:
+        """No checkpoint directory, no checkpoint."""
+        with tempfile.TemporaryDirectory() as tmp:
+            book = Path(tmp) / "book.pdf"
+            book.write_bytes(b"%PDF-1.4 book")
+            assert open_checkpoint(book, ConvertOptions()) is None
+            assert open_checkpoint(book, None) is None
+
+    def test_page_ranges(self) -> None:
+        """Missing pages are rendered in runs of consecutive pages."""
+        assert _page_ranges([1, 2, 3, 4, 5], 2) == [(1, 2), (3, 4), (5, 5)]
+        assert _page_ranges([2, 3, 7, 9, 10], 8) == [(2, 3), (7, 7), (9, 10)]
+        assert _page_ranges([], 8) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
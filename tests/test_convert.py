@@ -0,0 +1,74 @@
+"""
+Unit test file.
+"""
+
+import errno
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from converter_fakes import FAKE_CONVERTER
+
+from pdf_ingest import convert
+from pdf_ingest.convert import convert_document
+from pdf_ingest.types import TranslationItem
+
+
+class ConvertTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_failed_commit_leaves_json_unmarked(self) -> None:
+        """Without room for the text, the JSON does not claim the document is done."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_file = root / "book.pdf"
+            input_file.write_bytes(b"%PDF-1.4")
+            json_file = root / "book.json"
+            json_file.write_text(json.dumps({"language": ""}), encoding="utf-8")
+
+            def make_item() -> TranslationItem:
+                return TranslationItem(
+                    input_file=input_file,
+                    output_file=root / "book.txt",
+                    json_file=json_file,
+                    json_exists=True,
+                )
+
+            full = OSError(errno.ENOSPC, "No space left on device")
+            with mock.patch.object(convert, "commit_file", side_effect=full):
+                err, success = convert_document(make_item(), FAKE_CONVERTER)
+            assert err is full
+            assert not success
+            data = json.loads(json_file.read_text(encoding="utf-8"))
+            assert not data.get("language_detection_reliable")
+            assert sorted(p.name for p in root.iterdir()) == ["book.json", "book.pdf"]
+
+            err, success = convert_document(make_item(), FAKE_CONVERTER)
+            assert err is None
+            assert success
+            data = json.loads(json_file.read_text(encoding="utf-8"))
+            assert data["language_detection_reliable"]
+            assert (root / "book-EN.txt").exists()
+
+    def test_sidecar_agrees_with_item(self) -> None:
+        """The JSON and the metadata index record the same should_translate."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_file = root / "book.pdf"
+            input_file.write_bytes(b"%PDF-1.4")
+            item = TranslationItem(
+                input_file=input_file,
+                output_file=root / "book.txt",
+                json_file=root / "book.json",
+                json_exists=False,
+            )
+            assert convert_document(item, FAKE_CONVERTER) == (None, True)
+            data = json.loads(item.json_file.read_text(encoding="utf-8"))
+            assert data["language"] == item.language == "en"
+            assert data["should_translate"] is item.should_translate is True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Unit test file.
+"""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import djvu
+from pdf_ingest.djvu import convert_djvu_to_text_via_ocr
+
+TEXT_LAYER = "This page came with a perfectly good hidden text layer. " * 4
+
+
+def _page_text(djvu_file: Path, page: int) -> str | None:
+    # Odd pages have a text layer, even pages are bare scans
+    return TEXT_LAYER if page % 2 else ""
+
+
+def _render(djvu_file: Path, first: int, last: int, chunk_dir: Path) -> list[Path]:
+    chunk_dir.mkdir()
+    images = []
+    for page in range(first, last + 1):
+        image = chunk_dir / f"page-{page:04d}.tif"
+        image.write_bytes(b"image")
+        images.append(image)
+    return images
+
+
+def _tesseract(command: list[str], **kwargs) -> subprocess.CompletedProcess:
+    page = Path(command[1]).stem
+    return subprocess.CompletedProcess(command, 0, f"ocr of {page}".encode(), b"")
+
+
+class DjvuTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_only_pages_without_text_layer_are_ocrd(self) -> None:
+        """Pages with a hidden text layer keep it, only the others are rendered."""
+        render = mock.Mock(side_effect=_render)
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(djvu, "get_djvu_page_count", return_value=5),
+            mock.patch.object(djvu, "extract_djvu_page_text", side_effect=_page_text),
+            mock.patch.object(djvu, "_render_djvu_pages", render),
+            mock.patch.object(djvu, "run", side_effect=_tesseract),
+        ):
+            djvu_file = Path(tmp) / "book.djvu"
+            djvu_file.write_bytes(b"AT&TFORM")
+            txt_file = Path(tmp) / "book.txt"
+            assert convert_djvu_to_text_via_ocr(djvu_file, txt_file) is None
+
+            rendered = [call.args[1:3] for call in render.call_args_list]
+            assert rendered == [(2, 2), (4, 4)]
+            text = txt_file.read_text(encoding="utf-8")
+            assert text.count(TEXT_LAYER) == 3
+            assert "ocr of page-0002" in text
+            assert "ocr of page-0004" in text
+            assert text.index("Page 0003") < text.index("ocr of page-0004")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,65 @@ Unit test file.
 """
 
 import os
+import tempfile
+import time
 import unittest
+from pathlib import Path
 
-from pdf_ingest.language_detection import language_detect
+from pdf_ingest.language_detection import (
+    BACKENDS,
+    get_backend,
+    language_detect,
+    sample_language_from_file,
+)
+
+# Labelled snippets for the backend comparison, a few sentences per language
+_CORPUS: list[tuple[str, str]] = [
+    (
+        "en",
+        "The committee will meet again next week to discuss the annual budget and the new library.",
+    ),
+    ("en", "She walked along the river every morning before the city woke up."),
+    (
+        "fr",
+        "Le comité se réunira de nouveau la semaine prochaine pour discuter du budget annuel.",
+    ),
+    (
+        "fr",
+        "Elle se promenait le long de la rivière chaque matin avant que la ville ne se réveille.",
+    ),
+    (
+        "de",
+        "Der Ausschuss wird sich nächste Woche erneut treffen, um den Jahreshaushalt zu besprechen.",
+    ),
+    ("de", "Sie ging jeden Morgen am Fluss entlang, bevor die Stadt erwachte."),
+    (
+        "es",
+        "El comité se reunirá de nuevo la próxima semana para discutir el presupuesto anual.",
+    ),
+    (
+        "es",
+        "Ella caminaba por la orilla del río cada mañana antes de que la ciudad despertara.",
+    ),
+    (
+        "it",
+        "Il comitato si riunirà di nuovo la prossima settimana per discutere il bilancio annuale.",
+    ),
+    (
+        "pt",
+        "O comitê se reunirá novamente na próxima semana para discutir o orçamento anual.",
+    ),
+    (
+        "nl",
+        "De commissie komt volgende week opnieuw bijeen om de jaarlijkse begroting te bespreken.",
+    ),
+    (
+        "ru",
+        "Комитет снова соберётся на следующей неделе, чтобы обсудить годовой бюджет.",
+    ),
+    ("ja", "委員会は来週再び会合を開き、年間予算について話し合う予定です。"),
+    ("ar", "ستجتمع اللجنة مرة أخرى الأسبوع المقبل لمناقشة الميزانية السنوية."),
+]
 
 
 class LanguageDetectTester(unittest.TestCase):
@@ -23,6 +79,55 @@ class LanguageDetectTester(unittest.TestCase):
         assert language == "ja", f"Expected 'ja', got '{language}'"
         assert is_reliable is True, f"Expected reliable detection, got {is_reliable}"
 
+    def test_sample_language_from_file(self) -> None:
+        """A large file is detected from a bounded number of windows."""
+        sentence = (
+            "The committee will meet again next week to discuss the annual budget. "
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            txt_file = Path(tmp) / "big.txt"
+            txt_file.write_text(sentence * 20000, encoding="utf-8")
+            sample = sample_language_from_file(txt_file, windows=8, window_bytes=2048)
+            assert sample.language == "en", f"Expected 'en', got '{sample.language}'"
+            assert sample.windows == 8, f"Expected 8 windows, got {sample.windows}"
+            assert sample.is_reliable, f"Expected reliable detection, got {sample}"
+
+            empty_file = Path(tmp) / "empty.txt"
+            empty_file.write_text("\f\f\n", encoding="utf-8")
+            sample = sample_language_from_file(empty_file)
+            assert sample.language == "unknown"
+            assert not sample.is_reliable
+
+    def test_backend_comparison(self) -> None:
+        """Accuracy and throughput of every installed backend, printed for comparison."""
+        for name in sorted(BACKENDS):
+            try:
+                backend = get_backend(name)
+            except (ImportError, FileNotFoundError) as e:
+                print(f"{name:>10}: not available ({e})")
+                continue
+            rounds = 20
+            correct = 0
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for expected, text in _CORPUS:
+                    language, _ = backend.detect(text)
+                    # langdetect reports Chinese variants as zh-cn/zh-tw
+                    correct += language.split("-")[0] == expected
+            elapsed = time.perf_counter() - start
+            calls = rounds * len(_CORPUS)
+            accuracy = correct / calls
+            print(
+                f"{name:>10}: accuracy {accuracy:.0%}, {calls / elapsed:,.0f} snippets/sec"
+            )
+            assert accuracy >= 0.85, f"{name} accuracy {accuracy:.0%} is too low"
+
+    def test_backend_is_deterministic(self) -> None:
+        """The default backend gives the same answer every time."""
+        text = "Ceci est une phrase courte mais ambiguë, with some English mixed in."
+        results = {language_detect(text) for _ in range(10)}
+        assert len(results) == 1, f"Expected a single result, got {results}"
+
 
 if __name__ == "__main__":
     unittest.main()
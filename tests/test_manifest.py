@@ -0,0 +1,68 @@
+"""
+Unit test file.
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from pdf_ingest.manifest import MANIFEST_NAME, Manifest
+
+
+class ManifestTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_record_and_reload(self) -> None:
+        """A recorded file is skipped until it changes."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_file = root / "book.pdf"
+            input_file.write_bytes(b"%PDF-1.4 fake")
+            output_file = root / "book-EN.txt"
+            output_file.write_text("hello", encoding="utf-8")
+
+            manifest = Manifest(root)
+            rel_path = Path("book.pdf")
+            assert not manifest.is_done(input_file, rel_path)
+            manifest.record(input_file, rel_path, output_file, "en", "text", 1.5)
+
+            reloaded = Manifest(root)
+            assert len(reloaded) == 1
+            entry = reloaded.lookup(rel_path)
+            assert entry is not None
+            assert entry.output_file == "book-EN.txt"
+            assert reloaded.is_done(input_file, rel_path)
+
+            input_file.write_bytes(b"%PDF-1.4 changed contents")
+            assert not reloaded.is_done(input_file, rel_path)
+
+    def test_content_hash_survives_touch(self) -> None:
+        """With hashing enabled, a touched but identical file is still done."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_file = root / "book.djvu"
+            input_file.write_bytes(b"AT&TFORM fake")
+            output_file = root / "book-FR.txt"
+            output_file.write_text("bonjour", encoding="utf-8")
+
+            manifest = Manifest(root, use_content_hash=True)
+            rel_path = Path("book.djvu")
+            manifest.record(input_file, rel_path, output_file, "fr", "ocr", 3.0)
+            stat = input_file.stat()
+            os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert manifest.is_done(input_file, rel_path)
+
+    def test_truncated_line_is_ignored(self) -> None:
+        """A partially written last line does not break loading."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / MANIFEST_NAME).write_text(
+                '{"input_file": "a.pdf", "si', encoding="utf-8"
+            )
+            manifest = Manifest(root)
+            assert len(manifest) == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Unit test file.
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pdf_ingest.json_util import update_json_with_language
+from pdf_ingest.metadata_index import MetadataIndex
+from pdf_ingest.types import TranslationItem
+
+
+class MetadataIndexTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_batched_records(self) -> None:
+        """Rows are written once the batch is full or the index is closed."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            index = MetadataIndex(root, batch_size=2)
+            for name, lang in (("a", "en"), ("b", "fr"), ("c", "de")):
+                input_file = root / f"{name}.pdf"
+                input_file.write_bytes(b"%PDF-1.4 " + name.encode())
+                item = TranslationItem(
+                    input_file=input_file,
+                    output_file=root / f"{name}-{lang.upper()}.txt",
+                    json_file=root / f"{name}.json",
+                    json_exists=False,
+                    language=lang,
+                    language_reliable=True,
+                    should_translate=lang == "en",
+                    method="text",
+                    pages=3,
+                )
+                index.record(item, Path(input_file.name), duration=1.25)
+                if name == "a":
+                    assert index.records() == []
+            assert [r.input_file for r in index.records()] == ["a.pdf", "b.pdf"]
+            index.close()
+
+            records = MetadataIndex(root).records()
+            assert [r.language for r in records] == ["en", "fr", "de"]
+            assert records[0].output_file == "a-EN.txt"
+            assert records[0].should_translate is True
+            assert records[1].should_translate is False
+            assert records[2].pages == 3
+
+    def test_sidecar_update_without_reading(self) -> None:
+        """Known contents are updated without reading the file, leaving no partial file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = Path(tmp) / "book.json"
+            update_json_with_language(json_file, "fr", True, {"language": ""})
+            assert json.loads(json_file.read_text(encoding="utf-8")) == {
+                "language": "fr",
+                "language_detection_reliable": True,
+                "should_translate": False,
+            }
+            assert [p.name for p in Path(tmp).iterdir()] == ["book.json"]
+
+
+if __name__ == "__main__":
+    unittest.main()
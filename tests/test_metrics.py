@@ -0,0 +1,63 @@
+"""
+Unit test file.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from pdf_ingest.metrics import (
+    configure_metrics,
+    flush_metrics,
+    load_records,
+    note_pages,
+    stage,
+)
+
+
+class MetricsTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_jsonl_records(self) -> None:
+        """Each stage appends a record with sizes, pages and outcome."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            document = root / "book.pdf"
+            document.write_bytes(b"x" * 100)
+            output = root / "book.txt"
+            metrics_file = root / "metrics.jsonl"
+            configure_metrics(metrics_file)
+
+            with stage("extract", document, output=output):
+                output.write_text("hello", encoding="utf-8")
+                note_pages(3)
+            with stage("language", document, source=output) as language:
+                language.ok = False
+
+            records = load_records(metrics_file)
+            assert [r.stage for r in records] == ["extract", "language"]
+            assert records[0].ok and records[0].pages == 3
+            assert records[0].bytes_in == 100 and records[0].bytes_out == 5
+            assert not records[1].ok and records[1].bytes_in == 5
+            configure_metrics(None)
+
+    def test_prometheus_textfile(self) -> None:
+        """The textfile aggregates stages into labelled counters."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            document = root / "book.djvu"
+            document.write_bytes(b"x" * 10)
+            textfile = root / "pdf_ingest.prom"
+            configure_metrics(textfile, "prometheus")
+            for _ in range(2):
+                with stage("ocr", document):
+                    note_pages(7)
+            flush_metrics()
+            text = textfile.read_text(encoding="utf-8")
+            assert 'pdf_ingest_stage_count_total{stage="ocr"} 2' in text
+            assert 'pdf_ingest_stage_pages_total{stage="ocr"} 14' in text
+            configure_metrics(None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Unit test file.
+"""
+
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import ocr_language
+from pdf_ingest.ocr_language import (
+    OSD_ARGS,
+    choose_ocr_language,
+    collection_language,
+    record_collection_language,
+    resolve_ocr_language,
+    sample_pages,
+    tesseract_args,
+)
+from pdf_ingest.types import ConvertOptions
+
+GERMAN = (
+    "Die Stadt liegt am Ufer des Flusses und ist seit dem Mittelalter ein wichtiger "
+    "Handelsplatz. Im Sommer kommen viele Besucher, um die alten Kirchen und die "
+    "engen Gassen der Altstadt zu sehen. Die Bewohner sind stolz auf ihre Geschichte "
+    "und pflegen die Traditionen ihrer Vorfahren mit großer Sorgfalt. "
+) * 3
+
+# Russian OCR'd with the default English model
+CYRILLIC_AS_LATIN = (
+    "Ilpn6ep ,llom cTon Ha yrny yjinubi n Mbl nouinn B mar3nH 3a xne6oM. " * 4
+)
+
+OSD_OUTPUT = """Page number: 0
+Orientation in degrees: 0
+Rotate: 0
+Orientation confidence: 11.42
+Script: Cyrillic
+Script confidence: 4.20
+"""
+
+
+class OcrLanguageTester(unittest.TestCase):
+    """Main tester class."""
+
+    def setUp(self) -> None:
+        # Treat every pack as installed, tesseract is not needed for these tests
+        patcher = mock.patch.object(
+            ocr_language, "installed_languages", return_value=frozenset()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sample_pages(self) -> None:
+        """Samples are spread over the document and skip the cover."""
+        assert sample_pages([1, 2]) == [1, 2]
+        assert sample_pages(list(range(1, 101))) == [26, 51, 76]
+
+    def test_tesseract_args(self) -> None:
+        """No -l for the default model or an unresolved auto."""
+        assert tesseract_args(None) == []
+        assert tesseract_args("auto") == []
+        assert tesseract_args("deu+eng") == ["-l", "deu+eng"]
+
+    def test_text_hint_skips_sampling(self) -> None:
+        """A long enough text layer is enough to pick the language."""
+        ocr_sample = mock.Mock(return_value="")
+        pack = choose_ocr_language(
+            Path("/hint/book.pdf"), [1, 2, 3], ocr_sample, text_hint=GERMAN
+        )
+        assert pack == "deu"
+        ocr_sample.assert_not_called()
+
+    def test_samples_are_kept(self) -> None:
+        """The default model OCR of the sampled pages is handed back for reuse."""
+        samples: dict[int, str] = {}
+        pack = choose_ocr_language(
+            Path("/samples/book.djvu"),
+            [1, 2, 3],
+            lambda page, args: GERMAN,
+            samples=samples,
+        )
+        assert pack == "deu"
+        assert samples == {1: GERMAN, 2: GERMAN, 3: GERMAN}
+
+    def test_script_fallback(self) -> None:
+        """When the samples are unreadable, the script picks the pack."""
+
+        def ocr_sample(page: int, args: list[str]) -> str:
+            return OSD_OUTPUT if args == OSD_ARGS else "?? ,, ;;"
+
+        pack = choose_ocr_language(Path("/script/book.pdf"), [4, 5], ocr_sample)
+        assert pack == "rus"
+
+    def test_garbage_latin_falls_back_to_script(self) -> None:
+        """Latin garbage gets a language, but not a likely enough one to trust."""
+
+        def ocr_sample(page: int, args: list[str]) -> str:
+            return OSD_OUTPUT if args == OSD_ARGS else CYRILLIC_AS_LATIN
+
+        pack = choose_ocr_language(
+            Path("/garbage/book.pdf"), [4, 5], ocr_sample, backend="langdetect"
+        )
+        assert pack == "rus"
+
+    def test_collection_cache(self) -> None:
+        """Once a directory agrees on a language, no more sampling is needed."""
+        first = Path("/collection/a.pdf")
+        assert collection_language(first) is None
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            record_collection_language(Path("/collection") / name, "de", True)
+        record_collection_language(Path("/collection/d.pdf"), "fr", False)
+        assert collection_language(first) == "de"
+
+        ocr_sample = mock.Mock(return_value="")
+        options = resolve_ocr_language(
+            Path("/collection/e.pdf"),
+            [1, 2, 3],
+            ocr_sample,
+            ConvertOptions(ocr_language="auto"),
+        )
+        assert options.ocr_language == "deu"
+        ocr_sample.assert_not_called()
+
+    def test_explicit_language_untouched(self) -> None:
+        """Only auto is resolved, explicit packs are used as given."""
+        options = ConvertOptions(ocr_language="fra")
+        ocr_sample = mock.Mock(return_value="")
+        assert (
+            resolve_ocr_language(Path("/x/a.pdf"), [1], ocr_sample, options) is options
+        )
+        ocr_sample.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
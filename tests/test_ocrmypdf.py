@@ -0,0 +1,76 @@
+"""
+Unit test file.
+"""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import ocr_language, pdf
+from pdf_ingest.pdf import convert_pdf_to_text_via_ocr, ocrmypdf_command
+from pdf_ingest.types import ConvertOptions
+
+GERMAN = (
+    "Die Stadt liegt am Ufer des Flusses und ist seit dem Mittelalter ein wichtiger "
+    "Handelsplatz. Im Sommer kommen viele Besucher, um die alten Kirchen zu sehen. "
+) * 3
+
+
+def _tools(command: list[str], **kwargs) -> subprocess.CompletedProcess:
+    if command[0] == "pdfinfo":
+        return subprocess.CompletedProcess(command, 0, "Pages: 12\n", "")
+    if command[0] == "tesseract":
+        return subprocess.CompletedProcess(command, 0, GERMAN.encode(), b"")
+    return subprocess.CompletedProcess(command, 0, b"", b"")
+
+
+class OcrmypdfTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_sidecar_only(self) -> None:
+        """The fast mode writes only the text sidecar, unoptimized, with the tuning flags."""
+        options = ConvertOptions(ocrmypdf_jobs=2, tesseract_timeout=120)
+        command = ocrmypdf_command(Path("in.pdf"), None, Path("out.txt"), options)
+        assert command[:4] == ["ocrmypdf", "--force-ocr", "--optimize", "0"]
+        assert command[command.index("--jobs") + 1] == "2"
+        assert command[command.index("--tesseract-timeout") + 1] == "120"
+        assert command[command.index("--sidecar") + 1] == "out.txt"
+        assert command[-4:] == ["--output-type", "none", "in.pdf", "-"]
+
+    def test_pdf_output(self) -> None:
+        """Other modes write a plain PDF for pdftotext."""
+        options = ConvertOptions(ocr_mode="skip-text")
+        command = ocrmypdf_command(Path("in.pdf"), Path("ocr.pdf"), None, options)
+        assert "--skip-text" in command
+        assert "--sidecar" not in command
+        assert "--jobs" not in command
+        assert command[-4:] == ["--output-type", "pdf", "in.pdf", "ocr.pdf"]
+
+    def test_invalid_mode(self) -> None:
+        """Unknown modes are rejected up front."""
+        with self.assertRaises(ValueError):
+            ConvertOptions(ocr_mode="sometimes")
+
+    def test_auto_language_is_resolved(self) -> None:
+        """ocrmypdf gets the pack picked from the samples, not the default model."""
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(
+                ocr_language, "installed_languages", return_value=frozenset()
+            ),
+            mock.patch.object(pdf, "run", side_effect=_tools) as run,
+        ):
+            pdf_file = Path(tmp) / "buch.pdf"
+            pdf_file.write_bytes(b"%PDF-1.4")
+            options = ConvertOptions(ocr_language="auto")
+            txt_file = Path(tmp) / "buch.txt"
+            assert convert_pdf_to_text_via_ocr(pdf_file, txt_file, options) is None
+            command = run.call_args.args[0]
+            assert command[0] == "ocrmypdf"
+            assert command[command.index("-l") + 1] == "deu"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit test file.
+"""
+
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from converter_fakes import ENGLISH
+
+from pdf_ingest import pdf
+from pdf_ingest.pdf import convert_pdf_to_text_per_page
+from pdf_ingest.types import ConvertOptions
+
+
+class _FakeTools:
+    """
+    Stands in for pdfinfo, pdftotext, pdftoppm and tesseract on a 6 page PDF whose
+    even pages are bare scans.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+        self.tesseract_envs: list[dict[str, str]] = []
+
+    def __call__(self, command: list[str], **kwargs) -> subprocess.CompletedProcess:
+        if command[0] == "pdfinfo":
+            return subprocess.CompletedProcess(command, 0, "Pages: 6\n", "")
+        if command[0] == "pdftotext":
+            page = int(command[2])
+            text = "" if page % 2 == 0 else f"text layer of page {page}\n{ENGLISH}"
+            return subprocess.CompletedProcess(command, 0, text.encode(), b"")
+        if command[0] == "pdftoppm":
+            return subprocess.CompletedProcess(command, 0, b"", b"")
+        assert command[0] == "tesseract"
+        with self.lock:
+            self.tesseract_envs.append(kwargs["env"])
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        # Finish out of order
+        time.sleep(random.uniform(0.01, 0.05))
+        with self.lock:
+            self.running -= 1
+        page = int(Path(command[1]).stem.split("-")[1])
+        text = f"ocr of page {page}\n{ENGLISH}"
+        return subprocess.CompletedProcess(command, 0, text.encode(), b"")
+
+
+class PdfTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_per_page_ocr_runs_in_parallel_in_page_order(self) -> None:
+        """Only the scanned pages are OCR'd, on the pool, and written in page order."""
+        tools = _FakeTools()
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(pdf, "run", side_effect=tools),
+        ):
+            pdf_file = Path(tmp) / "book.pdf"
+            pdf_file.write_bytes(b"%PDF-1.4")
+            txt_file = Path(tmp) / "book.txt"
+            options = ConvertOptions(ocr_workers=3)
+            assert convert_pdf_to_text_per_page(pdf_file, txt_file, options) is None
+
+            pages = txt_file.read_text(encoding="utf-8").split("\f")
+            assert pages[-1] == ""
+            firsts = [page.splitlines()[0] for page in pages[:-1]]
+            assert firsts == [
+                "text layer of page 1",
+                "ocr of page 2",
+                "text layer of page 3",
+                "ocr of page 4",
+                "text layer of page 5",
+                "ocr of page 6",
+            ]
+            assert len(tools.tesseract_envs) == 3
+            assert all(env["OMP_THREAD_LIMIT"] == "1" for env in tools.tesseract_envs)
+            assert 1 < tools.most_running <= 3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit test file.
+"""
+
+import importlib.util
+import multiprocessing
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import pdf, pdf_text_backend
+from pdf_ingest.pdf import try_pdf_convert_to_text
+from pdf_ingest.pdf_text_backend import (
+    PdfiumTimeout,
+    configure_pdf_text_backend,
+    extract_pages_pdfium,
+    shutdown_pdfium_pool,
+    use_pdfium,
+)
+from pdf_ingest.supervisor import ResourceLimits, configure_limits
+from pdf_ingest.synthetic import generate_corpus
+
+HAS_PYPDFIUM2 = importlib.util.find_spec("pypdfium2") is not None
+
+
+def _hang(path: str) -> list[str]:
+    time.sleep(600)
+    return []
+
+
+def _pages(path: str) -> list[str]:
+    return [path, "second page"]
+
+
+class PdfTextBackendTester(unittest.TestCase):
+    """Main tester class."""
+
+    def setUp(self) -> None:
+        # Pretend pdfium is configured, without needing pypdfium2 installed
+        patcher = mock.patch.multiple(
+            pdf_text_backend, _backend_name="pdfium", _pdfium_max_bytes=1024
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages_are_written_like_pdftotext(self) -> None:
+        """Every page ends with a form feed and no process is started."""
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(pdf, "extract_pages_pdfium", return_value=["a", "b"]),
+            mock.patch.object(pdf, "run") as run,
+        ):
+            pdf_file = Path(tmp) / "small.pdf"
+            pdf_file.write_bytes(b"%PDF-1.4")
+            txt_file = Path(tmp) / "small.txt"
+            assert try_pdf_convert_to_text(pdf_file, txt_file) is None
+            assert txt_file.read_text(encoding="utf-8") == "a\fb\f"
+            run.assert_not_called()
+
+    def test_failure_falls_back_to_pdftotext(self) -> None:
+        """A missing package or a broken file goes to pdftotext, so do large files."""
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(
+                pdf, "extract_pages_pdfium", side_effect=ImportError("pypdfium2")
+            ),
+            mock.patch.object(pdf, "run") as run,
+        ):
+            small = Path(tmp) / "small.pdf"
+            small.write_bytes(b"%PDF-1.4")
+            large = Path(tmp) / "large.pdf"
+            large.write_bytes(b"%PDF-1.4" + b" " * 2048)
+            assert use_pdfium(small)
+            assert not use_pdfium(large)
+            assert try_pdf_convert_to_text(small, Path(tmp) / "small.txt") is None
+            assert run.call_args.args[0][0] == "pdftotext"
+
+    def test_hung_worker_is_killed(self) -> None:
+        """A worker that runs out of time is killed, the next call gets a new one."""
+        self.addCleanup(configure_limits, None)
+        self.addCleanup(shutdown_pdfium_pool)
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_file = Path(tmp) / "small.pdf"
+            pdf_file.write_bytes(b"%PDF-1.4")
+            configure_limits(ResourceLimits(text_page_seconds=1, min_seconds=5))
+            with mock.patch.object(pdf_text_backend, "_read_pages", _pages):
+                assert extract_pages_pdfium(pdf_file) == [str(pdf_file), "second page"]
+            hung_pool = pdf_text_backend._pool
+            assert hung_pool is not None
+
+            start = time.monotonic()
+            with mock.patch.object(pdf_text_backend, "_read_pages", _hang):
+                with self.assertRaises(PdfiumTimeout):
+                    extract_pages_pdfium(pdf_file)
+            assert time.monotonic() - start < 30
+            assert pdf_text_backend._pool is None
+            deadline = time.monotonic() + 5
+            while multiprocessing.active_children() and time.monotonic() < deadline:
+                time.sleep(0.1)
+            assert not multiprocessing.active_children()
+
+            with mock.patch.object(pdf_text_backend, "_read_pages", _pages):
+                assert extract_pages_pdfium(pdf_file) == [str(pdf_file), "second page"]
+            assert pdf_text_backend._pool is not hung_pool
+
+    def test_unknown_backend(self) -> None:
+        """Only the known backends can be configured."""
+        with self.assertRaises(ValueError):
+            configure_pdf_text_backend("poppler")
+
+    @unittest.skipUnless(HAS_PYPDFIUM2, "pypdfium2 is not installed")
+    def test_extract_synthetic_pdf(self) -> None:
+        """PDFium reads the text layer of a born-digital PDF, page by page."""
+        with tempfile.TemporaryDirectory() as tmp:
+            documents = generate_corpus(
+                Path(tmp), docs_per_kind=1, page_counts=(2,), kinds=["text"]
+            )
+            pages = pdf_text_backend.extract_pages_pdfium(Path(tmp) / documents[0].path)
+            assert len(pages) == 2
+            assert all(len(page.split()) > 100 for page in pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Unit test file.
+"""
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from converter_fakes import ENGLISH, FAKE_CONVERTER, extract_text, ocr_text
+
+from pdf_ingest import pipeline
+from pdf_ingest.convert import ConversionCancelled, Converter, convert_document
+from pdf_ingest.pipeline import Pipeline, StageLimits
+from pdf_ingest.scan_and_convert import share_cpus
+from pdf_ingest.types import ConvertOptions, TranslationItem
+
+
+class PipelineTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_text_and_ocr_documents(self) -> None:
+        """Text documents skip OCR, scans go through it, every item is reported once."""
+        fake = FAKE_CONVERTER
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.dict(pipeline.CONVERTERS, {".pdf": fake}),
+        ):
+            root = Path(tmp)
+            items = []
+            for name in ("digital", "scan", "other"):
+                input_file = root / f"{name}.pdf"
+                input_file.write_bytes(b"%PDF-1.4 " + name.encode())
+                items.append(
+                    TranslationItem(
+                        input_file=input_file,
+                        output_file=root / f"{name}.txt",
+                        json_file=root / f"{name}.json",
+                        json_exists=False,
+                    )
+                )
+
+            done: dict[int, bool] = {}
+
+            def on_done(index, item, err, success, duration) -> None:
+                assert index not in done
+                done[index] = success
+
+            engine = Pipeline(StageLimits.for_jobs(2, ocr_jobs=1), on_done)
+            for index, item in enumerate(items):
+                engine.submit(index, item)
+            engine.close()
+
+            assert done == {0: True, 1: True, 2: True}
+            assert [item.method for item in items] == ["text", "ocr", "text"]
+            assert items[1].output_file.name == "scan-EN.txt"
+            assert items[1].output_file.read_text(encoding="utf-8") == ENGLISH
+            assert not list(root.glob(".*.partial"))
+
+    def test_ocr_workers_share_the_cpus(self) -> None:
+        """Documents OCR'd at once split the CPUs instead of taking all of them each."""
+        with mock.patch("os.cpu_count", return_value=16):
+            options = share_cpus(None, 4)
+            assert (options.ocr_workers, options.ocrmypdf_jobs) == (4, 4)
+            assert share_cpus(None, 32).ocr_workers == 1
+            explicit = share_cpus(ConvertOptions(ocr_workers=8), 4)
+            assert (explicit.ocr_workers, explicit.ocrmypdf_jobs) == (8, 4)
+
+    def test_cancelled_document_is_not_committed(self) -> None:
+        """A cancelled conversion writes neither the text nor its partial file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_file = root / "book.pdf"
+            input_file.write_bytes(b"%PDF-1.4")
+            item = TranslationItem(
+                input_file=input_file,
+                output_file=root / "book.txt",
+                json_file=root / "book.json",
+                json_exists=False,
+                owner="host:42",
+                cancel=threading.Event(),
+            )
+
+            def extract(input_file: Path, txt_file_out: Path) -> Exception | None:
+                assert txt_file_out.name == ".book.txt.host_42.partial"
+                item.cancel.set()
+                return extract_text(input_file, txt_file_out)
+
+            err, success = convert_document(
+                item, Converter(extract=extract, ocr=ocr_text)
+            )
+            assert isinstance(err, ConversionCancelled) and not success
+            assert sorted(path.name for path in root.iterdir()) == ["book.pdf"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Unit test file.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from converter_fakes import ENGLISH, extract_text
+
+from pdf_ingest.convert import Converter, convert_document
+from pdf_ingest.result_cache import CachedResult, ResultCache
+from pdf_ingest.types import ConvertOptions, TranslationItem
+
+RESULT = CachedResult(language="en", language_reliable=True, method="ocr", pages=3)
+
+
+def _item(root: Path, name: str) -> TranslationItem:
+    input_file = root / "in" / f"{name}.pdf"
+    input_file.parent.mkdir(exist_ok=True)
+    input_file.write_bytes(b"%PDF-1.4 the same book")
+    return TranslationItem(
+        input_file=input_file,
+        output_file=root / f"{name}.txt",
+        json_file=root / f"{name}.json",
+        json_exists=False,
+    )
+
+
+class ResultCacheTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_lru_eviction(self) -> None:
+        """Beyond the size cap, the least recently used text goes first."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            text_file = root / "text.txt"
+            text_file.write_text("x" * 100, encoding="utf-8")
+            cache = ResultCache(root / "cache", max_bytes=250)
+            cache.store("a", text_file, RESULT)
+            cache.store("b", text_file, RESULT)
+            assert cache.lookup("a") == RESULT
+            cache.store("c", text_file, RESULT)
+            assert cache.lookup("b") is None
+            assert cache.lookup("a") == RESULT
+            assert cache.lookup("c") == RESULT
+            assert cache.size == 200
+
+            reopened = ResultCache(root / "cache", max_bytes=250)
+            assert len(reopened) == 2
+            assert reopened.text_path("a").read_text(encoding="utf-8") == "x" * 100
+
+    def test_duplicate_is_served_from_cache(self) -> None:
+        """A second copy of a document is not converted again."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            extract = mock.Mock(side_effect=extract_text)
+            converter = Converter(extract=extract, ocr=mock.Mock())
+            options = ConvertOptions(result_cache_dir=root / "cache")
+
+            first = _item(root, "first")
+            assert convert_document(first, converter, options) == (None, True)
+            duplicate = _item(root, "copy")
+            assert convert_document(duplicate, converter, options) == (None, True)
+
+            assert extract.call_count == 1
+            assert duplicate.method == "cache"
+            assert duplicate.output_file.name == "copy-EN.txt"
+            assert duplicate.output_file.read_text(encoding="utf-8") == ENGLISH
+            assert '"language": "en"' in duplicate.json_file.read_text()
+
+    def test_outputs_do_not_share_the_cached_text(self) -> None:
+        """Editing an output in place changes neither the cache nor later duplicates."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            converter = Converter(extract=extract_text, ocr=mock.Mock())
+            options = ConvertOptions(result_cache_dir=root / "cache")
+
+            first = _item(root, "first")
+            convert_document(first, converter, options)
+            with open(first.output_file, "a", encoding="utf-8") as f:
+                f.write("translated downstream")
+            duplicate = _item(root, "copy")
+            convert_document(duplicate, converter, options)
+
+            assert duplicate.method == "cache"
+            assert duplicate.output_file.read_text(encoding="utf-8") == ENGLISH
+            assert duplicate.output_file.stat().st_nlink == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
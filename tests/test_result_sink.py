@@ -0,0 +1,89 @@
+"""
+Unit test file.
+"""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import scan_and_convert
+from pdf_ingest.result_sink import (
+    JsonlResultSink,
+    MemoryResultSink,
+    ResultSummary,
+    read_outcomes,
+)
+from pdf_ingest.scan_and_convert import scan_and_convert_to_sink
+
+
+def _fake_convert(item, input_dir, manifest, options, index):
+    if "broken" in item.input_file.name:
+        return ValueError("no text"), False
+    if "huge" in item.input_file.name:
+        return subprocess.TimeoutExpired(["ocrmypdf"], 60), False
+    return None, True
+
+
+class ResultSinkTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_streamed_result_matches_memory(self) -> None:
+        """The Result rebuilt from the file is the one kept in memory, in scan order."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_dir = root / "in"
+            input_dir.mkdir()
+            for name in ("a", "broken", "c", "huge", "e"):
+                (input_dir / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+
+            results = []
+            with mock.patch.object(
+                scan_and_convert, "process_and_record", _fake_convert
+            ):
+                for name, sink in (
+                    ("memory", MemoryResultSink()),
+                    ("jsonl", JsonlResultSink(root / "outcomes.jsonl")),
+                ):
+                    output_dir = root / name
+                    output_dir.mkdir()
+                    summary = scan_and_convert_to_sink(
+                        input_dir, output_dir, sink, jobs=3, use_manifest=False
+                    )
+                    sink.close()
+                    assert summary == ResultSummary(
+                        documents=5, converted=3, failed=2, timed_out=1, missing_json=5
+                    )
+                    results.append(sink.to_result())
+
+            memory, streamed = results
+            assert streamed.input_files == memory.input_files
+            assert streamed.input_files == sorted(input_dir.glob("*.pdf"))
+            assert streamed.untranstlatable == memory.untranstlatable
+            assert streamed.timed_out == [input_dir / "huge.pdf"]
+            assert [str(e) for e in streamed.errors] == [
+                "ValueError: no text",
+                "TimeoutExpired: Command '['ocrmypdf']' timed out after 60 seconds",
+            ]
+
+    def test_truncated_line_is_skipped(self) -> None:
+        """A crash mid-write leaves a partial line, the rest is still readable."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "outcomes.jsonl"
+            path.write_text(
+                '{"position": 0, "input_file": "a.pdf", "output_file": "a-EN.txt", '
+                '"success": true, "error": null, "timed_out": false, '
+                '"json_exists": false}\n{"position": 1, "inp',
+                encoding="utf-8",
+            )
+            outcomes = list(read_outcomes(path))
+            assert [outcome.input_file for outcome in outcomes] == ["a.pdf"]
+
+    def test_summary_has_slots(self) -> None:
+        """The summary carries no per-instance dict."""
+        assert not hasattr(ResultSummary(), "__dict__")
+
+
+if __name__ == "__main__":
+    unittest.main()
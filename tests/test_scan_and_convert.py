@@ -0,0 +1,122 @@
+"""
+Unit test file.
+"""
+
+import os
+import random
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from converter_fakes import ENGLISH, extract_text, ocr_text
+
+from pdf_ingest import pdf, pipeline, scan_and_convert
+from pdf_ingest.convert import Converter
+from pdf_ingest.scan_and_convert import iter_documents, scan_and_convert_pdfs
+from pdf_ingest.scheduling import CostEstimate
+
+
+def _extract(input_file: Path, txt_file_out: Path) -> Exception | None:
+    # The text tells which version of the input it came from
+    version = input_file.read_bytes().decode()
+    txt_file_out.write_text(f"{version}\n{ENGLISH}", encoding="utf-8")
+    return None
+
+
+def _flaky_extract(input_file: Path, txt_file_out: Path) -> Exception | None:
+    # Finishes in random order, and crashes outright on the broken files
+    time.sleep(random.uniform(0, 0.02))
+    if "broken" in input_file.name:
+        raise RuntimeError(f"converter crashed on {input_file.name}")
+    return extract_text(input_file, txt_file_out)
+
+
+def _estimate(input_file: Path) -> CostEstimate:
+    # Splits the files over both lanes
+    pages = int(input_file.stem.rsplit("-", 1)[1]) % 5 + 1
+    return CostEstimate(pages=pages, size=pages, has_text=pages % 2 == 0)
+
+
+class ScanAndConvertTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_symlink_cycle_is_not_followed(self) -> None:
+        """Symlinked files are found, symlinked directories are not entered."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "a" / "b").mkdir(parents=True)
+            (root / "a" / "b" / "book.PDF").write_bytes(b"%PDF-1.4")
+            (root / "a" / "notes.txt").write_text("not a document", encoding="utf-8")
+            os.symlink(root / "a", root / "a" / "b" / "loop")
+            os.symlink(root / "a" / "b" / "book.PDF", root / "alias.djvu")
+
+            found = [path.relative_to(root) for path in iter_documents(root)]
+            assert found == [Path("alias.djvu"), Path("a/b/book.PDF")]
+
+    def test_modified_document_is_converted_again(self) -> None:
+        """A reliable sidecar JSON does not hide a change to a converted document."""
+        fake = Converter(extract=_extract, ocr=ocr_text)
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(pdf, "PDF_CONVERTER", fake),
+        ):
+            input_dir = Path(tmp) / "in"
+            output_dir = Path(tmp) / "out"
+            input_dir.mkdir()
+            output_dir.mkdir()
+            book = input_dir / "book.pdf"
+            book.write_text("version one", encoding="utf-8")
+
+            first = scan_and_convert_pdfs(input_dir, output_dir, jobs=1)
+            assert first.output_files == [output_dir / "book-EN.txt"]
+            assert (
+                scan_and_convert_pdfs(input_dir, output_dir, jobs=1).input_files == []
+            )
+
+            book.write_text("version two, longer", encoding="utf-8")
+            second = scan_and_convert_pdfs(input_dir, output_dir, jobs=1)
+            assert second.output_files == [output_dir / "book-EN.txt"]
+            text = (output_dir / "book-EN.txt").read_text(encoding="utf-8")
+            assert text.startswith("version two")
+            assert sorted(p.name for p in output_dir.glob("*.txt")) == ["book-EN.txt"]
+
+    def test_result_order_and_error_isolation(self) -> None:
+        """With many jobs, the Result is in scan order and a crash stays in its file."""
+        flaky = Converter(extract=_flaky_extract, ocr=ocr_text)
+        runs = {
+            "pool": {"schedule": "fifo"},
+            "lanes": {"schedule": "lanes"},
+            "pipeline": {"engine": "pipeline"},
+        }
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(pdf, "PDF_CONVERTER", flaky),
+            mock.patch.dict(pipeline.CONVERTERS, {".pdf": flaky}),
+            mock.patch.object(scan_and_convert, "estimate_cost", _estimate),
+        ):
+            input_dir = Path(tmp) / "in"
+            input_dir.mkdir()
+            for i in range(24):
+                name = f"broken-{i:02d}" if i % 6 == 0 else f"doc-{i:02d}"
+                (input_dir / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+            expected = sorted(input_dir.glob("*.pdf"))
+
+            for name, kwargs in runs.items():
+                output_dir = Path(tmp) / name
+                output_dir.mkdir()
+                result = scan_and_convert_pdfs(
+                    input_dir, output_dir, jobs=4, use_manifest=False, **kwargs
+                )
+                assert result.input_files == expected, name
+                assert len(result.errors) == 4, name
+                assert all(isinstance(e, RuntimeError) for e in result.errors), name
+                assert [p.name for p in result.untranstlatable] == [
+                    f"broken-{i:02d}.pdf" for i in range(0, 24, 6)
+                ], name
+                assert len(result.output_files) == 20, name
+
+
+if __name__ == "__main__":
+    unittest.main()
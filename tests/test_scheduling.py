@@ -0,0 +1,74 @@
+"""
+Unit test file.
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import scheduling
+from pdf_ingest.scheduling import (
+    CostEstimate,
+    estimate_cost,
+    shortest_first,
+    split_lanes,
+)
+
+
+class SchedulingTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_shortest_first(self) -> None:
+        """A short scan can go before a long digital book, a huge scan goes last."""
+        estimates = [
+            CostEstimate(pages=2000, size=900_000_000, has_text=False),
+            CostEstimate(pages=300, size=2_000_000, has_text=True),
+            CostEstimate(pages=5, size=3_000_000, has_text=False),
+            CostEstimate(pages=10, size=100_000, has_text=True),
+        ]
+        assert shortest_first(estimates) == [3, 2, 1, 0]
+
+    def test_split_lanes(self) -> None:
+        """Text extraction goes cheapest first, OCR work biggest first."""
+        estimates = [
+            CostEstimate(pages=20, size=1, has_text=False),
+            CostEstimate(pages=300, size=1, has_text=True),
+            CostEstimate(pages=2000, size=1, has_text=False),
+            CostEstimate(pages=10, size=1, has_text=True),
+        ]
+        fast, slow = split_lanes(estimates)
+        assert fast == [3, 1]
+        assert slow == [2, 0]
+
+    @unittest.skipIf(shutil.which("djvused"), "djvused would read the real page count")
+    def test_estimate_falls_back_to_size(self) -> None:
+        """Without a readable page count, pages are guessed from the file size."""
+        with tempfile.TemporaryDirectory() as tmp:
+            djvu_file = Path(tmp) / "scan.djvu"
+            djvu_file.write_bytes(b"\0" * 250_000)
+            estimate = estimate_cost(djvu_file)
+            assert estimate.pages == 2
+            assert not estimate.has_text
+
+    def test_estimate_probes_djvu_text_layer(self) -> None:
+        """A DJVU with a hidden text layer goes to text extraction, not OCR."""
+        text_layer = "This page came with a perfectly good hidden text layer. " * 4
+        with (
+            mock.patch.object(scheduling, "get_djvu_page_count", return_value=40),
+            mock.patch.object(
+                scheduling, "extract_djvu_page_text", return_value=text_layer
+            ) as extract,
+        ):
+            estimate = estimate_cost(Path("book.djvu"))
+            assert estimate.pages == 40
+            assert estimate.has_text
+            extract.assert_called_once_with(Path("book.djvu"), 21)
+
+            extract.return_value = ""
+            assert not estimate_cost(Path("book.djvu")).has_text
+
+
+if __name__ == "__main__":
+    unittest.main()
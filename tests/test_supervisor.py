@@ -0,0 +1,97 @@
+"""
+Unit test file.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest.supervisor import (
+    ResourceLimits,
+    cached_page_count,
+    configure_limits,
+    run,
+)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed process nobody has reaped yet is a zombie, not alive
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+class SupervisorTester(unittest.TestCase):
+    """Main tester class."""
+
+    def tearDown(self) -> None:
+        configure_limits(None)
+
+    def test_timeout_scales_with_pages(self) -> None:
+        """OCR gets more time per page than extraction, small calls get the floor."""
+        limits = ResourceLimits(text_page_seconds=1, ocr_page_seconds=30)
+        assert limits.timeout(1) == 60
+        assert limits.timeout(100) == 100
+        assert limits.timeout(10, "ocr") == 300
+        assert ResourceLimits().timeout(100) is None
+
+    def test_without_limits(self) -> None:
+        """Without limits run() behaves like subprocess.run()."""
+        completed = run([sys.executable, "-c", "print('hi')"], capture_output=True)
+        assert completed.stdout.strip() == b"hi"
+        with self.assertRaises(subprocess.CalledProcessError):
+            run([sys.executable, "-c", "raise SystemExit(3)"])
+
+    def test_timeout_kills_the_process_group(self) -> None:
+        """A hanging converter and everything it started is killed on timeout."""
+        configure_limits(ResourceLimits(text_page_seconds=0.5, min_seconds=0))
+        # The child starts a grandchild and reports its pid, then hangs
+        script = (
+            "import subprocess, sys, time\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+            "print(child.pid, flush=True)\n"
+            "time.sleep(60)\n"
+        )
+        start = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired) as raised:
+            run([sys.executable, "-c", script], pages=1, capture_output=True)
+        assert time.monotonic() - start < 30
+        grandchild = int(raised.exception.output.split()[0])
+        deadline = time.monotonic() + 5
+        while _alive(grandchild) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not _alive(grandchild)
+
+    def test_memory_limit(self) -> None:
+        """A converter that allocates beyond the limit fails instead of the container."""
+        configure_limits(ResourceLimits(memory_mb=512))
+        script = "import time; time.sleep(0.5); b = bytearray(1024 * 1024 * 1024)"
+        with self.assertRaises(subprocess.CalledProcessError):
+            run([sys.executable, "-c", script], capture_output=True)
+
+    def test_page_count_is_read_once_per_version(self) -> None:
+        """The page count is read again only after the file changed."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "book.pdf"
+            path.write_bytes(b"%PDF-1.4")
+            count = mock.Mock(side_effect=[3, 5])
+            assert cached_page_count(path, count) == 3
+            assert cached_page_count(path, count) == 3
+            path.write_bytes(b"%PDF-1.4 with more pages")
+            assert cached_page_count(path, count) == 5
+            assert count.call_count == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
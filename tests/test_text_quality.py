@@ -0,0 +1,37 @@
+"""
+Unit test file.
+"""
+
+import unittest
+
+from pdf_ingest.text_quality import assess_text, page_needs_ocr
+
+
+class TextQualityTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_page_needs_ocr(self) -> None:
+        """Empty and symbol-only pages are sent to OCR, prose is kept."""
+        assert page_needs_ocr("")
+        assert page_needs_ocr("   \n\n  ")
+        assert page_needs_ocr("#$%&*@!~^" * 10)
+        assert not page_needs_ocr("The quick brown fox jumps over the lazy dog.")
+
+    def test_assess_text(self) -> None:
+        """The document gate rejects near-empty and garbage text."""
+        prose = "This is a perfectly ordinary page of born digital text. " * 5
+        assert assess_text((prose + "\f") * 3).passed
+        assert assess_text("これは日本語のテキストです。" * 10 + "\f").passed
+
+        empty_pages = "\f" * 20
+        report = assess_text(empty_pages)
+        assert not report.passed
+        assert report.pages == 20
+
+        garbage = "x7#q 9$1z %%& 3k@ " * 50 + "\f"
+        report = assess_text(garbage)
+        assert not report.passed, report
+
+
+if __name__ == "__main__":
+    unittest.main()
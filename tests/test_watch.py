@@ -0,0 +1,111 @@
+"""
+Unit test file.
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import watch
+from pdf_ingest.watch import Debouncer, _PollingSource, watch_and_convert
+
+
+class WatchTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_debouncer_waits_for_stable_file(self) -> None:
+        """A file is only ready once its signature stayed the same for the settle time."""
+        path = Path("incoming/book.pdf")
+        signatures = {path: (100, 1)}
+        debouncer = Debouncer(settle_seconds=10.0)
+        debouncer.observe(path, signatures[path], now=0.0)
+
+        assert debouncer.ready(5.0, stat=signatures.get) == []
+        signatures[path] = (200, 2)  # Still being written
+        assert debouncer.ready(8.0, stat=signatures.get) == []
+        assert debouncer.ready(15.0, stat=signatures.get) == []
+        assert debouncer.ready(18.0, stat=signatures.get) == [path]
+        assert len(debouncer) == 0
+
+    def test_debouncer_forgets_deleted_file(self) -> None:
+        """A file removed before it settled is dropped."""
+        path = Path("incoming/book.djvu")
+        debouncer = Debouncer(settle_seconds=1.0)
+        debouncer.observe(path, (10, 1), now=0.0)
+        assert debouncer.ready(5.0, stat=lambda _: None) == []
+        assert len(debouncer) == 0
+
+    def test_polling_source_reports_changes(self) -> None:
+        """Only files added or modified after startup are reported."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "old.pdf").write_bytes(b"%PDF-1.4 old")
+            source = _PollingSource(root)
+            assert list(source.changes()) == []
+
+            (root / "sub").mkdir()
+            new_file = root / "sub" / "new.DJVU"
+            new_file.write_bytes(b"AT&TFORM new")
+            (root / "notes.txt").write_text("ignored", encoding="utf-8")
+            assert list(source.changes()) == [new_file]
+            assert list(source.changes()) == []
+
+            (root / "old.pdf").write_bytes(b"%PDF-1.4 old, now longer")
+            assert list(source.changes()) == [root / "old.pdf"]
+
+    def test_failing_file_does_not_stop_the_watch(self) -> None:
+        """A file that cannot be looked at or converted is logged and skipped."""
+        converted: list[str] = []
+
+        def make_item(path: Path, *args) -> Path:
+            if path.stem == "unreadable":
+                raise PermissionError(f"Permission denied: {path}")
+            return path
+
+        def process(item: Path, *args) -> tuple[Exception | None, bool]:
+            if item.stem == "crash":
+                raise RuntimeError("converter crashed")
+            converted.append(item.name)
+            return None, True
+
+        stop_event = threading.Event()
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(watch, "make_untreated_item", side_effect=make_item),
+            mock.patch.object(watch, "process_and_record", side_effect=process),
+            ThreadPoolExecutor(max_workers=1) as runner,
+        ):
+            input_dir = Path(tmp) / "in"
+            output_dir = Path(tmp) / "out"
+            input_dir.mkdir()
+            output_dir.mkdir()
+            running = runner.submit(
+                watch_and_convert,
+                input_dir,
+                output_dir,
+                jobs=2,
+                use_inotify=False,
+                poll_interval=0.05,
+                settle_seconds=0.0,
+                stop_event=stop_event,
+            )
+            # Let the watch start before anything lands
+            time.sleep(0.5)
+            for name in ("unreadable", "crash"):
+                (input_dir / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+            time.sleep(0.5)
+            (input_dir / "good.pdf").write_bytes(b"%PDF-1.4")
+            deadline = time.monotonic() + 10
+            while not converted and time.monotonic() < deadline:
+                time.sleep(0.05)
+            stop_event.set()
+            assert running.result(timeout=10) == 1
+            assert converted == ["good.pdf"]
+
+
+if __name__ == "__main__":
+    unittest.main()
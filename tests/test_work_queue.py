@@ -0,0 +1,199 @@
+"""
+Unit test file.
+"""
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pdf_ingest import work_queue
+from pdf_ingest.convert import ConversionCancelled
+from pdf_ingest.work_queue import WorkQueue, enqueue_tree, run_worker
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class WorkQueueTester(unittest.TestCase):
+    """Main tester class."""
+
+    def test_leases_are_exclusive(self) -> None:
+        """Two handles on the same queue never lease the same job."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "queue.sqlite"
+            first = WorkQueue(path)
+            second = WorkQueue(path)
+            assert first.enqueue(f"{i:03d}.pdf" for i in range(10)) == 10
+            assert second.enqueue(["000.pdf"]) == 0
+
+            leased = [lease.input_file for lease in first.lease("a", 4)]
+            leased += [lease.input_file for lease in second.lease("b", 10)]
+            assert sorted(leased) == [f"{i:03d}.pdf" for i in range(10)]
+            assert first.lease("a", 1) == []
+            assert first.counts()["leased"] == 10
+            first.close()
+            second.close()
+
+    def test_expired_lease_is_requeued(self) -> None:
+        """A dead worker's job goes to the next worker, the dead one cannot finish it."""
+        with tempfile.TemporaryDirectory() as tmp:
+            clock = _Clock()
+            queue = WorkQueue(Path(tmp) / "queue.sqlite", lease_seconds=60, clock=clock)
+            queue.enqueue(["book.pdf"])
+            assert [lease.attempt for lease in queue.lease("dead")] == [1]
+
+            clock.now += 50
+            assert queue.heartbeat("dead", ["book.pdf"]) == set()
+            clock.now += 50
+            assert queue.lease("other") == []
+
+            clock.now += 61
+            leases = queue.lease("other")
+            assert [(lease.input_file, lease.attempt) for lease in leases] == [
+                ("book.pdf", 2)
+            ]
+            assert queue.heartbeat("dead", ["book.pdf"]) == {"book.pdf"}
+            assert not queue.complete("dead", "book.pdf", True)
+            assert queue.complete("other", "book.pdf", True)
+            assert queue.counts()["done"] == 1
+            queue.close()
+
+    def test_too_many_expiries_fail_the_job(self) -> None:
+        """A document that keeps killing its worker is eventually given up."""
+        with tempfile.TemporaryDirectory() as tmp:
+            clock = _Clock()
+            queue = WorkQueue(
+                Path(tmp) / "queue.sqlite", lease_seconds=1, max_attempts=2, clock=clock
+            )
+            queue.enqueue(["poison.pdf"])
+            for _ in range(2):
+                assert len(queue.lease("w")) == 1
+                clock.now += 2
+            assert queue.lease("w") == []
+            assert queue.counts()["failed"] == 1
+            queue.close()
+
+    def test_workers_share_the_tree(self) -> None:
+        """Concurrent workers convert every file exactly once."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_dir = root / "in"
+            output_dir = root / "out"
+            (input_dir / "sub").mkdir(parents=True)
+            output_dir.mkdir()
+            for i in range(12):
+                (input_dir / "sub" / f"{i:02d}.pdf").write_bytes(b"%PDF-1.4")
+            queue_path = root / "queue.sqlite"
+            queue = WorkQueue(queue_path)
+            assert enqueue_tree(queue, input_dir) == 12
+
+            converted: list[Path] = []
+            lock = threading.Lock()
+
+            def fake_convert(item, input_dir, manifest, options, index):
+                with lock:
+                    converted.append(item.input_file)
+                return None, True
+
+            with mock.patch.object(work_queue, "process_and_record", fake_convert):
+                counts: list[int] = []
+                workers = [
+                    threading.Thread(
+                        target=lambda name=name: counts.append(
+                            run_worker(
+                                queue_path,
+                                input_dir,
+                                output_dir,
+                                jobs=2,
+                                poll_interval=0.1,
+                                worker_id=name,
+                            )
+                        )
+                    )
+                    for name in ("a", "b", "c")
+                ]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+
+            assert sorted(converted) == sorted(input_dir.rglob("*.pdf"))
+            assert sum(counts) == 12
+            assert queue.counts()["done"] == 12
+            queue.close()
+
+    def test_lost_lease_cancels_the_conversion(self) -> None:
+        """A worker whose lease was taken over stops converting and leaves the job."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_dir = root / "in"
+            output_dir = root / "out"
+            input_dir.mkdir()
+            output_dir.mkdir()
+            (input_dir / "book.pdf").write_bytes(b"%PDF-1.4")
+            queue_path = root / "queue.sqlite"
+            queue = WorkQueue(queue_path)
+            enqueue_tree(queue, input_dir)
+            stop = threading.Event()
+
+            def slow_convert(item, input_dir, manifest, options, index):
+                assert item.owner == "a"
+                # Another worker takes the job over, as after a long pause of this one
+                with sqlite3.connect(queue_path) as conn:
+                    conn.execute("UPDATE jobs SET worker = 'b'")
+                assert item.cancel.wait(10)
+                stop.set()
+                return ConversionCancelled("book.pdf"), False
+
+            with mock.patch.object(work_queue, "process_and_record", slow_convert):
+                converted = run_worker(
+                    queue_path,
+                    input_dir,
+                    output_dir,
+                    jobs=1,
+                    lease_seconds=0.3,
+                    poll_interval=0.1,
+                    worker_id="a",
+                    stop_event=stop,
+                )
+            assert converted == 0
+            assert queue.counts()["leased"] == 1
+            assert queue.complete("b", "book.pdf", True)
+            queue.close()
+
+    def test_skipped_documents_are_not_counted(self) -> None:
+        """Documents that were already converted are done, but not converted again."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            input_dir = root / "in"
+            output_dir = root / "out"
+            input_dir.mkdir()
+            output_dir.mkdir()
+            for name in ("new", "old"):
+                (input_dir / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+            (output_dir / "old.txt").write_text("converted before", encoding="utf-8")
+            queue_path = root / "queue.sqlite"
+            queue = WorkQueue(queue_path)
+            enqueue_tree(queue, input_dir)
+
+            fake_convert = mock.Mock(return_value=(None, True))
+            with mock.patch.object(work_queue, "process_and_record", fake_convert):
+                converted = run_worker(
+                    queue_path, input_dir, output_dir, jobs=2, poll_interval=0.1
+                )
+            assert converted == 1
+            assert fake_convert.call_count == 1
+            assert queue.counts()["done"] == 2
+            queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()